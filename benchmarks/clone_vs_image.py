@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark: creating container from image vs. copying stopped container.
+
+For each given LXD storage pool golden container is created from image
+and stopped. Then containers are created several times in two ways:
+from the same image and as copy of golden container.
+Only creating is measured, containers aren't started.
+
+Requires running LXD and local image. Storage pools should exist already,
+e.g. `lxc storage create bench-btrfs btrfs`.
+
+Usage:
+    python benchmarks/clone_vs_image.py --image ubuntu-bionic \\
+        --pool default --pool bench-btrfs --pool bench-zfs --runs 5
+"""
+
+import argparse
+import statistics
+import time
+
+import pylxd
+
+
+PREFIX = 'lazy-lxd-bench'
+
+
+def parse_option() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare latency of container creating "
+                    "from image and from golden container."
+    )
+    parser.add_argument(
+        '--image', required=True, metavar='<alias|fingerprint>',
+        help="Local image for containers."
+    )
+    parser.add_argument(
+        '--pool', dest='pools', action='append', metavar='<name>',
+        help="Storage pool to benchmark, could be repeated. "
+             "Default: pool of default profile"
+    )
+    parser.add_argument(
+        '--runs', type=int, default=5, metavar='<number>',
+        help="How many containers are created in each way. Default: 5"
+    )
+    return parser.parse_args()
+
+
+def image_source(client: pylxd.Client, image: str) -> dict:
+    """
+    Source of container by image alias or fingerprint.
+    """
+
+    try:
+        client.api.images.aliases[image].get()
+        return {'type': 'image', 'alias': image}
+    except pylxd.exceptions.NotFound:
+        return {'type': 'image', 'fingerprint': image}
+
+
+def root_device(pool: str) -> dict:
+    """
+    Root disk of container on storage pool.
+    """
+
+    if pool is None:
+        return {}
+    return {'root': {'path': '/', 'pool': pool, 'type': 'disk'}}
+
+
+def timed_create(client: pylxd.Client, config: dict) -> float:
+    """
+    Create container and return spent seconds. Container is deleted after.
+    """
+
+    started = time.monotonic()
+    container = client.containers.create(config, wait=True)
+    elapsed = time.monotonic() - started
+    container.delete(wait=True)
+    return elapsed
+
+
+def bench_pool(
+    client: pylxd.Client, source: dict, pool: str, runs: int
+) -> dict:
+    """
+    Measure creating from image and copying on one storage pool.
+    """
+
+    suffix = pool or 'default'
+    golden = client.containers.create({
+        'name': f"{PREFIX}-golden-{suffix}",
+        'source': source,
+        'devices': root_device(pool)
+    }, wait=True)
+
+    results = {'image': [], 'clone': []}
+    try:
+        for run in range(runs):
+            results['image'].append(timed_create(client, {
+                'name': f"{PREFIX}-image-{suffix}-{run}",
+                'source': source,
+                'devices': root_device(pool)
+            }))
+            results['clone'].append(timed_create(client, {
+                'name': f"{PREFIX}-clone-{suffix}-{run}",
+                'source': {
+                    'type': 'copy',
+                    'source': golden.name,
+                    'container_only': True
+                },
+                'devices': root_device(pool)
+            }))
+    finally:
+        golden.delete(wait=True)
+
+    return results
+
+
+def main():
+    arguments = parse_option()
+    client = pylxd.Client()
+    source = image_source(client, arguments.image)
+
+    print(f"{'pool':<20} {'way':<6} {'median, s':>10} {'min, s':>8} "
+          f"{'max, s':>8}")
+    for pool in arguments.pools or [None]:
+        results = bench_pool(client, source, pool, arguments.runs)
+        for way, timings in results.items():
+            print(
+                f"{pool or 'default':<20} {way:<6} "
+                f"{statistics.median(timings):>10.2f} "
+                f"{min(timings):>8.2f} {max(timings):>8.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,909 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in LXD daemon for benchmarks.
+
+Serves the part of LXD REST API which lazy-lxd uses on a unix socket:
+images list/publish/download, containers create/start/stop/state/delete,
+exec thru websockets,
+files, networks and operations. Nothing is really created, every
+operation just takes configured time, so performance of lazy-lxd itself
+could be measured without LXD host.
+
+Server listens on <directory>/unix.socket, so clients find it
+by LXD_DIR environment variable, as they find real LXD.
+
+Usage:
+    python benchmarks/fake_lxd.py --dir /tmp/fake-lxd --latency create=0.2
+    LXD_DIR=/tmp/fake-lxd lazy-lxd --yes --no-fill-hosts
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import base64
+import struct
+import asyncio
+import hashlib
+import argparse
+import threading
+from urllib.parse import urljoin, urlsplit, parse_qs, unquote
+from urllib.request import urlopen
+
+
+# Seconds which operations take by default
+LATENCY = {
+    'request': 0.0,
+    'create': 0.05,
+    'start': 0.02,
+    'stop': 0.01,
+    'delete': 0.01,
+    'rename': 0.01,
+    'publish': 0.5,
+    'download': 1.0,
+    'exec': 0.02,
+    'file': 0.0,
+}
+# Seconds after start before container gets IP address
+NETWORK_DELAY = 0.3
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT = 0x1
+WS_BINARY = 0x2
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+
+STEP_ECHO = re.compile(r"%s %s %s\\n' (__lazy_lxd_step__ \S+) \"\$rc\"")
+
+
+class FakeLXD(object):
+    """
+    Fake LXD daemon served by asyncio loop in background thread.
+
+    Args:
+        directory (str): Directory of unix socket, it's used as LXD_DIR.
+        latency (dict): Seconds which operations take, keyed by
+                        request, create, start, stop, delete, rename,
+                        publish, download, exec, file.
+                        Request latency is added to every request.
+        network_delay (float): Seconds after start before container
+                               gets IP address.
+        images (int): How many images of each OS are in local storage.
+    """
+
+    def __init__(
+        self, directory: str, latency: dict = None,
+        network_delay: float = NETWORK_DELAY, images: int = 1
+    ):
+        self.directory = directory
+        self.path = os.path.join(directory, 'unix.socket')
+        self.latency = dict(LATENCY, **(latency or {}))
+        self.network_delay = network_delay
+
+        self.images = _images(images)
+        self.aliases = dict()
+        self.containers = dict()
+        self.operations = dict()
+        self.requests = 0
+
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._next_ip = 2
+
+    def start(self) -> str:
+        """
+        Start serving in background thread.
+
+        Returns:
+            str: Path to unix socket.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_unix_server(self._serve, path=self.path)
+            )
+            started.set()
+            self._loop.run_forever()
+
+            # connections which are still open are dropped
+            all_tasks = getattr(asyncio, 'all_tasks', None) or \
+                asyncio.Task.all_tasks
+            pending = all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True)
+            )
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.path
+
+    def stop(self) -> None:
+        """
+        Stop serving and remove socket.
+        """
+
+        def close():
+            self._server.close()
+            self._loop.stop()
+
+        self._loop.call_soon_threadsafe(close)
+        self._thread.join()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _serve(self, reader, writer) -> None:
+        """
+        Serve keep-alive connection.
+        """
+
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.requests += 1
+                await asyncio.sleep(self.latency['request'])
+
+                if headers.get('upgrade', '').lower() == 'websocket':
+                    await self._websocket(target, headers, reader, writer)
+                    break
+
+                status, payload = await self._route(method, target, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError,
+                asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, body: bytes) -> tuple:
+        """
+        Dispatch request to API endpoint.
+
+        Returns:
+            tuple: HTTP status and JSON payload.
+        """
+
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [unquote(p) for p in url.path.strip('/').split('/')]
+        if parts[:1] != ['1.0']:
+            return _error(404, "not found")
+        parts = parts[1:]
+
+        if parts == [] and method == 'GET':
+            return _sync(_host_info())
+
+        if parts[:1] == ['images']:
+            return self._images(method, parts[1:], query, body)
+        if parts[:1] == ['containers']:
+            return await self._containers(method, parts[1:], query, body)
+        if parts[:1] == ['operations'] and len(parts) >= 2:
+            return await self._operations(method, parts[1:], query)
+        if parts[:1] == ['networks'] and len(parts) == 2:
+            return _sync({
+                'name': parts[1], 'type': 'bridge', 'managed': True,
+                'config': {'ipv4.address': '10.0.3.1/24', 'dns.domain': 'lxd'}
+            })
+
+        return _error(404, "not found")
+
+    def _images(
+        self, method: str, parts: list, query: dict, body: bytes
+    ) -> tuple:
+        if parts == [] and method == 'GET':
+            if query.get('recursion') == '1':
+                return _sync(list(self.images.values()))
+            return _sync([f"/1.0/images/{fp}" for fp in self.images])
+        if parts == [] and method == 'POST':
+            try:
+                request = json.loads(body)
+            except ValueError:
+                return self._upload(body)
+            if request['source'].get('type') == 'image':
+                return self._download(request)
+            return self._publish(request)
+        if parts == ['aliases'] and method == 'GET':
+            aliases = [
+                {'name': name, 'target': target}
+                for name, target in self.aliases.items()
+            ]
+            if query.get('recursion') == '1':
+                return _sync(aliases)
+            return _sync([f"/1.0/images/aliases/{a['name']}" for a in aliases])
+        if parts[:1] == ['aliases'] and len(parts) == 2:
+            if parts[1] not in self.aliases:
+                return _error(404, "not found")
+            return _sync({'name': parts[1], 'target': self.aliases[parts[1]]})
+        if len(parts) == 1 and parts[0] in self.images:
+            if method == 'PUT':
+                self.images[parts[0]].update(json.loads(body))
+                return _sync({})
+            if method == 'DELETE':
+                return self._operation('delete', '', self.__delete_image,
+                                       parts[0])
+            return _sync(self.images[parts[0]])
+        return _error(404, "not found")
+
+    async def _containers(
+        self, method: str, parts: list, query: dict, body: bytes
+    ) -> tuple:
+        if parts == []:
+            if method == 'GET':
+                if query.get('recursion') == '1':
+                    return _sync(list(self.containers.values()))
+                return _sync([f"/1.0/containers/{n}" for n in self.containers])
+            if method == 'POST':
+                return self._create(json.loads(body))
+
+        name = parts[0]
+        if name not in self.containers:
+            return _error(404, "not found")
+        container = self.containers[name]
+
+        if len(parts) == 1:
+            if method == 'GET':
+                return _sync(container)
+            if method in ('PUT', 'PATCH'):
+                container['config'].update(json.loads(body).get('config', {}))
+                return _sync({})
+            if method == 'DELETE':
+                return self._operation('delete', name, self.__delete, name)
+            if method == 'POST':
+                new_name = json.loads(body)['name']
+                return self._operation(
+                    'rename', name, self.__rename, name, new_name
+                )
+
+        if parts[1:] == ['state']:
+            if method == 'GET':
+                return _sync(self.__state(container))
+            if method == 'PUT':
+                action = json.loads(body)['action']
+                if action not in ('start', 'stop', 'restart'):
+                    return _error(400, f"unknown action {action}")
+                return self._operation(
+                    'start' if action != 'stop' else 'stop',
+                    name, self.__set_state, name, action
+                )
+
+        if parts[1:] == ['exec'] and method == 'POST':
+            return self._exec(name, json.loads(body))
+
+        if parts[1:] == ['files']:
+            await asyncio.sleep(self.latency['file'])
+            if method in ('POST', 'PUT'):
+                return _sync({})
+            return _error(404, "not found")
+
+        return _error(404, "not found")
+
+    def _create(self, config: dict) -> tuple:
+        name = config['name']
+        if name in self.containers:
+            return _error(409, "container already exists")
+
+        source = config.get('source') or {}
+        if source.get('type') == 'copy':
+            source_name = source['source'].split('/')[0]
+            if source_name not in self.containers:
+                return _error(404, "source container not found")
+            base = dict(self.containers[source_name]['config'])
+        elif source.get('fingerprint') in self.images:
+            image = self.images[source['fingerprint']]
+            base = {
+                f"image.{key}": value
+                for key, value in image['properties'].items()
+            }
+        else:
+            return _error(404, "image not found")
+        base.update(config.get('config') or {})
+
+        def create():
+            self.containers[name] = _container(name, base)
+
+        return self._operation('create', name, create)
+
+    def _publish(self, request: dict) -> tuple:
+        """
+        Publish container as image.
+        """
+
+        name = request['source']['name']
+        if name not in self.containers:
+            return _error(404, "container not found")
+        fingerprint = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+        operation = self._new_operation('task', name, {})
+
+        async def publish():
+            await asyncio.sleep(self.latency['publish'])
+            self.images[fingerprint] = {
+                'fingerprint': fingerprint,
+                'architecture': 'x86_64',
+                'public': request.get('public', False),
+                'size': 100 * 1024 * 1024,
+                'uploaded_at': _now(),
+                'properties': request.get('properties') or {},
+                'aliases': request.get('aliases') or []
+            }
+            for alias in request.get('aliases') or []:
+                self.aliases[alias['name']] = fingerprint
+            self._finish(operation, {'fingerprint': fingerprint})
+
+        asyncio.ensure_future(publish())
+        return _async(operation)
+
+    def _download(self, request: dict) -> tuple:
+        """
+        Pull image from simplestreams by os/release/architecture alias.
+        Image requested by fingerprint is looked up in index of server,
+        which should be reachable from here, as real LXD does.
+        """
+
+        source = request['source']
+        alias = source.get('alias') or source.get('fingerprint') or ''
+        parts = alias.split('/')
+        if len(parts) not in (1, 2, 3):
+            return _error(404, "image not found")
+        operation = self._new_operation('task', '', {})
+
+        async def download():
+            await asyncio.sleep(self.latency['download'])
+            if len(parts) == 1:
+                fingerprint = alias
+                properties = await asyncio.get_event_loop().run_in_executor(
+                    None, _stream_properties, source.get('server'), alias
+                )
+                if properties is None:
+                    self._fail(operation, "image not found on server")
+                    return
+            else:
+                fingerprint = hashlib.sha256(alias.encode()).hexdigest()
+                properties = {
+                    'os': parts[0].capitalize(),
+                    'release': parts[1],
+                    'architecture': (parts[2:] or ['amd64'])[0],
+                    'description': f"{parts[0]} {parts[1]}"
+                }
+            self.images[fingerprint] = {
+                'fingerprint': fingerprint,
+                'architecture': 'x86_64',
+                'public': request.get('public', False),
+                'size': 100 * 1024 * 1024,
+                'uploaded_at': _now(),
+                'properties': properties,
+                'aliases': []
+            }
+            self._finish(operation, {'fingerprint': fingerprint})
+
+        asyncio.ensure_future(download())
+        return _async(operation)
+
+    def _upload(self, body: bytes) -> tuple:
+        """
+        Import uploaded image: single tarball or multipart request
+        with metadata and root filesystem. Properties aren't read
+        from metadata, they are set by separate request.
+        """
+
+        data = body
+        if body.startswith(b'--'):
+            boundary = body.split(b'\r\n', 1)[0]
+            data = b''.join(
+                part.split(b'\r\n\r\n', 1)[1][:-2]
+                for part in body.split(boundary)[1:-1]
+            )
+        fingerprint = hashlib.sha256(data).hexdigest()
+        operation = self._new_operation('task', '', {})
+
+        async def upload():
+            await asyncio.sleep(self.latency['file'])
+            self.images[fingerprint] = {
+                'fingerprint': fingerprint,
+                'architecture': 'x86_64',
+                'public': False,
+                'size': len(data),
+                'uploaded_at': _now(),
+                'properties': {},
+                'aliases': []
+            }
+            self._finish(operation, {'fingerprint': fingerprint})
+
+        asyncio.ensure_future(upload())
+        return _async(operation)
+
+    def _exec(self, name: str, request: dict) -> tuple:
+        """
+        Start exec operation. Command runs once stdin, stdout
+        and stderr websockets are connected.
+        """
+
+        secrets = {fd: uuid.uuid4().hex for fd in ('0', '1', '2', 'control')}
+        operation = self._new_operation(
+            'websocket', name, {'fds': secrets}
+        )
+        operation['_command'] = request.get('command') or []
+        operation['_sockets'] = dict()
+        return _async(operation)
+
+    def _operation(
+        self, latency: str, name: str, apply, *args
+    ) -> tuple:
+        """
+        Create operation which is applied after latency.
+        """
+
+        operation = self._new_operation('task', name, {})
+
+        async def perform():
+            await asyncio.sleep(self.latency[latency])
+            apply(*args)
+            self._finish(operation)
+
+        asyncio.ensure_future(perform())
+        return _async(operation)
+
+    def _new_operation(self, cls: str, name: str, metadata: dict) -> dict:
+        operation = {
+            'id': str(uuid.uuid4()),
+            'class': cls,
+            'created_at': _now(),
+            'updated_at': _now(),
+            'status': 'Running',
+            'status_code': 103,
+            'resources': {'containers': [f"/1.0/containers/{name}"]},
+            'metadata': metadata,
+            'may_cancel': False,
+            'err': '',
+            '_done': asyncio.Event(),
+        }
+        self.operations[operation['id']] = operation
+        return operation
+
+    def _finish(self, operation: dict, metadata: dict = None) -> None:
+        if metadata is not None:
+            operation['metadata'] = metadata
+        operation['status'] = 'Success'
+        operation['status_code'] = 200
+        operation['updated_at'] = _now()
+        operation['_done'].set()
+
+    def _fail(self, operation: dict, message: str) -> None:
+        operation['status'] = 'Failure'
+        operation['status_code'] = 400
+        operation['err'] = message
+        operation['updated_at'] = _now()
+        operation['_done'].set()
+
+    async def _operations(self, method: str, parts: list, query: dict):
+        operation = self.operations.get(parts[0])
+        if operation is None:
+            return _error(404, "operation not found")
+
+        if parts[1:] == ['wait']:
+            timeout = float(query.get('timeout', -1))
+            try:
+                await asyncio.wait_for(
+                    operation['_done'].wait(),
+                    timeout if timeout >= 0 else None
+                )
+            except asyncio.TimeoutError:
+                pass
+        return _sync(_public(operation))
+
+    async def _websocket(self, target: str, headers: dict, reader, writer):
+        """
+        Serve websocket of exec operation.
+        """
+
+        url = urlsplit(target)
+        parts = url.path.strip('/').split('/')
+        secret = parse_qs(url.query).get('secret', [''])[-1]
+        operation = self.operations.get(parts[2] if len(parts) > 2 else '')
+        fds = (operation or {}).get('metadata', {}).get('fds') or {}
+        fd = next((f for f, s in fds.items() if s == secret), None)
+        if fd is None:
+            writer.write(
+                b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n"
+            )
+            await writer.drain()
+            return
+
+        accept = base64.b64encode(hashlib.sha1(
+            (headers['sec-websocket-key'] + WS_GUID).encode()
+        ).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        sockets = operation['_sockets']
+        sockets[fd] = writer
+        if all(f in sockets for f in ('0', '1', '2')) and \
+                '_running' not in operation:
+            operation['_running'] = True
+            asyncio.ensure_future(self.__run_command(operation))
+
+        # frames from client are read until it closes websocket
+        while True:
+            opcode, _ = await _read_frame(reader)
+            if opcode == WS_CLOSE:
+                writer.write(_frame(WS_CLOSE, b''))
+                await writer.drain()
+                return
+            if opcode == WS_PING:
+                writer.write(_frame(WS_PONG, b''))
+
+    async def __run_command(self, operation: dict) -> None:
+        await asyncio.sleep(self.latency['exec'])
+
+        # provisioning script reports each step as succeeded
+        script = ' '.join(operation['_command'])
+        out = ''.join(f"\n{m} 0\n" for m in STEP_ECHO.findall(script))
+
+        sockets = operation['_sockets']
+        if out:
+            sockets['1'].write(_frame(WS_BINARY, out.encode()))
+        for fd in ('1', '2'):
+            # empty message means end of output
+            sockets[fd].write(_frame(WS_TEXT, b''))
+        self._finish(operation, {'return': 0})
+        if 'control' in sockets:
+            sockets['control'].write(_frame(WS_CLOSE, b''))
+
+    def __delete(self, name: str) -> None:
+        self.containers.pop(name, None)
+
+    def __delete_image(self, fingerprint: str) -> None:
+        self.images.pop(fingerprint, None)
+        for name, target in list(self.aliases.items()):
+            if target == fingerprint:
+                del self.aliases[name]
+
+    def __rename(self, name: str, new_name: str) -> None:
+        container = self.containers.pop(name)
+        container['name'] = new_name
+        self.containers[new_name] = container
+
+    def __set_state(self, name: str, action: str) -> None:
+        container = self.containers[name]
+        if action == 'stop':
+            container['status'], container['status_code'] = 'Stopped', 102
+            container['_started'] = None
+            return
+        container['status'], container['status_code'] = 'Running', 103
+        container['_started'] = time.monotonic()
+        if '_ip' not in container:
+            container['_ip'] = f"10.0.{self._next_ip // 250 + 3}." \
+                               f"{self._next_ip % 250 + 2}"
+            self._next_ip += 1
+
+    def __state(self, container: dict) -> dict:
+        state = {
+            'status': container['status'],
+            'status_code': container['status_code'],
+            'network': None,
+            'pid': 0,
+            'processes': 0,
+        }
+        started = container.get('_started')
+        if started is None:
+            return state
+
+        addresses = [{
+            'family': 'inet6', 'address': 'fe80::1',
+            'netmask': '64', 'scope': 'link'
+        }]
+        if time.monotonic() - started >= self.network_delay:
+            addresses.insert(0, {
+                'family': 'inet', 'address': container['_ip'],
+                'netmask': '24', 'scope': 'global'
+            })
+        state['network'] = {
+            'eth0': {
+                'addresses': addresses, 'state': 'up', 'type': 'broadcast'
+            }
+        }
+        return state
+
+
+_REASONS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 403: 'Forbidden',
+    404: 'Not Found', 409: 'Conflict'
+}
+
+
+def _now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def _sync(metadata: object) -> tuple:
+    return (200, {
+        'type': 'sync', 'status': 'Success', 'status_code': 200,
+        'operation': '', 'error_code': 0, 'error': '',
+        'metadata': metadata
+    })
+
+
+def _async(operation: dict) -> tuple:
+    return (202, {
+        'type': 'async', 'status': 'Operation created', 'status_code': 100,
+        'operation': f"/1.0/operations/{operation['id']}",
+        'error_code': 0, 'error': '',
+        'metadata': _public(operation)
+    })
+
+
+def _error(code: int, message: str) -> tuple:
+    return (code, {
+        'type': 'error', 'status': '', 'status_code': 0,
+        'error_code': code, 'error': message, 'metadata': None
+    })
+
+
+def _public(record: dict) -> dict:
+    """
+    Record without internal keys.
+    """
+
+    return {k: v for k, v in record.items() if not k.startswith('_')}
+
+
+def _host_info() -> dict:
+    return {
+        'api_extensions': ['container_copy_project', 'file_delete'],
+        'api_status': 'stable',
+        'api_version': '1.0',
+        'auth': 'trusted',
+        'public': False,
+        'auth_methods': ['tls'],
+        'environment': {
+            'server': 'lxd', 'server_version': '4.0.0',
+            'driver': 'lxc', 'kernel': 'Linux', 'storage': 'dir'
+        }
+    }
+
+
+def _images(count: int) -> dict:
+    """
+    Images of several OS and releases, count of each.
+    """
+
+    images = dict()
+    for os_name, release in (
+        ('ubuntu', 'bionic'), ('ubuntu', 'focal'), ('centos', '8')
+    ):
+        for index in range(count):
+            fingerprint = hashlib.sha256(
+                f"{os_name}-{release}-{index}".encode()
+            ).hexdigest()
+            images[fingerprint] = {
+                'fingerprint': fingerprint,
+                'architecture': 'x86_64',
+                'public': False,
+                'size': 100 * 1024 * 1024,
+                'uploaded_at': f"2020-05-{index % 28 + 1:02d}T00:00:00Z",
+                'properties': {
+                    'os': os_name.capitalize(),
+                    'release': release,
+                    'architecture': 'amd64',
+                    'description': f"{os_name} {release}"
+                },
+                'aliases': []
+            }
+    return images
+
+
+def _stream_properties(server: str, fingerprint: str) -> dict:
+    """
+    Find image by fingerprint in index of simplestreams server.
+
+    Returns:
+        dict: Properties of image. None if it isn't found.
+    """
+
+    if not server:
+        return None
+    base = server.rstrip('/') + '/'
+    try:
+        with urlopen(urljoin(base, 'streams/v1/index.json')) as response:
+            index = json.loads(response.read().decode())
+        path = next(
+            stream['path'] for stream in index['index'].values()
+            if stream.get('datatype') == 'image-downloads'
+        )
+        with urlopen(urljoin(base, path)) as response:
+            products = json.loads(response.read().decode())['products']
+    except (OSError, ValueError, KeyError, StopIteration):
+        return None
+
+    for product in products.values():
+        for version in product.get('versions', {}).values():
+            for item in version.get('items', {}).values():
+                if fingerprint in (
+                    item.get('sha256'),
+                    item.get('combined_squashfs_sha256'),
+                    item.get('combined_rootxz_sha256')
+                ):
+                    return {
+                        'os': product['os'],
+                        'release': product['release'],
+                        'architecture': product['arch'],
+                        'description': f"{product['os']} "
+                                       f"{product['release']}"
+                    }
+    return None
+
+
+def _container(name: str, config: dict) -> dict:
+    devices = {'eth0': {'type': 'nic', 'network': 'lxdbr0', 'name': 'eth0'}}
+    return {
+        'name': name,
+        'architecture': 'x86_64',
+        'config': config,
+        'expanded_config': config,
+        'devices': {},
+        'expanded_devices': devices,
+        'ephemeral': False,
+        'profiles': ['default'],
+        'stateful': False,
+        'description': '',
+        'created_at': _now(),
+        'last_used_at': _now(),
+        'location': 'none',
+        'status': 'Stopped',
+        'status_code': 102,
+        'type': 'container'
+    }
+
+
+async def _read_request(reader) -> tuple:
+    """
+    Read HTTP request.
+
+    Returns:
+        tuple: Method, target, headers with lowercase names and body.
+               None if connection is closed.
+    """
+
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = dict()
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+
+    body = b''
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+    elif int(headers.get('content-length', 0)) > 0:
+        body = await reader.readexactly(int(headers['content-length']))
+
+    return (method, target, headers, body)
+
+
+async def _read_frame(reader) -> tuple:
+    """
+    Read masked websocket frame from client.
+
+    Returns:
+        tuple: Opcode and payload.
+    """
+
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else b'\0' * 4
+    payload = await reader.readexactly(length)
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return (first & 0x0F, payload)
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    """
+    Build unmasked websocket frame from server.
+    """
+
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def parse_latency(values: list) -> dict:
+    """
+    Parse latencies given as operation=seconds.
+    """
+
+    latency = dict()
+    for value in values or []:
+        operation, _, seconds = value.partition('=')
+        if operation not in LATENCY:
+            raise argparse.ArgumentTypeError(
+                f"Unknown operation {operation}, "
+                f"expected one of {', '.join(LATENCY)}"
+            )
+        latency[operation] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve fake LXD API on unix socket in directory, "
+                    "which should be used as LXD_DIR."
+    )
+    parser.add_argument(
+        '--dir', required=True, metavar='<path>',
+        help="Directory of unix socket."
+    )
+    parser.add_argument(
+        '--latency', action='append', metavar='<operation>=<seconds>',
+        help="Time which operation takes, could be repeated. "
+             f"Operations: {', '.join(LATENCY)}"
+    )
+    parser.add_argument(
+        '--network-delay', type=float, default=NETWORK_DELAY,
+        metavar='<seconds>',
+        help="Time after start before container gets IP address. "
+             f"Default: {NETWORK_DELAY}"
+    )
+    arguments = parser.parse_args()
+
+    server = FakeLXD(
+        arguments.dir, parse_latency(arguments.latency),
+        arguments.network_delay
+    )
+    path = server.start()
+    print(f"Fake LXD is serving on {path}, use LXD_DIR={arguments.dir}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark: startup time of lazy-lxd.
+
+Main module is imported with `python -X importtime` several times,
+cumulative import time and the slowest imported modules are reported.
+Wall time of `lazy-lxd --help` is measured too.
+
+Heavy modules (pylxd, PyInquirer, cryptography, ...) should be loaded
+only on code paths which need them. Benchmark fails if any of them
+is imported at startup, or if import takes longer than budget,
+so it could guard startup time in CI.
+
+Works from source tree or with installed package.
+
+Usage:
+    python benchmarks/import_time.py --runs 10 --budget 150
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MODULE = 'lazy_lxd.lazy_lxd'
+
+# Modules which shouldn't be imported by `lazy-lxd --help`
+HEAVY_MODULES = (
+    'pylxd',
+    'requests',
+    'ws4py',
+    'PyInquirer',
+    'prompt_toolkit',
+    'cryptography',
+    'coolname',
+    'halo',
+    'python_hosts',
+)
+
+
+def parse_option() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure import time of lazy-lxd "
+                    "and check that heavy modules are loaded lazily."
+    )
+    parser.add_argument(
+        '--runs', type=int, default=10, metavar='<number>',
+        help="How many times lazy-lxd is imported. Default: 10"
+    )
+    parser.add_argument(
+        '--budget', type=float, default=None, metavar='<ms>',
+        help="Fail if median import time is longer. Default: no limit"
+    )
+    parser.add_argument(
+        '--top', type=int, default=10, metavar='<number>',
+        help="How many slowest modules are shown. Default: 10"
+    )
+    return parser.parse_args()
+
+
+def environment() -> dict:
+    """
+    Environment where lazy-lxd is importable from source tree,
+    the same way as installed package maps lib and bin.
+    """
+
+    env = dict(os.environ)
+    paths = [ROOT, os.path.join(ROOT, 'lazy_lxd')]
+    if env.get('PYTHONPATH'):
+        paths.append(env['PYTHONPATH'])
+    env['PYTHONPATH'] = os.pathsep.join(paths)
+    return env
+
+
+def import_times() -> dict:
+    """
+    Import main module in new interpreter.
+
+    Returns:
+        dict: Tuples of self and cumulative time in microseconds
+              keyed by module name.
+    """
+
+    run = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {MODULE}"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, env=environment()
+    )
+    if run.returncode != 0:
+        raise SystemExit(f"Unable to import {MODULE}:\n{run.stderr}")
+
+    times = dict()
+    for line in run.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        times[name] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def help_time() -> float:
+    """
+    Wall time of `lazy-lxd --help` in seconds.
+    """
+
+    started = time.monotonic()
+    subprocess.run(
+        [sys.executable, '-c', f"import sys; from {MODULE} import main; "
+                               "sys.argv = ['lazy-lxd', '--help']; main()"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=environment()
+    )
+    return time.monotonic() - started
+
+
+def heavy(times: dict) -> list:
+    """
+    Heavy modules which were imported.
+    """
+
+    return sorted(name for name in times if name in HEAVY_MODULES)
+
+
+def main():
+    arguments = parse_option()
+
+    runs = [import_times() for _ in range(arguments.runs)]
+    cumulative = [times[MODULE][1] / 1000 for times in runs]
+    helps = [help_time() * 1000 for _ in range(arguments.runs)]
+
+    print(f"import {MODULE}: median {statistics.median(cumulative):.1f} ms, "
+          f"min {min(cumulative):.1f} ms")
+    print(f"lazy-lxd --help: median {statistics.median(helps):.1f} ms, "
+          f"min {min(helps):.1f} ms")
+
+    last = runs[-1]
+    print(f"Slowest modules (self time, {len(last)} imported):")
+    slowest = sorted(last.items(), key=lambda i: i[1][0], reverse=True)
+    for name, (self_time, _) in slowest[:arguments.top]:
+        print(f"    {self_time / 1000:8.1f} ms  {name}")
+
+    failed = False
+    loaded = heavy(last)
+    if loaded:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(loaded)}")
+        failed = True
+
+    median = statistics.median(cumulative)
+    if arguments.budget is not None and median > arguments.budget:
+        print(f"FAIL: import takes {median:.1f} ms, "
+              f"budget is {arguments.budget:.1f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
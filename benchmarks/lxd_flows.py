@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark: lazy-lxd flows against fake LXD daemon.
+
+Fake LXD from fake_lxd.py is started on a unix socket in temporary
+directory, every operation takes configured time. Then lazy-lxd flows
+are performed many times and latency of each one is measured:
+
+    fingerprint  LXDClient setup with image lookup and fingerprint
+    run          container.run: start and wait for network
+    launch       LXDClient create, start and SSH setup, one by one
+    batch        create_batch: containers thru thread pool
+    batch-async  create_batch_async: containers thru asyncio client
+    prefetch     prefetch: missing images downloaded at the same time
+
+Throughput and p50/p99 latency are reported. Results could be saved
+and compared with saved baseline, benchmark fails if p50 or p99
+of some flow became slower than baseline more than tolerance.
+
+Usage:
+    python benchmarks/lxd_flows.py --runs 20 --save baseline.json
+    python benchmarks/lxd_flows.py --runs 20 --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lazy_lxd'))
+
+from fake_lxd import FakeLXD, LATENCY, NETWORK_DELAY, parse_latency  # noqa
+
+
+FLOWS = (
+    'fingerprint', 'run', 'launch', 'batch', 'batch-async', 'prefetch'
+)
+SSH_KEY = b'ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIBenchmarkKey bench@lazy-lxd'
+
+
+def parse_option() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure lazy-lxd flows against fake LXD daemon."
+    )
+    parser.add_argument(
+        '--flow', dest='flows', action='append', choices=FLOWS,
+        help="Flow to measure, could be repeated. Default: all"
+    )
+    parser.add_argument(
+        '--runs', type=int, default=20, metavar='<number>',
+        help="How many times each flow is performed, "
+             "or containers in batch, or images to prefetch. Default: 20"
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=8, metavar='<number>',
+        help="Containers or images handled at once in batch "
+             "and prefetch flows. Default: 8"
+    )
+    parser.add_argument(
+        '--images', type=int, default=1, metavar='<number>',
+        help="Images of each OS in fake storage. Default: 1"
+    )
+    parser.add_argument(
+        '--latency', action='append', metavar='<operation>=<seconds>',
+        help="Time which operation of fake LXD takes, could be repeated. "
+             f"Operations: {', '.join(LATENCY)}"
+    )
+    parser.add_argument(
+        '--network-delay', type=float, default=NETWORK_DELAY,
+        metavar='<seconds>',
+        help="Time after start before container gets IP address. "
+             f"Default: {NETWORK_DELAY}"
+    )
+    parser.add_argument(
+        '--save', metavar='<file>',
+        help="Save results to JSON file, to use it as baseline later."
+    )
+    parser.add_argument(
+        '--baseline', metavar='<file>',
+        help="Compare results with saved ones and fail on regression."
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2, metavar='<ratio>',
+        help="Allowed slowdown relative to baseline. Default: 0.2"
+    )
+    return parser.parse_args()
+
+
+def percentile(values: list, share: float) -> float:
+    """
+    Percentile by nearest rank.
+    """
+
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(share * len(ordered))) - 1))
+    return ordered[index]
+
+
+def timed(function, *args) -> float:
+    """
+    Perform function and return spent seconds.
+    """
+
+    started = time.monotonic()
+    function(*args)
+    return time.monotonic() - started
+
+
+def client(name: str) -> object:
+    from lib.lxd import LXDClient
+
+    return LXDClient(name=name, os_template='ubuntu', os_version='bionic')
+
+
+def flow_fingerprint(arguments: argparse.Namespace, server: FakeLXD):
+    latencies = [
+        timed(lambda: client(f"fp-{i}").resolve_image_fingerprint())
+        for i in range(arguments.runs)
+    ]
+    return latencies, sum(latencies)
+
+
+def flow_run(arguments: argparse.Namespace, server: FakeLXD):
+    from lib.lxd import shared_client
+    from lib.lxd.container import run
+
+    pylxd_client = shared_client()
+    fingerprint = client(None).resolve_image_fingerprint()
+    latencies = list()
+    for i in range(arguments.runs):
+        container = pylxd_client.containers.create({
+            'name': f"run-{i}",
+            'source': {'type': 'image', 'fingerprint': fingerprint}
+        }, wait=True)
+        latencies.append(timed(run, container))
+    return latencies, sum(latencies)
+
+
+def flow_launch(arguments: argparse.Namespace, server: FakeLXD):
+    def launch(lxd: object) -> None:
+        lxd.create_container()
+        lxd.start_container()
+        lxd.setup_ssh(SSH_KEY)
+
+    latencies = [
+        timed(launch, client(f"launch-{i}")) for i in range(arguments.runs)
+    ]
+    return latencies, sum(latencies)
+
+
+def batch_clients(arguments: argparse.Namespace, prefix: str) -> list:
+    clients = [client(f"{prefix}-{i}") for i in range(arguments.runs)]
+    fingerprint = clients[0].resolve_image_fingerprint()
+    for lxd in clients:
+        lxd.image_fingerprint = fingerprint
+    return clients
+
+
+def flow_batch(arguments: argparse.Namespace, server: FakeLXD):
+    from lib.lxd import create_batch
+
+    clients = batch_clients(arguments, 'batch')
+    started = time.monotonic()
+    results = create_batch(
+        clients, arguments.concurrency,
+        lambda lxd: lxd.setup_ssh(SSH_KEY)
+    )
+    return _batch_latencies(results), time.monotonic() - started
+
+
+def flow_batch_async(arguments: argparse.Namespace, server: FakeLXD):
+    from lib.lxd import create_batch_async
+
+    clients = batch_clients(arguments, 'batch-async')
+    started = time.monotonic()
+    results = create_batch_async(
+        clients, arguments.concurrency,
+        lambda lxd: lxd.ssh_provisioning(SSH_KEY)
+    )
+    return _batch_latencies(results), time.monotonic() - started
+
+
+def flow_prefetch(arguments: argparse.Namespace, server: FakeLXD):
+    from lib.lxd import prefetch, SimpleStreams
+
+    # fake storage has no debian images, so all of them are downloaded
+    targets = [('debian', str(i), 'amd64') for i in range(arguments.runs)]
+    # without index of server fake LXD resolves aliases by itself
+    streams = SimpleStreams('http://127.0.0.1:9')
+    started = time.monotonic()
+    results = prefetch(targets, arguments.concurrency, streams=streams)
+    failed = [r for r in results if r.error is not None]
+    if failed:
+        raise RuntimeError(f"{'/'.join(failed[0].target)}: {failed[0].error}")
+    return [r.elapsed for r in results], time.monotonic() - started
+
+
+def _batch_latencies(results: list) -> list:
+    failed = [r for r in results if r.error is not None]
+    if failed:
+        raise RuntimeError(f"{failed[0].name}: {failed[0].error}")
+    return [r.elapsed for r in results]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Find flows which became slower than baseline.
+
+    Returns:
+        list: Messages about regressions.
+    """
+
+    regressions = list()
+    for flow, result in results.items():
+        before = baseline.get(flow)
+        if before is None:
+            continue
+        for metric in ('p50', 'p99'):
+            if result[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{flow} {metric}: {result[metric] * 1000:.1f} ms, "
+                    f"baseline {before[metric] * 1000:.1f} ms"
+                )
+    return regressions
+
+
+def main():
+    arguments = parse_option()
+
+    # errors of lazy-lxd are reported by benchmark itself
+    log = logging.getLogger('lazy_lxd')
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+    # spinner frames shouldn't get into results table
+    from lib.logger import set_spinner_enabled
+    set_spinner_enabled(False)
+
+    flows = arguments.flows or FLOWS
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix='fake-lxd-') as directory:
+        server = FakeLXD(
+            directory, parse_latency(arguments.latency),
+            arguments.network_delay, arguments.images
+        )
+        server.start()
+        # clients find fake LXD the same way as real one
+        os.environ['LXD_DIR'] = directory
+        try:
+            # connection setup isn't a part of any flow
+            from lib.lxd import shared_client
+            shared_client()
+
+            for flow in flows:
+                requests = server.requests
+                function = globals()[f"flow_{flow.replace('-', '_')}"]
+                latencies, elapsed = function(arguments, server)
+                results[flow] = {
+                    'runs': len(latencies),
+                    'throughput': len(latencies) / elapsed,
+                    'p50': percentile(latencies, 0.5),
+                    'p99': percentile(latencies, 0.99),
+                    'requests': (server.requests - requests) / len(latencies)
+                }
+        finally:
+            server.stop()
+
+    print(f"{'Flow':<12} {'Runs':>5} {'Ops/s':>8} {'p50, ms':>9} "
+          f"{'p99, ms':>9} {'Requests':>9}")
+    for flow, result in results.items():
+        print(f"{flow:<12} {result['runs']:>5} {result['throughput']:>8.2f} "
+              f"{result['p50'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f} "
+              f"{result['requests']:>9.1f}")
+
+    if arguments.save is not None:
+        with open(arguments.save, 'w') as fl:
+            json.dump(results, fl, indent=2)
+
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as fl:
+            regressions = compare(results, json.load(fl), arguments.tolerance)
+        for regression in regressions:
+            print(f"FAIL: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,69 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import argparse
+import subprocess
 
-from ipaddress import IPv4Address, AddressValueError
-from python_hosts import Hosts, HostsEntry
-from python_hosts.exception import UnableToWriteHosts
+
+# Entries added by lazy-lxd are kept between these lines
+BLOCK_BEGIN = '# lazy-lxd begin'
+BLOCK_END = '# lazy-lxd end'
+
+# Resolvers which could forward domain of containers to LXD bridge
+RESOLVERS = ('resolved', 'dnsmasq')
+# Per-link DNS of bridge is set by systemd unit, as LXD docs suggest
+RESOLVED_UNIT = """[Unit]
+Description=Resolving of LXD containers on {bridge}, by lazy-lxd
+BindsTo=sys-subsystem-net-devices-{bridge}.device
+After=sys-subsystem-net-devices-{bridge}.device
+
+[Service]
+Type=oneshot
+ExecStart=/usr/bin/resolvectl dns {bridge} {dns}
+ExecStart=/usr/bin/resolvectl domain {bridge} ~{domain}
+
+[Install]
+WantedBy=sys-subsystem-net-devices-{bridge}.device
+"""
+DNSMASQ_CONF = """# Resolving of LXD containers on {bridge}, by lazy-lxd
+server=/{domain}/{dns}
+"""
+
+
+def check_ip(arg: str) -> str:
+    """
+    Verify IP address.
+    IP address should be ip address in human readable notation.
+    """
+    # lazy-lxd imports this module only for paths of configs
+    from ipaddress import IPv4Address, AddressValueError
+
+    try:
+        IPv4Address(arg)
+        return arg
+    except AddressValueError:
+        raise ValueError(f"{arg} is not a valid IP address")
+
+
+def check_hostname(arg: str) -> str:
+    """
+    Verify hostname.
+    Hosname shouldn't contains symbols: !, %, [, ], {, }, _, ;, :,
+                                        <, >, ?, ,, $, #, ^, *, (, ),
+                                        ', ", `, \\, /
+    """
+    forbidden_symbols = [
+        '!', '%', '[', ']', '{', '}', '_', ';', ':', '<', '>', '?',
+        ',', '$', '#', '^', '*', '(', ')', '\'', '"', '`', '\\', '/'
+    ]
+    for symbol in forbidden_symbols:
+        if arg.find(symbol) != -1:
+            raise ValueError(
+                f"Hostname {arg} contains forbidden symbol {symbol}"
+            )
+
+    return arg
 
 
 def parse_option() -> object:
@@ -19,80 +77,278 @@ def parse_option() -> object:
         object: The parser object with calling parse_args
     """
 
-    def check_ip(parser: argparse.ArgumentParser, arg):
-        """
-        Verify argument from argparse.
-        IP address should be ip address in human readable notation.
-        """
-        try:
-            IPv4Address(arg)
-            return arg
-        except AddressValueError:
-            parser.error(f"{arg} is not a valid IP address")
-
-    def check_hostname(parser: argparse.ArgumentParser, arg):
-        """
-        Verify argument from argparse.
-        Hosname shouldn't contains symbols: !, %, [, ], {, }, _, ;, :,
-                                            <, >, ?, ,, $, #, ^, *, (, ),
-                                            ', ", `, \\, /
-        """
-        forbidden_symbols = [
-            '!', '%', '[', ']', '{', '}', '_', ';', ':', '<', '>', '?',
-            ',', '$', '#', '^', '*', '(', ')', '\'', '"', '`', '\\', '/'
-        ]
-        for symbol in forbidden_symbols:
-            if arg.find(symbol) != -1:
-                parser.error(
-                    f"Hostname {arg} contains forbidden symbol {symbol}"
-                )
-
-        return arg
-
     parser = argparse.ArgumentParser(
-        description="Fill the /etc/hosts with hostname "
-        "and its ip address from arguments."
+        description="Fill the /etc/hosts with hostnames "
+        "and their ip addresses from arguments. "
+        "All entries are written by one rewrite of hosts file. "
+        "Or configure local resolver to forward domain of containers "
+        "to DNS server of LXD bridge, which knows all containers."
     )
     parser.add_argument(
-        'hostname', type=lambda a: check_hostname(parser, a),
-        help="Hostname with which the ip will be associated."
+        'hosts_file', help="Path hosts file which needs to fill. "
+        "Or path of resolver config with --resolver."
     )
     parser.add_argument(
-        'ip', type=lambda a: check_ip(parser, a),
-        help="IP address ehre requests will go."
+        'pairs', nargs='*', metavar='hostname ip',
+        help="Hostnames with IP addresses where requests will go."
+    )
+    parser.add_argument(
+        '--stdin', action='store_true',
+        help="Read pairs of hostname and IP address from stdin, "
+             "one pair per line."
+    )
+    parser.add_argument(
+        '--keep', nargs='*', metavar='hostname',
+        help="Hostnames which still exist. Other entries "
+             "added by lazy-lxd earlier are removed as stale."
+    )
+
+    parser.add_argument(
+        '--resolver', choices=RESOLVERS,
+        help="Configure resolver instead of filling hosts file."
     )
     parser.add_argument(
-        'hosts_file', help="Path hosts file which needs to fill"
+        '--bridge', default='lxdbr0', help="LXD bridge of containers."
+    )
+    parser.add_argument(
+        '--dns', type=lambda a: _checked(parser, check_ip, a),
+        help="Address of DNS server on LXD bridge."
+    )
+    parser.add_argument(
+        '--domain', default='lxd',
+        type=lambda a: _checked(parser, check_hostname, a),
+        help="Domain of containers."
+    )
+
+    arguments = parser.parse_args()
+    if arguments.resolver is not None and arguments.dns is None:
+        parser.error("Resolver needs address of DNS server")
+
+    pairs = list(arguments.pairs)
+    if arguments.stdin:
+        for line in sys.stdin:
+            pairs.extend(line.split())
+    if len(pairs) % 2 != 0:
+        parser.error("Every hostname should have IP address")
+
+    arguments.pairs = list()
+    for hostname, ip in zip(pairs[::2], pairs[1::2]):
+        try:
+            arguments.pairs.append((check_hostname(hostname), check_ip(ip)))
+        except ValueError as e:
+            parser.error(str(e))
+
+    return arguments
+
+
+def _checked(parser: argparse.ArgumentParser, check, arg: str) -> str:
+    """
+    Verify argument from argparse by check function.
+    """
+    try:
+        return check(arg)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def render_resolver(resolver: str, bridge: str, dns: str, domain: str) -> str:
+    """
+    Render config of resolver which forwards domain of containers
+    to DNS server of LXD bridge.
+
+    Args:
+        resolver (str): Type of resolver, resolved or dnsmasq.
+        bridge (str): LXD bridge of containers.
+        dns (str): Address of DNS server on LXD bridge.
+        domain (str): Domain of containers.
+
+    Returns:
+        str: Content of config.
+    """
+
+    template = RESOLVED_UNIT if resolver == 'resolved' else DNSMASQ_CONF
+    return template.format(bridge=bridge, dns=dns, domain=domain)
+
+
+def resolver_path(resolver: str, bridge: str) -> str:
+    """
+    Default path of resolver config.
+
+    Args:
+        resolver (str): Type of resolver, resolved or dnsmasq.
+        bridge (str): LXD bridge of containers.
+
+    Returns:
+        str: Path of config.
+    """
+
+    if resolver == 'resolved':
+        return f"/etc/systemd/system/lazy-lxd-dns-{bridge}.service"
+    return "/etc/dnsmasq.d/lazy-lxd.conf"
+
+
+def reload_commands(resolver: str, path: str) -> list:
+    """
+    Commands which apply changed config of resolver.
+
+    Args:
+        resolver (str): Type of resolver, resolved or dnsmasq.
+        path (str): Path of resolver config.
+
+    Returns:
+        list: Commands as lists of arguments.
+    """
+
+    if resolver == 'resolved':
+        unit = os.path.basename(path)
+        return [
+            ['systemctl', 'daemon-reload'],
+            ['systemctl', 'enable', unit],
+            ['systemctl', 'restart', unit]
+        ]
+    return [['systemctl', 'restart', 'dnsmasq']]
+
+
+def configure_resolver(arguments: argparse.Namespace) -> None:
+    """
+    Write resolver config and apply it.
+    Nothing is done if config is up to date,
+    so containers created later don't need any changes.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+    """
+
+    path = arguments.hosts_file
+    content = render_resolver(
+        arguments.resolver, arguments.bridge,
+        arguments.dns, arguments.domain
     )
+    try:
+        with open(path) as fl:
+            if fl.read() == content:
+                return
+    except OSError:
+        pass
 
-    return parser.parse_args()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_hosts(path, content)
+    except OSError as e:
+        print(f"Unable to write to {path}: {e}", file=sys.stderr, end='')
+        sys.exit(1)
+
+    for command in reload_commands(arguments.resolver, path):
+        run = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        if run.returncode != 0:
+            # so config is applied again on next run
+            os.remove(path)
+            print(run.stderr, file=sys.stderr, end='')
+            sys.exit(1)
+
+
+def split_block(lines: list) -> tuple:
+    """
+    Split hosts file to lines around lazy-lxd block and entries of block.
+
+    Args:
+        lines (list): Lines of hosts file.
+
+    Returns:
+        tuple: Lines before block, entries of block as dict
+               of IP addresses keyed by hostname, and lines after block.
+    """
+
+    if BLOCK_BEGIN not in lines:
+        return (lines, dict(), [])
+
+    begin = lines.index(BLOCK_BEGIN)
+    try:
+        end = lines.index(BLOCK_END, begin)
+    except ValueError:
+        end = len(lines)
+
+    entries = dict()
+    for line in lines[begin + 1:end]:
+        fields = line.split()
+        if len(fields) >= 2 and not fields[0].startswith('#'):
+            for hostname in fields[1:]:
+                entries[hostname] = fields[0]
+
+    return (lines[:begin], entries, lines[end + 1:])
+
+
+def write_hosts(path: str, content: str) -> None:
+    """
+    Replace hosts file by new content atomically.
+    Mode and owner of file are kept, new file is readable by all.
+    Hosts file which is mount point, e.g. inside containers,
+    can't be replaced, so it's rewritten in place.
+
+    Args:
+        path (str): Path to hosts file.
+        content (str): New content of hosts file.
+    """
+
+    stat = os.stat(path) if os.path.exists(path) else None
+    tmp_path = f"{path}.lazy-lxd.tmp"
+    try:
+        with open(tmp_path, 'w') as fl:
+            fl.write(content)
+        os.chmod(tmp_path, stat.st_mode if stat is not None else 0o644)
+        if os.getuid() == 0 and stat is not None:
+            os.chown(tmp_path, stat.st_uid, stat.st_gid)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with open(path, 'w') as fl:
+            fl.write(content)
 
 
 def main():
     arguments = parse_option()
 
-    hostname = arguments.hostname
-    ip_addr = arguments.ip
-    hosts_file = Hosts(arguments.hosts_file)
+    if arguments.resolver is not None:
+        configure_resolver(arguments)
+        return
 
-    # chechk if hostname, ip pair esists in hosts file
-    if hosts_file.exists(address=ip_addr, names=hostname):
-        print(
-            f"{ip_addr} {hostname} pair exists in {hosts_file.hosts_path}",
-            file=sys.stderr, end=''
-        )
+    try:
+        with open(arguments.hosts_file) as fl:
+            lines = fl.read().splitlines()
+    except OSError as e:
+        print(f"Unable to read {arguments.hosts_file}: {e}",
+              file=sys.stderr, end='')
         sys.exit(1)
 
-    new_pair = HostsEntry(entry_type='ipv4', address=ip_addr, names=[hostname])
+    before, entries, after = split_block(lines)
+    updated = dict(entries)
+    if arguments.keep is not None:
+        keep = set(arguments.keep)
+        updated = {
+            hostname: ip for hostname, ip in updated.items()
+            if hostname in keep
+        }
+    for hostname, ip in arguments.pairs:
+        updated[hostname] = ip
+
+    # nothing to write, file is left untouched
+    if updated == entries:
+        return
+
+    block = [BLOCK_BEGIN]
+    block += [f"{ip} {hostname}" for hostname, ip in updated.items()]
+    block += [BLOCK_END]
+    content = '\n'.join(before + block + after) + '\n'
+
     try:
-        hosts_file.add([new_pair])
-        hosts_file.write()
-    except UnableToWriteHosts:
-        print(
-            f"Unable to write to {hosts_file.hosts_path}",
-            file=sys.stderr,
-            end=''
-        )
+        write_hosts(arguments.hosts_file, content)
+    except OSError as e:
+        print(f"Unable to write to {arguments.hosts_file}: {e}",
+              file=sys.stderr, end='')
         sys.exit(1)
 
 
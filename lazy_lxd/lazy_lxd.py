@@ -13,12 +13,16 @@ import argparse
 import subprocess
 import logging
 from shutil import which
+from typing import TYPE_CHECKING
 
 from lazy_lxd import __version__
 
-from lib.lxd import LXDClient
-from lib.ansible import AnsibleClient
-from lib.keys import SSHKeys
+# LXD, Ansible and keys clients pull pylxd and cryptography,
+# so they are imported by functions which create containers,
+# and --help, --version or wrong options don't wait for them.
+if TYPE_CHECKING:
+    from lib.lxd import LXDClient
+from lib.config import load_manifest, cache_path
 from lib import (
     logger,
     inquirer,
@@ -79,12 +83,195 @@ def parse_option() -> object:
         help="Public ssh key if you want use an existing one. "
              "Should be file. Otherwise it will be generated."
     )
+    parser.add_argument(
+        '--ssh-key-type', dest='ssh_key_type', choices=['ed25519', 'rsa'],
+        default='ed25519',
+        help="Type of SSH key if it will be generated. Default: ed25519"
+    )
+    parser.add_argument(
+        '--ssh-key-per-container', dest='ssh_key_per_container',
+        action='store_true',
+        help="Generate SSH key for each container by its name. "
+             "Otherwise one key ~/.ssh/lazy-lxd is generated "
+             "and reused for all containers. Containers of batch "
+             "share one key, so it can't be used with --count or manifest."
+    )
     parser.add_argument(
         '--playbooks-path', dest='playbooks_path', metavar='<path>',
         type=lambda p: is_exists_andible_directory(parser, p),
         help="Path to directory with Ansible playbooks"
         "which needs to run into container."
     )
+    parser.add_argument(
+        '--count', dest='count', metavar='<number>', type=int, default=1,
+        help="Number of containers which will be created at once. "
+             "Names get numeric suffix if name is set. Default: 1"
+    )
+    parser.add_argument(
+        '--manifest', dest='manifest', metavar='<file>',
+        help="YAML (or JSON) file with list of containers "
+             "which will be created at once. "
+             "Each item could have keys: name, os, release, count."
+    )
+    parser.add_argument(
+        '--concurrency', dest='concurrency', metavar='<number>', type=int,
+        default=4,
+        help="How many containers could be created at the same time "
+             "in batch mode. Default: 4"
+    )
+    parser.add_argument(
+        '--lxd-asyncio', dest='lxd_asyncio', action='store_true',
+        help="In batch mode talk to LXD thru asyncio client instead "
+             "of thread per container. All containers are handled "
+             "in one thread, their requests overlap."
+    )
+    parser.add_argument(
+        '--network-timeout', dest='network_timeout', metavar='<seconds>',
+        type=float, default=30.0,
+        help="How long to wait for container network. Default: 30"
+    )
+    parser.add_argument(
+        '--network-poll-interval', dest='network_interval',
+        metavar='<seconds>', type=float, default=0.1,
+        help="Initial delay between checks of container network. "
+             "It grows with every check up to max interval. Default: 0.1"
+    )
+    parser.add_argument(
+        '--network-poll-max-interval', dest='network_max_interval',
+        metavar='<seconds>', type=float, default=1.0,
+        help="Upper limit of delay between checks of container network. "
+             "Default: 1"
+    )
+    parser.add_argument(
+        '--no-image-cache', dest='image_cache', action='store_false',
+        help="Don't keep list of local LXD images in on-disk cache. "
+             "Images will be listed from LXD on every run."
+    )
+    parser.add_argument(
+        '--image-server', dest='image_server', metavar='<url|directory>',
+        default='https://images.linuxcontainers.org',
+        help="Simplestreams server where images are downloaded from, "
+             "or directory of its local mirror, which works without "
+             "network. Default: https://images.linuxcontainers.org"
+    )
+    parser.add_argument(
+        '--streams-ttl', dest='streams_ttl', metavar='<seconds>',
+        type=float, default=3600.0,
+        help="How long index of images from server is used from "
+             "on-disk cache without asking server. Later it's refreshed "
+             "only if changed. Default: 3600"
+    )
+    parser.add_argument(
+        '--ssh-image', dest='ssh_image', action='store_true',
+        help="Create container from local image with OpenSSH server "
+             "installed already. Image is built from requested one "
+             "on first use and rebuilt when requested image changes."
+    )
+    parser.add_argument(
+        '--from-container', dest='source_container', metavar='<name>',
+        help="Create container as copy of existing one instead of image. "
+             "Snapshot could be copied as <name>/<snapshot>. It's much "
+             "faster on btrfs and zfs storage pools. Source container "
+             "should be stopped."
+    )
+    parser.add_argument(
+        '--pool-size', dest='pool_size', metavar='<number>',
+        type=int, default=0,
+        help="Keep so many started and ssh-ready containers of requested "
+             "OS and release in reserve. Container is taken from the pool "
+             "and renamed instead of creating new one, then pool is refilled "
+             "in background. Implies --ssh-image. Default: 0, no pool"
+    )
+    # internal, used by background process which refills pool
+    parser.add_argument(
+        '--pool-refill', dest='pool_refill', metavar='<fingerprint>',
+        help=argparse.SUPPRESS
+    )
+    parser.add_argument(
+        '--playbook-workers', dest='playbook_workers', metavar='<number>',
+        type=int, default=1,
+        help="How many Ansible playbooks could run at the same time. "
+             "Dependencies between playbooks are read from "
+             ".lazy-lxd.yml in playbooks directory. Without it "
+             "playbooks run one by one. Default: 1"
+    )
+    parser.add_argument(
+        '--ansible-forks', dest='ansible_forks', metavar='<number>',
+        type=int,
+        help="How many containers Ansible handles in parallel "
+             "in batch mode. Default: all containers at once"
+    )
+    parser.add_argument(
+        '--ansible-stream', dest='ansible_stream', action='store_true',
+        help="Show progress of Ansible playbooks while they are running. "
+             "Requires ansible.posix collection."
+    )
+    parser.add_argument(
+        '--ansible-connection', dest='ansible_connection',
+        choices=['ssh', 'lxd'], default='ssh',
+        help="How Ansible reaches container. lxd runs playbooks thru "
+             "local LXD right after container start, SSH isn't needed. "
+             "Requires community.general collection. Default: ssh"
+    )
+    parser.add_argument(
+        '--no-ssh-multiplexing', dest='ssh_multiplexing',
+        action='store_false',
+        help="Don't keep SSH master connection to container "
+             "while playbooks are running, and don't use pipelining. "
+             "Each Ansible task will open new SSH connection."
+    )
+    parser.add_argument(
+        '--playbooks', dest='playbooks', metavar='<names>',
+        type=lambda names: [n for n in names.split(',') if n],
+        help="Comma separated names of Ansible playbooks which needs "
+             "to run. Otherwise they will be asked."
+    )
+    parser.add_argument(
+        '--fill-hosts', dest='fill_hosts', action='store_true',
+        default=None,
+        help="Fill /etc/hosts by container name without asking."
+    )
+    parser.add_argument(
+        '--no-fill-hosts', dest='fill_hosts', action='store_false',
+        help="Don't fill /etc/hosts and don't ask about it."
+    )
+    parser.add_argument(
+        '--hosts-backend', dest='hosts_backend',
+        choices=['hosts', 'resolved', 'dnsmasq'], default='hosts',
+        help="How containers names become resolvable. hosts: fill "
+             "/etc/hosts for each container. resolved, dnsmasq: once "
+             "configure systemd-resolved or dnsmasq to forward domain "
+             "of containers (<name>.lxd) to DNS of LXD bridge. "
+             "Default: hosts"
+    )
+    parser.add_argument(
+        '-y', '--yes', dest='unattended', action='store_true',
+        help="Don't ask anything, use answers by default: download "
+             "image, create SSH keys, choose the newest image and "
+             "all playbooks, generate name if it's taken. /etc/hosts is "
+             "filled only with --fill-hosts, sudo shouldn't ask password."
+    )
+    parser.add_argument(
+        '--config', dest='config', metavar='<file>',
+        help="YAML (or JSON) file with script arguments. Keys are long "
+             "arguments names, e.g. os, release, playbooks-path. "
+             "Arguments from command line have priority. "
+             "It also could contain list of containers under "
+             "'containers' key, like manifest."
+    )
+    parser.add_argument(
+        '--profile', dest='profile', action='store_true',
+        help="Measure time of each operation: image lookup and download, "
+             "creating and starting containers, commands inside them, "
+             "keys, hosts filling and playbooks. Timing table is printed "
+             "at the end, trace in OpenTelemetry JSON format is saved "
+             "to profile.json in lazy-lxd cache."
+    )
+    parser.add_argument(
+        '--profile-output', dest='profile_output', metavar='<file>',
+        help="Save trace of --profile to file instead of lazy-lxd cache. "
+             "Implies --profile."
+    )
     parser.add_argument(
         '-v', '--verbose', dest='debug_level', action='store_true',
         help="Verbose output. "
@@ -96,7 +283,87 @@ def parse_option() -> object:
         help="Show version and exit."
     )
 
-    return parser.parse_args()
+    commands = parser.add_subparsers(
+        dest='command', metavar='<command>',
+        description="Without command container is created."
+    )
+    prefetch = commands.add_parser(
+        'prefetch',
+        help="Download images to local LXD storage ahead of time.",
+        description="Download images of several OS and releases "
+                    "to local LXD storage at the same time. "
+                    "Images which are present already are skipped."
+    )
+    prefetch.add_argument(
+        'targets', nargs='+', metavar='<os/release[/architecture]>',
+        help="Images to download, e.g. ubuntu/18.04 centos/7/amd64"
+    )
+    prefetch.add_argument(
+        '--arch', dest='architecture', metavar='<architecture>',
+        help="Architecture of images which don't set it, e.g. amd64. "
+             "Default: architecture of host"
+    )
+    prefetch.add_argument(
+        '--concurrency', dest='concurrency', metavar='<number>', type=int,
+        default=4,
+        help="How many images could be downloaded at the same time. "
+             "Default: 4"
+    )
+
+    parser.set_defaults(containers=None)
+
+    arguments = parser.parse_args()
+    if arguments.config is not None:
+        apply_config(parser, arguments.config)
+        arguments = parser.parse_args()
+
+    return arguments
+
+
+def apply_config(parser: argparse.ArgumentParser, path: str) -> None:
+    """
+    Read config file and use its values as arguments defaults.
+    So arguments from command line override config.
+    Keys are long arguments names without dashes prefix,
+    dashes could be replaced by underscores.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser of script arguments.
+        path (str): Path to config file.
+    """
+
+    try:
+        config = load_manifest(path)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not isinstance(config, dict):
+        parser.error(f"Config {path} should be a mapping of arguments.")
+
+    actions = dict()
+    for action in parser._actions:
+        for option in action.option_strings:
+            if option.startswith('--'):
+                actions[option[2:].replace('-', '_')] = action
+
+    defaults = dict()
+    for key, value in config.items():
+        key = str(key).replace('-', '_')
+        if key == 'containers':
+            defaults['containers'] = value
+            continue
+        if key not in actions or \
+                key in ('config', 'help', 'version', 'pool_refill'):
+            parser.error(f"Unknown argument {key} in config {path}.")
+
+        action = actions[key]
+        if isinstance(action, argparse._StoreFalseAction):
+            value = not value
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            # converted by argument type as if it came from command line
+            value = str(value)
+        defaults[action.dest] = value
+
+    parser.set_defaults(**defaults)
 
 
 def check_required_program_instance(*program: list) -> None:
@@ -176,19 +443,27 @@ def check_sudo_password(password: str) -> bool:
 
 
 def filling_hosts(
-        hostname: str, ip: str, password: str, script_path: str
+        hosts: list, password: str, script_path: str, existing: list = None,
+        resolver: dict = None
 ) -> bool:
     """
-    Fill the file /etc/hosts with container hostname and it IP address.
+    Fill the file /etc/hosts with containers hostnames and their IP addresses.
     Running separate script `bin/fill-hosts.py` for that.
+    All containers are written by one run of script, so sudo is called once.
     Will using super user access and password obtained from user earlier.
 
     Args:
-        hostname (str): Name for 1st script argument.
-        ip (str): IP address for 2nd script argument.
-        password (str): Password for sudo.
+        hosts (list): Pairs of container name and IP address.
+        password (str): Password for sudo. If it's None,
+                        sudo fails instead of asking password.
         script_path (str): Path of main script for looking for
                            fill-hosts script.
+        existing (list): Names of all existing containers.
+                         Entries of other containers are removed as stale.
+                         Nothing is removed if not set.
+        resolver (dict): Resolver backend, LXD bridge, its DNS server
+                         and domain of containers. If it's set,
+                         local resolver is configured instead of /etc/hosts.
 
     Returns:
         bool: True if script executed successfully. Otherwise, False.
@@ -196,16 +471,32 @@ def filling_hosts(
 
     log = logging.getLogger('lazy_lxd')
 
-    script_args = (
-        f"sudo {sys.executable} {fill_hosts.__file__} "
-        f"{hostname} {ip} /etc/hosts"
-    )
-    script_run = subprocess.Popen(script_args.split(' '),
-                                  stdin=subprocess.PIPE,
-                                  stdout=subprocess.PIPE,
-                                  stderr=subprocess.PIPE,
-                                  universal_newlines=True)
-    out, err = script_run.communicate(password)
+    # without password sudo shouldn't wait for it
+    sudo = ['sudo'] if password is not None else ['sudo', '-n']
+    script_args = sudo + [sys.executable, fill_hosts.__file__]
+    if resolver is not None:
+        script_args += [
+            fill_hosts.resolver_path(resolver['backend'], resolver['bridge']),
+            '--resolver', resolver['backend'],
+            '--bridge', resolver['bridge'],
+            '--dns', resolver['dns'],
+            '--domain', resolver['domain']
+        ]
+    else:
+        script_args += ['/etc/hosts']
+        for hostname, ip in hosts:
+            script_args += [hostname, ip]
+        if existing is not None:
+            script_args += ['--keep'] + list(existing)
+
+    backend = resolver['backend'] if resolver is not None else 'hosts'
+    with logger.span('hosts.fill', backend=backend, hosts=len(hosts)):
+        script_run = subprocess.Popen(script_args,
+                                      stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE,
+                                      universal_newlines=True)
+        out, err = script_run.communicate(password)
     if script_run.returncode != 0:
         log.error(err)
         return False
@@ -213,6 +504,598 @@ def filling_hosts(
         return True
 
 
+def fill_hosts_interactive(
+    hosts: list, script_path: str, decision: bool = None,
+    existing: list = None, resolver: dict = None
+) -> bool:
+    """
+    Offer user to fill /etc/hosts by containers names and IP addresses.
+    Ask sudo password if it's needed.
+    In unattended mode /etc/hosts isn't filled unless it's decided
+    by arguments, and sudo shouldn't require password.
+
+    Args:
+        hosts (list): Pairs of container name and IP address.
+        script_path (str): Path of main script for looking for
+                           fill-hosts script.
+        decision (bool): Whether to fill /etc/hosts. Asked if not set.
+        existing (list): Names of all existing containers,
+                         for removing stale entries.
+        resolver (dict): Resolver backend, LXD bridge, its DNS server
+                         and domain of containers. Local resolver
+                         is configured instead of /etc/hosts if it's set.
+                         It's done only once, not for each container.
+
+    Returns:
+        bool: True if /etc/hosts was filled by all containers.
+              Otherwise, False.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    target = '/etc/hosts'
+    if resolver is not None:
+        if resolver_configured(resolver):
+            return True
+        target = fill_hosts.resolver_path(
+            resolver['backend'], resolver['bridge']
+        )
+
+    if decision is None:
+        log.info(
+            "For easiest access to container, "
+            f"recommended to fill {target} file.\n"
+            "This action needs superuser (sudo) access."
+        )
+        decision = inquirer.confirm(
+            f"Do you want to fill {target}:",
+            default=not inquirer.is_unattended()
+        )
+    if not decision:
+        return False
+
+    password = ''
+    if os.getuid() != 0:
+        if inquirer.is_unattended():
+            password = None
+        else:
+            password = inquirer.password(
+                'Root (sudo) password:',
+                check_sudo_password
+            )
+
+    return filling_hosts(hosts, password, script_path, existing, resolver)
+
+
+def resolver_configured(resolver: dict) -> bool:
+    """
+    Check that local resolver forwards domain of containers already.
+    Config of resolver is readable without superuser access.
+
+    Args:
+        resolver (dict): Resolver backend, LXD bridge, its DNS server
+                         and domain of containers.
+
+    Returns:
+        bool: True if resolver config is up to date.
+    """
+
+    path = fill_hosts.resolver_path(resolver['backend'], resolver['bridge'])
+    try:
+        with open(path) as fl:
+            return fl.read() == fill_hosts.render_resolver(
+                resolver['backend'], resolver['bridge'],
+                resolver['dns'], resolver['domain']
+            )
+    except OSError:
+        return False
+
+
+def hosts_resolver(
+    arguments: argparse.Namespace, lxd: 'LXDClient'
+) -> dict:
+    """
+    Get resolver which is configured instead of /etc/hosts.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+        lxd (LXDClient): LXD client of created container.
+
+    Returns:
+        dict: Resolver backend, LXD bridge, its DNS server
+              and domain of containers. None if /etc/hosts is used.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    if arguments.hosts_backend == 'hosts':
+        return None
+
+    bridge = lxd.bridge_dns()
+    if bridge is None:
+        log.warning(
+            "Container isn't attached to LXD bridge with DNS, "
+            "/etc/hosts will be used."
+        )
+        return None
+
+    return dict(backend=arguments.hosts_backend, **bridge)
+
+
+def image_cache_path(arguments: argparse.Namespace) -> str:
+    """
+    Get path to on-disk cache of local LXD images list.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+
+    Returns:
+        str: Path to cache file. None if cache is disabled or unavailable.
+    """
+
+    if not arguments.image_cache:
+        return None
+
+    try:
+        return cache_path('images.json')
+    except OSError as e:
+        logging.getLogger('lazy_lxd').debug(
+            f"Images cache is disabled: {e}"
+        )
+        return None
+
+
+def keys_cache_path(name: str) -> str:
+    """
+    Get path to on-disk cache of SSH keys, such as index of keys
+    registered to containers or cache of validated keys.
+    Caches only save time, so keys work without them.
+
+    Args:
+        name (str): Name of cache file.
+
+    Returns:
+        str: Path to cache file. None if cache is unavailable.
+    """
+
+    try:
+        return cache_path(name)
+    except OSError as e:
+        logging.getLogger('lazy_lxd').debug(
+            f"Keys cache {name} is disabled: {e}"
+        )
+        return None
+
+
+def image_streams(arguments: argparse.Namespace) -> object:
+    """
+    Get index of images of server where images are downloaded from.
+    Index of remote server is kept in lazy-lxd cache.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+
+    Returns:
+        SimpleStreams: Index of server.
+    """
+
+    from hashlib import sha1
+    from lib.lxd import SimpleStreams
+
+    server = arguments.image_server
+    try:
+        path = cache_path(
+            f"streams-{sha1(server.encode()).hexdigest()[:12]}.json"
+        )
+    except OSError as e:
+        logging.getLogger('lazy_lxd').debug(
+            f"Index cache of images server is disabled: {e}"
+        )
+        path = None
+
+    return SimpleStreams(server, path, arguments.streams_ttl)
+
+
+def ensure_image(lxd: 'LXDClient') -> None:
+    """
+    Check that requested image exists in local storage.
+    Offer to download it otherwise.
+
+    Args:
+        lxd (LXDClient): LXD client of container.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    # if os and release image not exists - download image from internet
+    if not lxd.image_exists:
+        log.warning(
+            f"Image {Style.BRIGHT}"
+            f"{lxd.image_os.capitalize()} {lxd.image_version}"
+            f"{Style.NORMAL} is not exists in local LXC storage."
+        )
+        decision = inquirer.confirm("Do you want dowload image:")
+
+        if decision:
+            lxd.download_image()
+        else:
+            raise SystemExit
+
+
+def batch_containers(arguments: argparse.Namespace) -> list:
+    """
+    Collect list of containers which should be created in batch mode.
+    Containers are taken from config or manifest if it's set.
+    Otherwise, from name, OS, release and count arguments.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+
+    Returns:
+        list: Dicts with name, os and release of each container.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    if arguments.manifest is not None:
+        try:
+            manifest = load_manifest(arguments.manifest)
+        except (OSError, ValueError) as e:
+            log.error(e)
+            raise SystemExit(1)
+        entries = None
+        if isinstance(manifest, dict):
+            entries = manifest.get('containers')
+        source = arguments.manifest
+    elif arguments.containers is not None:
+        entries = arguments.containers
+        source = arguments.config
+    else:
+        entries = [
+            {'name': arguments.container_name, 'count': arguments.count}
+        ]
+        source = None
+
+    if not isinstance(entries, list) or \
+            not all(isinstance(entry, dict) for entry in entries):
+        log.error(
+            f"File {source} should contain list of containers "
+            "under 'containers' key."
+        )
+        raise SystemExit(1)
+
+    containers = list()
+    for index, entry in enumerate(entries, 1):
+        name = entry.get('name')
+        count = entry.get('count', 1)
+        if isinstance(count, str) and count.strip().isdigit():
+            count = int(count)
+        if not isinstance(count, int) or isinstance(count, bool) \
+                or count < 0:
+            if source is None:
+                label = "--count"
+            else:
+                label = f"Count of containers in entry " \
+                    f"{name or f'#{index}'} of {source}"
+            log.error(
+                f"{label} should be non-negative integer, got {count!r}."
+            )
+            raise SystemExit(1)
+        for number in range(1, count + 1):
+            containers.append({
+                'name': f"{name}-{number}" if name and count > 1 else name,
+                'os': str(entry.get('os', arguments.template)).lower(),
+                'release': str(
+                    entry.get('release', arguments.template_release)
+                ).lower()
+            })
+
+    return containers
+
+
+def show_batch_result(results: list) -> None:
+    """
+    Print result of batch creating.
+    One line per container with its address, spent time and status.
+
+    Args:
+        results (list): BatchResult of each container.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    width = max(len(result.name) for result in results)
+    lines = list()
+    for result in results:
+        if result.error is None:
+            status = f"{Fore.GREEN}ok{Fore.RESET}"
+        else:
+            status = f"{Fore.RED}failed{Fore.RESET}: {result.error}"
+        lines.append(
+            f"    {Style.BRIGHT}{result.name:<{width}}{Style.NORMAL} "
+            f"{str(result.ip or '-'):<15} {result.elapsed:6.1f}s {status}"
+        )
+
+    created = len([result for result in results if result.error is None])
+    log.info(
+        f"{Fore.GREEN}Your containers info:{Fore.RESET} "
+        f"{created} of {len(results)} created\n" + "\n".join(lines)
+    )
+
+
+def run_playbooks(
+    arguments: argparse.Namespace, hosts: list, ssh_key: str
+) -> None:
+    """
+    Run Ansible playbooks over containers
+    if path to directory with playbooks is set.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+        hosts (list): Containers addresses for SSH connection,
+                      or containers names for LXD connection.
+        ssh_key (str): Path to SSH private key. None for LXD connection.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    if arguments.playbooks_path is None:
+        log.warning(
+            "Path to directory with Ansible playbooks is empty. "
+            "Execution of Ansible client was skipped."
+        )
+        return
+
+    from lib.ansible import AnsibleClient
+
+    log.debug("Initializing Ansible client.")
+    ansible = AnsibleClient(
+        playbooks_path=arguments.playbooks_path,
+        host=None,
+        ssh_key=ssh_key,
+        workers=arguments.playbook_workers,
+        hosts=hosts,
+        forks=arguments.ansible_forks,
+        stream=arguments.ansible_stream,
+        connection=arguments.ansible_connection,
+        ssh_multiplexing=arguments.ssh_multiplexing,
+        playbooks=arguments.playbooks
+    )
+    ansible.start_playbooks()
+
+
+def run_batch(arguments: argparse.Namespace, script_path: str) -> None:
+    """
+    Create many containers from one invocation.
+    Images are checked and chosen once for each OS and release,
+    then containers are created, started and provisioned concurrently.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+        script_path (str): Path of main script for looking for
+                           fill-hosts script.
+    """
+
+    from lib.lxd import LXDClient, create_batch, create_batch_async
+    from lib.keys import SSHKeys
+
+    log = logging.getLogger('lazy_lxd')
+
+    # containers of batch are provisioned and played by one key
+    if arguments.ssh_key_per_container:
+        log.error(
+            "SSH key per container isn't supported for many containers, "
+            "run without --ssh-key-per-container."
+        )
+        raise SystemExit(1)
+
+    containers = batch_containers(arguments)
+    if len(containers) == 0:
+        log.error("No containers requested, count of containers is 0.")
+        raise SystemExit(1)
+
+    streams = image_streams(arguments)
+    clients = list()
+    for container in containers:
+        log.debug("Initializing LXD client.")
+        lxd = LXDClient(
+            name=container['name'],
+            os_template=container['os'],
+            os_version=container['release'],
+            network_timeout=arguments.network_timeout,
+            network_interval=arguments.network_interval,
+            network_max_interval=arguments.network_max_interval,
+            image_cache=image_cache_path(arguments),
+            source_container=arguments.source_container,
+            streams=streams
+        )
+        if lxd.container_name in [c.container_name for c in clients]:
+            log.error(f"Container {lxd.container_name} is requested twice.")
+            raise SystemExit(1)
+        clients.append(lxd)
+
+    log.debug("Initializing SSH keys.")
+    ssh_keys = SSHKeys(
+        container_name=clients[0].container_name,
+        private_key=arguments.ssh_priv_key,
+        public_key=arguments.ssh_pub_key,
+        key_type=arguments.ssh_key_type,
+        per_container=arguments.ssh_key_per_container,
+        key_index=keys_cache_path('keys.json'),
+        validation_cache=keys_cache_path('keys-valid.json')
+    )
+    use_ssh_image = arguments.ssh_image and not ssh_keys.disable_ssh
+
+    # images are checked and chosen once for each os and release
+    fingerprints = dict()
+    for lxd in clients:
+        if lxd.source_container is not None:
+            continue
+        image = (lxd.image_os, lxd.image_version)
+        if image not in fingerprints:
+            ensure_image(lxd)
+            fingerprints[image] = lxd.resolve_image_fingerprint()
+            if use_ssh_image:
+                fingerprints[image] = lxd.use_ssh_image()
+        lxd.image_fingerprint = fingerprints[image]
+        lxd.image_ssh_ready = use_ssh_image
+
+    def provision(lxd: LXDClient) -> None:
+        lxd.setup_ssh(ssh_keys.public_key_content)
+
+    def provisioning(lxd: LXDClient) -> object:
+        return lxd.ssh_provisioning(ssh_keys.public_key_content)
+
+    if arguments.lxd_asyncio:
+        results = create_batch_async(
+            clients, arguments.concurrency,
+            None if ssh_keys.disable_ssh else provisioning
+        )
+    else:
+        results = create_batch(
+            clients, arguments.concurrency,
+            None if ssh_keys.disable_ssh else provision
+        )
+    created = [result for result in results if result.error is None]
+
+    if len(created) == 0:
+        show_batch_result(results)
+        return
+
+    # thru LXD playbooks don't need SSH
+    if arguments.ansible_connection == 'lxd':
+        run_playbooks(arguments, [result.name for result in created], None)
+
+    if ssh_keys.disable_ssh:
+        show_batch_result(results)
+        return
+
+    ssh_keys.register([result.name for result in created])
+    created_client = next(
+        lxd for lxd in clients if lxd.container_name == created[0].name
+    )
+    fill_hosts_interactive(
+        [(result.name, result.ip) for result in created], script_path,
+        arguments.fill_hosts, created_client.list_containers(),
+        hosts_resolver(arguments, created_client)
+    )
+
+    if arguments.ansible_connection == 'ssh':
+        run_playbooks(
+            arguments, [result.ip for result in created],
+            ssh_keys.private_key_path
+        )
+
+    show_batch_result(results)
+    log.info(
+        "\nYou can login into containers thru SSH: "
+        f"ssh -o IdentitiesOnly=yes -i {ssh_keys.private_key_path} "
+        "root@<host>"
+    )
+
+
+def start_pool_refill(
+    arguments: argparse.Namespace, lxd: 'LXDClient'
+) -> None:
+    """
+    Start background process which refills pool of containers.
+    Process is detached, so it keeps working after the script exits.
+    Its output is written to pool log in lazy-lxd cache directory.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+        lxd (LXDClient): LXD client with resolved ssh-ready image.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    cmd = [
+        sys.executable, '-m', 'lazy_lxd', '--yes',
+        '--os', lxd.image_os, '--release', lxd.image_version,
+        '--pool-size', str(arguments.pool_size),
+        '--concurrency', str(arguments.concurrency),
+        '--network-timeout', str(arguments.network_timeout),
+        '--network-poll-interval', str(arguments.network_interval),
+        '--network-poll-max-interval', str(arguments.network_max_interval),
+        '--pool-refill', lxd.image_fingerprint
+    ]
+    if not arguments.image_cache:
+        cmd.append('--no-image-cache')
+    if arguments.debug_level:
+        cmd.append('--verbose')
+
+    log_path = cache_path(f"pool-{lxd.image_os}-{lxd.image_version}.log")
+    log.debug(f"Refilling pool in background, see {log_path}")
+    with open(log_path, 'w') as log_file:
+        subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL,
+            stdout=log_file, stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+
+
+def refill_pool(arguments: argparse.Namespace) -> None:
+    """
+    Refill pool of containers up to its size.
+    Containers are created from ssh-ready image, started
+    and only after that marked as ready to be taken.
+    Stale containers of pool are deleted before.
+    Nothing is done if pool is refilling by other run already.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+    """
+
+    from lib.lxd import LXDClient, create_batch
+
+    log = logging.getLogger('lazy_lxd')
+
+    lxd = LXDClient(
+        name=None,
+        os_template=arguments.template.lower(),
+        os_version=arguments.template_release.lower(),
+        image_cache=image_cache_path(arguments)
+    )
+    lxd.image_fingerprint = arguments.pool_refill
+    pool = lxd.container_pool()
+
+    lock_path = cache_path(f"pool-{lxd.image_os}-{lxd.image_version}.lock")
+    if not pool.acquire(lock_path):
+        log.info(f"Pool {pool.name} is refilling already.")
+        return
+
+    pool.prune()
+    clients = list()
+    for _ in range(pool.missing(arguments.pool_size)):
+        name, config = pool.new_member()
+        member = LXDClient(
+            name=name,
+            os_template=lxd.image_os,
+            os_version=lxd.image_version,
+            network_timeout=arguments.network_timeout,
+            network_interval=arguments.network_interval,
+            network_max_interval=arguments.network_max_interval,
+            image_cache=image_cache_path(arguments),
+            container_config=config
+        )
+        member.image_fingerprint = pool.image_fingerprint
+        member.image_ssh_ready = True
+        clients.append(member)
+
+    def provision(member: LXDClient) -> None:
+        member.install_openssh()
+        pool.mark_ready(member.container_name)
+
+    results = create_batch(clients, arguments.concurrency, provision)
+    for result in results:
+        if result.error is not None:
+            log.error(f"Pool container {result.name}: {result.error}")
+    log.info(
+        f"Pool {pool.name} refilled by "
+        f"{len([r for r in results if r.error is None])} containers."
+    )
+
+
 def show_result_info(
     os: str, os_version: str,
     container_name: str, container_host: str,
@@ -241,15 +1124,96 @@ def show_result_info(
         )
 
 
-def main():
+def show_profile(path: str = None) -> None:
     """
-    The main function.
+    Print timing table of the run and save its trace.
+
+    Args:
+        path (str): Path to trace file.
+                    profile.json in lazy-lxd cache is used if not set.
     """
 
-    arguments = parse_option()
+    log = logging.getLogger('lazy_lxd')
+
+    log.info(f"{Fore.GREEN}Timing of the run:{Fore.RESET}\n"
+             f"{logger.trace.report()}")
+
+    if path is None:
+        path = cache_path('profile.json')
+    try:
+        logger.trace.save(path)
+        log.info(f"Trace of the run is saved to {path}")
+    except OSError as e:
+        log.error(f"Unable to save trace of the run: {e}")
+
+
+def run_prefetch(arguments: argparse.Namespace) -> None:
+    """
+    Download requested images to local storage
+    and print bytes and time spent on each one.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+    """
+
+    from lib.lxd import parse_target, prefetch
+
+    log = logging.getLogger('lazy_lxd')
+
+    check_required_program_instance("lxc", "lxd")
+
+    targets = list()
+    for target in arguments.targets:
+        try:
+            targets.append(parse_target(target, arguments.architecture))
+        except ValueError as e:
+            log.error(e)
+            raise SystemExit(1)
+
+    results = prefetch(
+        targets, arguments.concurrency,
+        image_cache=image_cache_path(arguments),
+        streams=image_streams(arguments)
+    )
+
+    width = max(len('/'.join(result.target)) for result in results)
+    lines = list()
+    for result in results:
+        image = '/'.join(result.target)
+        if result.error is not None:
+            status = f"{Fore.RED}failed{Fore.RESET}: {result.error}"
+        elif result.size is None:
+            status = "present"
+        else:
+            status = (
+                f"{result.size / 2 ** 20:.1f} MiB in {result.elapsed:.1f}s, "
+                f"{result.size / 2 ** 20 / max(result.elapsed, 1e-3):.1f} "
+                "MiB/s"
+            )
+        lines.append(f"    {Style.BRIGHT}{image:<{width}}{Style.NORMAL} "
+                     f"{status}")
+
+    failed = [result for result in results if result.error is not None]
+    log.info(
+        f"{Fore.GREEN}Images:{Fore.RESET} "
+        f"{len(results) - len(failed)} of {len(results)} "
+        "in local storage\n" + "\n".join(lines)
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+def launch(arguments: argparse.Namespace) -> None:
+    """
+    Create container, or many of them, and run playbooks over it.
+
+    Args:
+        arguments (argparse.Namespace): Parsed script arguments.
+    """
+
+    from lib.lxd import LXDClient
+    from lib.keys import SSHKeys
 
-    # Initializing logging subsystem
-    logger.init(arguments.debug_level)
     log = logging.getLogger('lazy_lxd')
 
     script_path = os.path.dirname(os.path.realpath(__file__))
@@ -259,37 +1223,59 @@ def main():
     recommended_program = ["ansible", "ansible-playbook"]
     check_recommended_program_instace(*recommended_program)
 
+    if arguments.pool_refill is not None:
+        refill_pool(arguments)
+        return
+
+    if arguments.manifest is not None or arguments.containers is not None \
+            or arguments.count != 1:
+        run_batch(arguments, script_path)
+        return
+
     log.debug("Initializing LXD client.")
     lxd = LXDClient(
         name=arguments.container_name,
         os_template=arguments.template.lower(),
-        os_version=arguments.template_release.lower()
+        os_version=arguments.template_release.lower(),
+        network_timeout=arguments.network_timeout,
+        network_interval=arguments.network_interval,
+        network_max_interval=arguments.network_max_interval,
+        image_cache=image_cache_path(arguments),
+        source_container=arguments.source_container,
+        streams=image_streams(arguments)
     )
 
     log.debug("Initializing SSH keys.")
     ssh_keys = SSHKeys(
         container_name=lxd.container_name,
         private_key=arguments.ssh_priv_key,
-        public_key=arguments.ssh_pub_key
+        public_key=arguments.ssh_pub_key,
+        key_type=arguments.ssh_key_type,
+        per_container=arguments.ssh_key_per_container,
+        key_index=keys_cache_path('keys.json'),
+        validation_cache=keys_cache_path('keys-valid.json')
     )
 
-    # if os and release image not exists - download image from internet
-    if not lxd.image_exists:
-        log.warning(
-            f"Image {Style.BRIGHT}"
-            f"{lxd.image_os.capitalize()} {lxd.image_version}"
-            f"{Style.NORMAL} is not exists in local LXC storage."
-        )
-        decision = inquirer.confirm("Do you want dowload image:")
+    # pool keeps ssh-ready containers, so it's useless without SSH
+    use_pool = arguments.pool_size > 0 and not ssh_keys.disable_ssh
+    if arguments.source_container is not None:
+        # container is cloned, image isn't needed
+        use_pool = False
+    else:
+        ensure_image(lxd)
+        if (arguments.ssh_image or use_pool) and not ssh_keys.disable_ssh:
+            lxd.use_ssh_image()
 
-        if decision:
-            lxd.download_image()
-        else:
-            raise SystemExit
+    # create and run container, or take it from pool
+    if not (use_pool and lxd.checkout_container()):
+        lxd.create_container()
+        lxd.start_container()
+    if use_pool:
+        start_pool_refill(arguments, lxd)
 
-    # create and run container
-    lxd.create_container()
-    lxd.start_container()
+    # thru LXD playbooks don't need to wait for SSH
+    if arguments.ansible_connection == 'lxd':
+        run_playbooks(arguments, [lxd.container_name], None)
 
     if ssh_keys.disable_ssh:
         show_result_info(
@@ -299,45 +1285,24 @@ def main():
         )
         return
 
-    lxd.install_openssh()
-    lxd.add_ssh_key(ssh_keys.public_key_content)
+    lxd.setup_ssh(ssh_keys.public_key_content)
+    ssh_keys.register([lxd.container_name])
 
     # try to fill /etc/hosts with container name and their ip address
-    log.info(
-        "For easiest access to container, "
-        "recommended to fill /etc/hosts file.\n"
-        "This action needs superuser (sudo) access."
+    resolver = hosts_resolver(arguments, lxd)
+    filled_hosts = fill_hosts_interactive(
+        [(lxd.container_name, lxd.container_ip)], script_path,
+        arguments.fill_hosts, lxd.list_containers(), resolver
     )
-    filled_hosts = inquirer.confirm("Do you want to fill /etc/hosts:")
-    if filled_hosts:
-        if os.getuid() != 0:
-            password = inquirer.password(
-                'Root (sudo) password:',
-                check_sudo_password
-            )
-            container_has_host_info = filling_hosts(
-                lxd.container_name, lxd.container_ip,
-                password, script_path
-            )
-    else:
-        container_has_host_info = None
-
-    if arguments.playbooks_path is not None:
-        log.debug("Initializing Ansible client.")
-        ansible = AnsibleClient(
-            playbooks_path=arguments.playbooks_path,
-            host=lxd.container_ip,
-            ssh_key=ssh_keys.private_key_path
-        )
 
-        ansible.start_playbooks()
-    else:
-        log.warning(
-            "Path to directory with Ansible playbooks is empty. "
-            "Execution of Ansible client was skipped."
+    if arguments.ansible_connection == 'ssh':
+        run_playbooks(
+            arguments, [lxd.container_ip], ssh_keys.private_key_path
         )
 
-    if container_has_host_info is not None and filled_hosts:
+    if filled_hosts and resolver is not None:
+        finally_container_host = f"{lxd.container_name}.{resolver['domain']}"
+    elif filled_hosts:
         finally_container_host = lxd.container_name
     else:
         finally_container_host = lxd.container_ip
@@ -347,3 +1312,29 @@ def main():
         lxd.container_name, finally_container_host,
         ssh_keys.private_key_path, not ssh_keys.disable_ssh
     )
+
+
+def main():
+    """
+    The main function.
+    """
+
+    arguments = parse_option()
+
+    # Initializing logging subsystem
+    logger.init(arguments.debug_level)
+
+    inquirer.set_unattended(arguments.unattended)
+
+    run = run_prefetch if arguments.command == 'prefetch' else launch
+
+    if not arguments.profile and arguments.profile_output is None:
+        run(arguments)
+        return
+
+    logger.trace.enable()
+    try:
+        with logger.span('lazy-lxd'):
+            run(arguments)
+    finally:
+        show_profile(arguments.profile_output)
@@ -1,11 +1,17 @@
 import logging
 
+from lib import inquirer
+from lib.logger import spinner, span
+
 from .playbook import (
     choose_playbooks,
     is_exists_playbooks,
+    load_dependencies,
     redefine_playbooks_path
 )
+from .connection import SSHProfile
 from .execute import run_ansible_playbook
+from .schedule import schedule
 
 
 class AnsibleClient(object):
@@ -16,17 +22,43 @@ class AnsibleClient(object):
     Args:
         playbooks_path (str): Path to directory with Ansible playbooks
                               which needs to run into container.
-        container_host (str): Host or IP address of container
-                              in which would be running playbooks.
+        host (str): Host or IP address of container
+                    in which would be running playbooks.
         ssh_key (str): Path to SSH private key
                        which needs to using to connect by Ansible.
+        workers (int): Maximum number of playbooks running at once.
+                       Playbooks which depend on others wait for them.
+        hosts (list): Hosts or IP addresses of many containers.
+                      Each playbook runs over all of them
+                      by one ansible-playbook call. Replaces host.
+        forks (int): Number of containers which Ansible handles
+                     in parallel. By default, all containers at once.
+        stream (bool): Read Ansible output event by event
+                       and show progress while playbook is running.
+                       Requires ansible.posix collection.
+        connection (str): How Ansible reaches containers.
+                          ssh - by SSH with ssh_key, hosts are addresses.
+                          lxd - thru local LXD, hosts are containers names
+                          and SSH isn't needed.
+                          Requires community.general collection.
+        ssh_multiplexing (bool): Reuse one SSH connection per container
+                                 for all tasks and enable pipelining.
+        playbooks (list): Names of playbooks which should run.
+                          User chooses them if not set.
     """
 
     def __init__(
         self,
         playbooks_path: str,
         host: str,
-        ssh_key: str
+        ssh_key: str,
+        workers: int = 1,
+        hosts: list = None,
+        forks: int = None,
+        stream: bool = False,
+        connection: str = 'ssh',
+        ssh_multiplexing: bool = True,
+        playbooks: list = None
     ):
         # functions
         # executing ansible playbooks
@@ -35,10 +67,20 @@ class AnsibleClient(object):
         self._log = logging.getLogger('lazy_lxd')
 
         self.playbooks_path = playbooks_path
-        self.container_host = host
+        self.playbooks_names = playbooks
+        self.container_hosts = list(hosts) if hosts else [host]
+        self.container_host = self.container_hosts[0]
         self.playbooks = self.__get_playbooks()
 
         self.ssh_key = ssh_key
+        self.workers = workers
+        self.forks = forks or len(self.container_hosts)
+        self.stream = stream
+        self.connection = connection
+        self.ssh_multiplexing = ssh_multiplexing
+        self.ssh_profile = SSHProfile()
+        # status of each playbook on each host: {host: {playbook: status}}
+        self.hosts_results = {host: dict() for host in self.container_hosts}
 
     def __get_playbooks(self):
         """
@@ -51,6 +93,8 @@ class AnsibleClient(object):
                 f"Directory {self.playbooks_path} "
                 "doesn't contains no one y(a)ml file."
             )
+            if inquirer.is_unattended():
+                raise SystemExit(1)
             while True:
                 try:
                     self.playbooks_path = redefine_playbooks_path()
@@ -62,37 +106,128 @@ class AnsibleClient(object):
                 except FileNotFoundError as e:
                     self._log.error(e)
 
-        playbooks = choose_playbooks(self.playbooks_path)
+        playbooks = choose_playbooks(
+            self.playbooks_path, self.playbooks_names
+        )
 
         if len(playbooks) == 0:
             self._log.warning("You didn't select Ansible playbooks to run.")
+            # the same answer would be given again
+            if inquirer.is_unattended() or self.playbooks_names is not None:
+                raise SystemExit(1)
             return self.__get_playbooks()
         else:
             return playbooks
 
-    def start_playbooks(self):
+    def start_playbooks(self) -> list:
         """
         Running all ansible playbooks which user is choosed.
-        Exit code and stdout are parsing for looking for errors.
+        Independent playbooks run concurrently, up to workers limit.
+        Dependent ones wait for their dependencies.
+        Without manifest of dependencies playbooks run one by one,
+        failed playbook doesn't stop the next ones.
+        Time of each playbook is reported at the end.
+        SSH master connections are kept while playbooks are running
+        and closed after.
+
+        Returns:
+            list: PlaybookResult of each playbook.
         """
 
-        for p in self.playbooks:
-            self._log.debug(f"Preparing to execute Ansible playbook {p}")
-            status, out, err, command = self.__run_playbook(self, p)
-
-            if status > 0:
-                self._log.error(
-                    f"Was occurred while running playbook {p}: {err}"
+        dependencies = load_dependencies(self.playbooks_path, self.playbooks)
+        workers = self.workers
+        if dependencies is None:
+            # one worker starts playbooks in given order
+            dependencies = dict()
+            workers = 1
+
+        if self.connection == 'ssh' and self.ssh_multiplexing:
+            self.ssh_profile.open()
+        try:
+            with span('playbooks', playbooks=len(self.playbooks)), \
+                    spinner(f"Running {len(self.playbooks)} playbooks..."):
+                results = schedule(
+                    self.playbooks, dependencies, self.__play, workers
                 )
-                self._log.warning(f"Try execute command yourself: {command}")
+        finally:
+            self.ssh_profile.close()
 
-            else:
-                if out['stats'][self.container_host]['failures'] > 0:
-                    self._log.warning(
-                        f"Something was failing while executing playbook {p}"
-                    )
+        for result in results:
+            self._log.info(
+                f"Playbook {result.playbook}: {result.status} "
+                f"({result.elapsed:.1f}s)"
+            )
+        if len(self.container_hosts) > 1:
+            for host, statuses in self.hosts_results.items():
+                failed = [
+                    p for p, status in statuses.items() if status != 'ok'
+                ]
+                if failed:
                     self._log.warning(
-                        f"Try execute command yourself: {command}"
+                        f"Playbooks failed on {host}: {', '.join(failed)}"
                     )
-                else:
-                    self._log.debug(f"Playbook {p} is completed.")
+        return results
+
+    def __play(self, p: str) -> bool:
+        """
+        Running one ansible playbook over all containers.
+        Exit code and stdout are parsing for looking for errors.
+        Result for each container is taken from playbook stats.
+
+        Args:
+            p (str): Playbook file name.
+
+        Returns:
+            bool: True if playbook completed successfully on all containers.
+                  Otherwise, False.
+        """
+
+        self._log.debug(f"Preparing to execute Ansible playbook {p}")
+        with span('playbook', playbook=p) as timed:
+            status, out, err, command = self.__run_playbook(self, p)
+            if timed is not None:
+                timed.set(exit_code=status)
+
+        stats = out.get('stats', {}) if isinstance(out, dict) else {}
+        for host in self.container_hosts:
+            self.hosts_results[host][p] = _host_status(stats.get(host))
+
+        if status > 0 and len(stats) == 0:
+            self._log.error(
+                f"Was occurred while running playbook {p}: {err}"
+            )
+            self._log.warning(f"Try execute command yourself: {command}")
+            return False
+
+        failed = [
+            host for host in self.container_hosts
+            if self.hosts_results[host][p] != 'ok'
+        ]
+        if len(failed) > 0:
+            self._log.warning(
+                f"Something was failing while executing playbook {p} "
+                f"on {', '.join(failed)}"
+            )
+            self._log.warning(f"Try execute command yourself: {command}")
+            return False
+
+        self._log.debug(f"Playbook {p} is completed.")
+        return True
+
+
+def _host_status(stats: dict) -> str:
+    """
+    Get status of playbook on host from its stats.
+
+    Args:
+        stats (dict): Stats of host from Ansible JSON output.
+
+    Returns:
+        str: ok, failed or unreachable.
+    """
+
+    if stats is None or stats.get('unreachable', 0) > 0:
+        return 'unreachable'
+    if stats.get('failures', 0) > 0:
+        return 'failed'
+    return 'ok'
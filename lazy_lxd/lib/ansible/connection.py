@@ -0,0 +1,80 @@
+import os
+import glob
+import shutil
+import logging
+import tempfile
+import subprocess
+
+
+class SSHProfile(object):
+    """
+    Tuned SSH connection settings for running playbooks.
+    Ansible keeps one master SSH connection per container
+    (ControlMaster/ControlPersist), each container gets its own
+    control socket in private temporary directory.
+    Pipelining cuts number of SSH operations per task.
+    Control sockets and the directory are removed by close.
+
+    Args:
+        persist (int): Seconds which master connection stays open
+                       after the last use.
+        pipelining (bool): Enable Ansible pipelining.
+    """
+
+    def __init__(self, persist: int = 60, pipelining: bool = True):
+        self._log = logging.getLogger('lazy_lxd')
+
+        self.persist = persist
+        self.pipelining = pipelining
+        self.control_dir = None
+
+    def open(self) -> None:
+        """
+        Create directory for control sockets.
+        """
+
+        if self.control_dir is None:
+            self.control_dir = tempfile.mkdtemp(prefix='lazy-lxd-ssh-')
+
+    def env(self) -> dict:
+        """
+        Environment variables which apply profile to ansible-playbook.
+
+        Returns:
+            dict: Ansible environment variables.
+        """
+
+        ssh_args = '-o IdentitiesOnly=yes -o StrictHostKeyChecking=no'
+        if self.control_dir is None:
+            return {'ANSIBLE_SSH_ARGS': ssh_args}
+
+        return {
+            'ANSIBLE_SSH_ARGS': (
+                f'{ssh_args} -o ControlMaster=auto '
+                f'-o ControlPersist={self.persist}s'
+            ),
+            'ANSIBLE_SSH_CONTROL_PATH_DIR': self.control_dir,
+            # socket per container: host, port and user
+            'ANSIBLE_SSH_CONTROL_PATH': '%(directory)s/%%h-%%p-%%r',
+            'ANSIBLE_PIPELINING': str(self.pipelining)
+        }
+
+    def close(self) -> None:
+        """
+        Stop master connections and remove control sockets.
+        """
+
+        if self.control_dir is None:
+            return
+
+        for socket in glob.glob(os.path.join(self.control_dir, '*')):
+            self._log.debug(f"Closing SSH master connection {socket}")
+            # host is required by ssh, but socket defines connection
+            subprocess.call(
+                ['ssh', '-o', f'ControlPath={socket}', '-O', 'exit',
+                 'lazy-lxd'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+        self.control_dir = None
@@ -2,16 +2,28 @@ import os
 import subprocess
 import shlex
 import json
+import threading
+from collections import deque
 
-from halo import Halo
+from lib.logger import spinner
+
+
+# Callback which prints one JSON event per line, from ansible.posix
+STREAM_CALLBACK = 'ansible.posix.jsonl'
+# Connection plugin which runs modules thru `lxc exec`, from community.general
+LXD_CONNECTION = 'community.general.lxd'
+# How many last lines of stderr are kept in streaming mode
+STDERR_TAIL = 100
 
 
 def run_ansible_playbook(self, playbook: str) -> tuple:
     """
-    Running the Ansible playbook.
+    Running the Ansible playbook over all containers at once.
     Utility ansible-playbook is used for that.
     Receiving exit code, stdout and stderr from executed process.
     Stdout presented as JSON.
+    In streaming mode stdout is read event by event as it's printed,
+    progress is logged immediately and only playbook stats are kept.
 
     Args:
         playbook (str): Path to Ansible playbook which needs to run.
@@ -26,37 +38,127 @@ def run_ansible_playbook(self, playbook: str) -> tuple:
 
     env = os.environ.copy()
     env.update({
-        'ANSIBLE_SSH_ARGS': '-o IdentitiesOnly=yes -o '
-                            'StrictHostKeyChecking=no',
-        'ANSIBLE_REMOTE_USER': 'root',
-        'ANSIBLE_PRIVATE_KEY_FILE': self.ssh_key,
         'ANSIBLE_STDOUT_CALLBACK': 'json'
     })
+    if self.stream:
+        env['ANSIBLE_STDOUT_CALLBACK'] = STREAM_CALLBACK
+
+    inventory = ','.join(self.container_hosts)
     cmd = shlex.split(
-        f'ansible-playbook -i {self.container_host}, {playbook_full_path}'
+        f'ansible-playbook -i {inventory}, --forks {self.forks} '
+        f'{playbook_full_path}'
     )
 
+    if self.connection == 'lxd':
+        # containers are reached by name thru local LXD, no SSH at all
+        cmd[-1:-1] = ['-c', LXD_CONNECTION]
+        shell_cmd = ' '.join(cmd)
+    else:
+        env.update(self.ssh_profile.env())
+        env.update({
+            'ANSIBLE_REMOTE_USER': 'root',
+            'ANSIBLE_PRIVATE_KEY_FILE': self.ssh_key
+        })
+        # build command with argument from env
+        shell_cmd = (
+            f"ANSIBLE_SSH_ARGS='{env['ANSIBLE_SSH_ARGS']}' "
+            f"{' '.join(cmd[:-1])} "
+            f"--private-key {self.ssh_key} -u {env['ANSIBLE_REMOTE_USER']} "
+            f"{cmd[-1]}"
+        )
+
     process = subprocess.Popen(
         cmd, env=env,
         stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
 
-    # build command with argument from env
-    shell_cmd = (
-        f"ANSIBLE_SSH_ARGS='{env['ANSIBLE_SSH_ARGS']}' {' '.join(cmd[:3])} "
-        f"--private-key {self.ssh_key} -u {env['ANSIBLE_REMOTE_USER']} "
-        f"{cmd[-1]}"
+    self._log.debug(f"Playbook will executing by command: {shell_cmd}")
+    with spinner(f"Running playbook {playbook}..."):
+        if self.stream:
+            out, err = _read_events(self, playbook, process)
+        else:
+            out, err = process.communicate()
+            out, err = out.decode(), err.decode()
+            if len(out) > 0:
+                out = json.loads(out)
+
+    return (process.returncode, out, err, shell_cmd)
+
+
+def _read_events(self, playbook: str, process: subprocess.Popen) -> tuple:
+    """
+    Internal function for reading ansible-playbook output
+    event by event, while the process is running.
+    Task starts, results and failures are logged as they happen.
+    Memory is bounded: only playbook stats and tail of stderr are kept.
+
+    Args:
+        playbook (str): Playbook file name.
+        process (subprocess.Popen): Running ansible-playbook process.
+
+    Returns:
+        tuple: Output with playbook stats as dict and tail of stderr.
+    """
+
+    # stderr is drained concurrently, otherwise full pipe blocks ansible
+    err_tail = deque(maxlen=STDERR_TAIL)
+    err_reader = threading.Thread(
+        target=lambda: err_tail.extend(
+            line.decode(errors='replace') for line in process.stderr
+        ),
+        daemon=True
     )
+    err_reader.start()
 
-    self._log.debug(f"Playbook will executing by command: {shell_cmd}")
-    with Halo(
-        text=f"Running playbook {playbook}...",
-        spinner="dots12",
-        color="blue"
-    ):
-        out, err = process.communicate()
+    out = dict()
+    for line in process.stdout:
+        try:
+            event = json.loads(line.decode())
+        except ValueError:
+            continue
+        if not isinstance(event, dict):
+            continue
+
+        name = event.get('_event', '')
+        task = event.get('task') or {}
+        if name == 'v2_playbook_on_task_start':
+            self._log.debug(f"[{playbook}] Task started: {task.get('name')}")
+        elif name.startswith('v2_runner_on_'):
+            status = name[len('v2_runner_on_'):]
+            for host, result in (event.get('hosts') or {}).items():
+                _log_task_result(self, playbook, task, host, status, result)
+        elif name == 'v2_playbook_on_stats':
+            out['stats'] = event.get('stats', {})
+
+    process.wait()
+    err_reader.join()
+
+    return (out, ''.join(err_tail))
+
+
+def _log_task_result(
+    self, playbook: str, task: dict, host: str, status: str, result: dict
+) -> None:
+    """
+    Internal function for logging result of task on host.
+    Failures are shown always, other results only in verbose mode.
+
+    Args:
+        playbook (str): Playbook file name.
+        task (dict): Task info from Ansible, name and duration.
+        host (str): Host where task was performed.
+        status (str): Task status, such as ok, failed, skipped, unreachable.
+        result (dict): Task result from Ansible.
+    """
 
-    if len(out.decode()) > 0:
-        out = json.loads(out.decode())
+    duration = task.get('duration') or {}
+    took = ''
+    if 'start' in duration and 'end' in duration:
+        took = f" ({duration['start']} - {duration['end']})"
+    message = f"[{playbook}] Task {task.get('name')} {status} on {host}{took}"
 
-    return (process.returncode, out, err.decode(), shell_cmd)
+    if status in ('failed', 'unreachable') and \
+            not result.get('ignore_errors'):
+        self._log.warning(f"{message}: {result.get('msg', '')}")
+    else:
+        self._log.debug(message)
@@ -1,15 +1,24 @@
 import os
+import logging
 
 from lib import inquirer
+from lib.config import load_manifest
 
 
-def choose_playbooks(path: str) -> list:
+# File in playbooks directory which describes dependencies between playbooks
+MANIFEST_NAME = '.lazy-lxd.yml'
+
+
+def choose_playbooks(path: str, names: list = None) -> list:
     """
     Scan playbooks directory, get file names and
     give the user choose playbooks which he want to play.
+    If playbooks names are given, user isn't asked.
 
     Args:
         path (str): Path to directory with Ansible playbooks.
+        names (list): Names of playbooks which should be chosen,
+                      with or without file extension.
 
     Returns:
         list: Playbooks with file extension that have been chosen by user.
@@ -19,9 +28,15 @@ def choose_playbooks(path: str) -> list:
     files = os.listdir(path)
 
     for file in files:
-        if _check_extension(file):
+        if _is_playbook(file):
             playbooks.append(os.path.basename(file))
 
+    if names is not None:
+        return [
+            playbook for playbook in playbooks
+            if playbook in names or os.path.splitext(playbook)[0] in names
+        ]
+
     chosen_playbooks = inquirer.checkbox(
         list(map(lambda file: os.path.splitext(file)[0], playbooks)),
         "Choose playbooks which you want to run into container"
@@ -44,12 +59,66 @@ def is_exists_playbooks(path: str) -> bool:
 
     files = os.listdir(path)
     for file in files:
-        if _check_extension(file):
+        if _is_playbook(file):
             return True
 
     return False
 
 
+def load_dependencies(path: str, playbooks: list) -> dict:
+    """
+    Get dependencies between playbooks from manifest
+    in directory with playbooks. Manifest looks like:
+
+        playbooks:
+          nginx:
+            depends: [common]
+
+    Playbooks could be named with or without file extension.
+    Playbooks absent in manifest don't depend on anything.
+
+    Args:
+        path (str): Path to directory with Ansible playbooks.
+        playbooks (list): Playbooks file names which will run.
+
+    Returns:
+        dict: Lists of playbooks file names which should be completed
+              before playbook, keyed by playbook file name.
+              None if there is no manifest, then playbooks should run
+              one by one in given order, whatever previous ones ended.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        manifest = load_manifest(manifest_path) or {}
+        declared = manifest.get('playbooks') or {}
+    except (OSError, ValueError, AttributeError) as e:
+        log.error(f"Unable to read playbooks manifest: {e}")
+        raise SystemExit(1)
+
+    # names from manifest could be without extension
+    by_name = dict()
+    for playbook in playbooks:
+        by_name[playbook] = playbook
+        by_name[os.path.splitext(playbook)[0]] = playbook
+
+    dependencies = dict()
+    for name, options in declared.items():
+        if name not in by_name:
+            continue
+        depends = (options or {}).get('depends') or []
+        dependencies[by_name[name]] = [
+            by_name[d] for d in depends if d in by_name
+        ]
+
+    return dependencies
+
+
 def redefine_playbooks_path() -> str:
     """
     Get new path to directory with Ansible playbooks.
@@ -80,3 +149,18 @@ def _check_extension(file) -> bool:
 
     extension = os.path.splitext(file)[1]
     return True if extension == '.yaml' or extension == '.yml' else False
+
+
+def _is_playbook(file) -> bool:
+    """
+    Check that file is Ansible playbook.
+    It should be y(a)ml file, but not lazy-lxd manifest.
+
+    Args:
+        file (str): Name or path to of file.
+
+    Returns:
+        bool: True if file is playbook. Otherwise False.
+    """
+
+    return _check_extension(file) and os.path.basename(file) != MANIFEST_NAME
@@ -0,0 +1,142 @@
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED
+)
+from typing import Callable
+
+from lib.logger import trace
+
+
+PlaybookResult = namedtuple(
+    'PlaybookResult', ['playbook', 'status', 'elapsed']
+)
+PlaybookResult.__doc__ = """
+Result of running one playbook by scheduler.
+
+Args:
+    playbook (str): Playbook file name.
+    status (str): ok, failed or skipped.
+                  Playbook is skipped if its dependency wasn't successful.
+    elapsed (float): Seconds spent on playbook.
+"""
+
+
+def schedule(
+    playbooks: list,
+    dependencies: dict,
+    run: Callable[[str], bool],
+    workers: int = 1
+) -> list:
+    """
+    Run playbooks concurrently respecting dependencies between them.
+    Playbook starts when all its dependencies are completed successfully.
+    Independent playbooks run at the same time, up to workers limit.
+    Among ready playbooks ones which were given earlier start first.
+
+    Args:
+        playbooks (list): Playbooks file names.
+        dependencies (dict): Lists of playbooks which should be completed
+                             before playbook, keyed by playbook.
+        run (callable): Function which runs playbook
+                        and returns True if it was successful.
+        workers (int): Maximum number of playbooks running at once.
+
+    Returns:
+        list: PlaybookResult for each playbook, in the same order.
+    """
+
+    pending = list(playbooks)
+    results = dict()
+    running = dict()
+
+    def requires(playbook: str) -> list:
+        return [
+            d for d in dependencies.get(playbook, []) if d in playbooks
+        ]
+
+    timed = trace.inherit(_timed)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while pending or running:
+            _skip_broken(pending, results, requires)
+
+            for playbook in list(pending):
+                if len(running) >= max(1, workers):
+                    break
+                if all(
+                    d in results and results[d].status == 'ok'
+                    for d in requires(playbook)
+                ):
+                    pending.remove(playbook)
+                    future = executor.submit(timed, run, playbook)
+                    running[future] = playbook
+
+            # nothing is running and nothing could start - cyclic dependency
+            if not running:
+                logging.getLogger('lazy_lxd').error(
+                    "Playbooks depend on each other cyclically, "
+                    f"they were skipped: {', '.join(pending)}"
+                )
+                for playbook in pending:
+                    results[playbook] = PlaybookResult(
+                        playbook, 'skipped', 0.0
+                    )
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                playbook = running.pop(future)
+                results[playbook] = future.result()
+
+    return [results[playbook] for playbook in playbooks]
+
+
+def _skip_broken(pending: list, results: dict, requires: Callable) -> None:
+    """
+    Internal function for skipping pending playbooks
+    which depend on failed or skipped ones.
+    Repeated until nothing changes, because skipping is transitive.
+
+    Args:
+        pending (list): Playbooks which weren't started yet.
+        results (dict): PlaybookResult of finished playbooks.
+        requires (callable): Function which returns playbook dependencies.
+    """
+
+    changed = True
+    while changed:
+        changed = False
+        for playbook in list(pending):
+            if any(
+                d in results and results[d].status != 'ok'
+                for d in requires(playbook)
+            ):
+                pending.remove(playbook)
+                results[playbook] = PlaybookResult(playbook, 'skipped', 0.0)
+                changed = True
+
+
+def _timed(run: Callable[[str], bool], playbook: str) -> PlaybookResult:
+    """
+    Internal function for running playbook and measuring its time.
+
+    Args:
+        run (callable): Function which runs playbook.
+        playbook (str): Playbook file name.
+
+    Returns:
+        PlaybookResult: Result of playbook.
+    """
+
+    started = time.monotonic()
+    try:
+        status = 'ok' if run(playbook) else 'failed'
+    except Exception as e:
+        logging.getLogger('lazy_lxd').error(
+            f"Was occurred while running playbook {playbook}: {e}"
+        )
+        status = 'failed'
+    return PlaybookResult(playbook, status, time.monotonic() - started)
@@ -0,0 +1,14 @@
+"""
+Reading of files which describe how lazy-lxd should work.
+Such as manifest with list of containers.
+And places where lazy-lxd keeps its own files.
+"""
+
+from .manifest import load_manifest
+from .paths import cache_path, write_atomic
+
+__all__ = [
+    'load_manifest',
+    'cache_path',
+    'write_atomic'
+]
@@ -0,0 +1,45 @@
+import os
+import json
+
+
+# Manifests with these extensions can't be read without PyYAML
+YAML_EXTENSIONS = ('.yml', '.yaml')
+
+
+def load_manifest(path: str) -> object:
+    """
+    Read manifest file and parse it.
+    YAML is used if PyYAML is installed, JSON otherwise.
+    Any JSON document is valid YAML, so JSON manifests work in both cases.
+    PyYAML is optional, it's installed by lazy-lxd[yaml].
+
+    Args:
+        path (str): Path to manifest file.
+
+    Returns:
+        object: Parsed manifest content.
+
+    Raises:
+        ValueError: If manifest could not be parsed.
+    """
+
+    with open(path) as fl:
+        content = fl.read()
+
+    try:
+        import yaml
+    except ImportError:
+        if os.path.splitext(path)[1].lower() in YAML_EXTENSIONS:
+            raise ValueError(
+                f"Manifest {path} is YAML, but PyYAML isn't installed. "
+                "Install it by pip install lazy-lxd[yaml] or use JSON."
+            )
+        try:
+            return json.loads(content)
+        except ValueError as e:
+            raise ValueError(f"Manifest {path} is not valid JSON: {e}")
+
+    try:
+        return yaml.safe_load(content)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Manifest {path} is not valid YAML: {e}")
@@ -0,0 +1,45 @@
+import os
+
+
+def cache_path(name: str) -> str:
+    """
+    Get path of file in lazy-lxd cache directory.
+    Directory is $XDG_CACHE_HOME/lazy-lxd or $HOME/.cache/lazy-lxd.
+    It is created if not exists.
+
+    Args:
+        name (str): Name of file in cache directory.
+
+    Returns:
+        str: Full path to file.
+    """
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    cache_dir = os.path.join(cache_home, 'lazy-lxd')
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    return os.path.join(cache_dir, name)
+
+
+def write_atomic(path: str, content: str) -> None:
+    """
+    Write content into file atomically.
+    Content is written to temporary file near to target,
+    and then the temporary file replaces target.
+    So readers never see half-written file.
+
+    Args:
+        path (str): Path to file.
+        content (str): Content which needs to write.
+    """
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as fl:
+            fl.write(content)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
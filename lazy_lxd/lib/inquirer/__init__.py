@@ -8,11 +8,14 @@ from .choose import choose
 from .checkbox import checkbox
 from .input import input_text
 from .password import password
+from .unattended import set_unattended, is_unattended
 
 __all__ = [
     'confirm',
     'choose',
     'checkbox',
     'input_text',
-    'password'
+    'password',
+    'set_unattended',
+    'is_unattended'
 ]
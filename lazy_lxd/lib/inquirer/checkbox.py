@@ -1,20 +1,32 @@
-from PyInquirer import prompt
 from .confirm import confirm
 from .lists import convert_to_list_with_index
+from .unattended import is_unattended, answer as unattended_answer
 
 
-def checkbox(choices: list, msg: str = "What you will choose") -> list:
+def checkbox(
+    choices: list, msg: str = "What you will choose", default: list = None
+) -> list:
     """
     Ask user to choose of many variant from list of options.
+    In unattended mode default options are returned.
 
     Args:
         choices (list): List with items among which user will choosing.
         msg (str): Message which display to user. This is question usually.
+        default (list): Indexes of options which are chosen
+                        in unattended mode. All options if not set.
 
     Returns:
         list: Options that have been chosen by user.
     """
 
+    if is_unattended():
+        if default is None:
+            default = list(range(len(choices)))
+        return unattended_answer(msg, default)
+
+    from PyInquirer import prompt
+
     question = [
         {
             'type': 'checkbox',
@@ -31,4 +43,4 @@ def checkbox(choices: list, msg: str = "What you will choose") -> list:
         if exit:
             raise SystemExit
         else:
-            return checkbox(choices, msg)
+            return checkbox(choices, msg, default)
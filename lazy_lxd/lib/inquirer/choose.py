@@ -1,21 +1,29 @@
-from PyInquirer import prompt
 from .confirm import confirm
 from .lists import convert_to_list_with_index
+from .unattended import is_unattended, answer as unattended_answer
 
 
-def choose(choices: list, msg: str = "What do you choose") -> int:
+def choose(
+    choices: list, msg: str = "What do you choose", default: int = 0
+) -> int:
     """
     Ask user to choose variant from choices list.
-
+    In unattended mode default variant is returned.
 
     Args:
         msg (str): Message which display to user. This is question usually.
         choices (list): List with items among which user will choosing.
+        default (int): Index of variant which is chosen in unattended mode.
 
     Returns:
         int: Index in choices list which user choosed
     """
 
+    if is_unattended():
+        return unattended_answer(f"{msg} {choices[default]}", default)
+
+    from PyInquirer import prompt
+
     question = [
         {
             'type': 'list',
@@ -32,4 +40,4 @@ def choose(choices: list, msg: str = "What do you choose") -> int:
         if exit:
             raise SystemExit
         else:
-            return choose(choices, msg)
+            return choose(choices, msg, default)
@@ -1,9 +1,10 @@
-from PyInquirer import prompt
+from .unattended import is_unattended, answer as unattended_answer
 
 
 def confirm(msg: str = "Do you want it:", default: bool = True) -> bool:
     """
     Ask user to confirm something
+    In unattended mode default decision is returned.
 
     Args:
         msg (str): Message which display to user. This is question usually.
@@ -13,6 +14,12 @@ def confirm(msg: str = "Do you want it:", default: bool = True) -> bool:
         bool: True user is agreed. False if not.
     """
 
+    if is_unattended():
+        return unattended_answer(msg, default)
+
+    # PyInquirer loads prompt_toolkit, so it is imported on first question
+    from PyInquirer import prompt
+
     question = [
         {
             'type': 'confirm',
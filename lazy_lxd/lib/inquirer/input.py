@@ -1,19 +1,26 @@
-from PyInquirer import prompt
 from .confirm import confirm
+from .unattended import is_unattended, answer as unattended_answer
 
 
-def input_text(msg: str = "Type something") -> str:
+def input_text(msg: str = "Type something", default: str = '') -> str:
     """
     Ask user to enter text in response to a request input answer
+    In unattended mode default text is returned.
 
     Args:
         msg (str): Message which display to user.
                    This is request for input text usually.
+        default (str): Text which is returned in unattended mode.
 
     Returns:
         str: Text which user entered
     """
 
+    if is_unattended():
+        return unattended_answer(msg, default)
+
+    from PyInquirer import prompt
+
     question = [
         {
             "type": "input",
@@ -29,4 +36,4 @@ def input_text(msg: str = "Type something") -> str:
         if exit:
             raise SystemExit
         else:
-            return input_text(msg)
+            return input_text(msg, default)
@@ -1,5 +1,7 @@
-from PyInquirer import prompt
+import logging
+
 from .confirm import confirm
+from .unattended import is_unattended
 
 from typing import Callable
 
@@ -10,6 +12,7 @@ def password(
 ) -> str:
     """
     Ask user to enter password. It will be hide on the screen by *
+    Password has no default, so it couldn't be asked in unattended mode.
 
     Args:
         msg (str): Message which display to user.
@@ -21,6 +24,14 @@ def password(
         str: Password which user entered
     """
 
+    if is_unattended():
+        logging.getLogger('lazy_lxd').error(
+            f"{msg.strip()} Unable to ask password in unattended mode."
+        )
+        raise SystemExit(1)
+
+    from PyInquirer import prompt
+
     question = [
         {
             'type': 'password',
@@ -0,0 +1,49 @@
+import logging
+
+
+# Whether questions are answered by defaults without prompting the user
+_unattended = False
+
+
+def set_unattended(value: bool = True) -> None:
+    """
+    Turn on or off unattended mode.
+    In unattended mode no question is prompted,
+    each one is answered by its default.
+
+    Args:
+        value (bool): True to turn unattended mode on.
+    """
+
+    global _unattended
+    _unattended = value
+
+
+def is_unattended() -> bool:
+    """
+    Check whether unattended mode is on.
+
+    Returns:
+        bool: True if questions are answered without prompting.
+    """
+
+    return _unattended
+
+
+def answer(msg: str, default: object) -> object:
+    """
+    Answer question by default in unattended mode.
+    Answer is logged for tracing decisions made without user.
+
+    Args:
+        msg (str): Question which wasn't prompted.
+        default (object): Default answer.
+
+    Returns:
+        object: Default answer.
+    """
+
+    logging.getLogger('lazy_lxd').debug(
+        f"{msg.strip()} Answered without prompt: {default}"
+    )
+    return default
@@ -1,4 +1,8 @@
-def create(name: str) -> bool:
+# Key types which could be generated
+KEY_TYPES = ('ed25519', 'rsa')
+
+
+def create(name: str, key_type: str = 'ed25519') -> bool:
     """
     Generate SSH key pair and save their into $HOME/.ssh
 
@@ -6,38 +10,51 @@ def create(name: str) -> bool:
         name (str): Name of ssh keys.
                     Future naming will <name> for private,
                     and <name>.pub for public key
+        key_type (str): Type of key, ed25519 or rsa.
 
     Returns:
         bool: Status of saving keys operation, True if successful.
               Otherwise, False.
     """
 
-    keys = _generate()
+    keys = _generate(key_type)
     return _save(name, keys)
 
 
-def _generate() -> tuple:
+def _generate(key_type: str = 'ed25519') -> tuple:
     """
     Generate SSH key pair
-    Used RSA with length 2048 bit for a more secure
+    Ed25519 key is generated almost instantly and is short.
+    RSA is used with length 2048 bit for old systems.
+
+    Args:
+        key_type (str): Type of key, ed25519 or rsa.
 
     Returns:
         tuple: Private and public SSH key pair as bytes strings
     """
 
     from cryptography.hazmat.backends import default_backend
-    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
     from cryptography.hazmat.primitives import serialization
 
-    key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-        backend=default_backend()
-    )
+    if key_type == 'ed25519':
+        key = ed25519.Ed25519PrivateKey.generate()
+        # OpenSSH reads Ed25519 keys only in its own format
+        private_format = serialization.PrivateFormat.OpenSSH
+    elif key_type == 'rsa':
+        key = rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048,
+            backend=default_backend()
+        )
+        private_format = serialization.PrivateFormat.PKCS8
+    else:
+        raise ValueError(f"Unsupported type of SSH key {key_type}")
 
     private_key = key.private_bytes(
         encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
+        format=private_format,
         encryption_algorithm=serialization.NoEncryption()
     )
     public_key = key.public_key().public_bytes(
@@ -0,0 +1,73 @@
+import os
+import json
+import logging
+
+from lib.config import write_atomic
+
+
+class KeyIndex(object):
+    """
+    Index of SSH keys registered to containers.
+    Keeps path of private key for each container name,
+    so container created again by the same name gets the same key,
+    and one key serves all containers from batch.
+
+    Args:
+        path (str): Path to file of index.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._log = logging.getLogger('lazy_lxd')
+
+    def lookup(self, container_name: str) -> str:
+        """
+        Find private key registered to container.
+        Key which was deleted from disk isn't returned.
+
+        Args:
+            container_name (str): Name of container.
+
+        Returns:
+            str: Path to private key. None if not found.
+        """
+
+        key_path = self.__read().get(container_name)
+        if key_path is not None and os.path.exists(key_path):
+            return key_path
+        return None
+
+    def register(self, containers: list, private_key_path: str) -> None:
+        """
+        Register key to containers by one rewrite of index.
+
+        Args:
+            containers (list): Names of containers.
+            private_key_path (str): Path to private key.
+        """
+
+        index = self.__read()
+        for name in containers:
+            index[name] = private_key_path
+        try:
+            write_atomic(self._path, json.dumps(index, indent=2))
+        except OSError as e:
+            self._log.debug(f"Unable to save keys index: {e}")
+
+    def __read(self) -> dict:
+        """
+        Read index from disk.
+
+        Returns:
+            dict: Paths to private keys keyed by container name.
+                  Empty if index is absent or broken.
+        """
+
+        try:
+            with open(self._path) as fl:
+                index = json.load(fl)
+            if isinstance(index, dict):
+                return index
+        except (OSError, ValueError) as e:
+            self._log.debug(f"Unable to read keys index: {e}")
+        return dict()
@@ -1,11 +1,18 @@
+import os
 import logging
 from typing import BinaryIO
 
 from lib import inquirer
+from lib.logger import span
 
 from .search import search_public_key
 from .validate import valid
 from .create import create
+from .index import KeyIndex
+
+
+# Name of key which is generated once and reused for all containers
+MANAGED_KEY_NAME = 'lazy-lxd'
 
 
 class SSHKeys(object):
@@ -19,7 +26,15 @@ class SSHKeys(object):
         public_key (BinaryIO): Public part of SSH key as opened file
                                with bytes mode.
         container_name (str): Name of container which is beaning creating.
-                              Needs as name to creating SSH keys if it needed.
+                              Needs as name to creating SSH keys
+                              if keys per container are requested.
+        key_type (str): Type of generated key, ed25519 or rsa.
+        per_container (bool): Generate key for each container by its name,
+                              instead of reusing managed key.
+        key_index (str): Path to file of index of keys registered
+                         to containers. Index isn't used if not set.
+        validation_cache (str): Path to file of cache of validated keys.
+                                Cache isn't used if not set.
     """
 
     def __init__(
@@ -27,13 +42,21 @@ class SSHKeys(object):
         container_name: str,
         private_key: BinaryIO = None,
         public_key: BinaryIO = None,
+        key_type: str = 'ed25519',
+        per_container: bool = False,
+        key_index: str = None,
+        validation_cache: str = None
     ):
         self._log = logging.getLogger('lazy_lxd')
+        self._key_index = KeyIndex(key_index) if key_index else None
+        self._validation_cache = validation_cache
 
         self.private_key = None
         self.public_key = None
 
         self.container_name = container_name
+        self.key_type = key_type
+        self.key_name = container_name if per_container else MANAGED_KEY_NAME
 
         self.private_key_path = None
         self.public_key_path = None
@@ -51,6 +74,8 @@ class SSHKeys(object):
         Saving it into class properties.
         Validating keys correctness.
         Creating new if keys obtained from arguments is not exists.
+        Without keys in arguments, key registered to container
+        or managed key is used.
 
         Args:
             private_key (BinaryIO): Private part of SSH key
@@ -59,6 +84,9 @@ class SSHKeys(object):
                                    as opened file with bytes mode.
         """
 
+        if private_key is None and public_key is None:
+            private_key, public_key = self.__find_keys()
+
         if private_key is not None and public_key is None:
             try:
                 self._log.debug(
@@ -77,17 +105,19 @@ class SSHKeys(object):
         if private_key is not None and public_key is not None:
             private_key_content = private_key.read()
             public_key_content = public_key.read()
-            self._keys_is_valid = valid(
-                private_key_content,
-                public_key_content
-            )
+            with span('keys.validate'):
+                self._keys_is_valid = valid(
+                    private_key_content,
+                    public_key_content,
+                    self._validation_cache
+                )
             if not self._keys_is_valid:
-                self._log.error("Keys pair has invalid signature.")
+                self._log.error("Public key doesn't match private key.")
 
         if not self._keys_is_valid:
             self._create_keys = inquirer.confirm(
                 "Create new SSH key pair\n"
-                "  Will be named by name of container."
+                f"  Will be saved as ~/.ssh/{self.key_name}."
             )
             if not self._create_keys:
                 self.disable_ssh = True
@@ -98,9 +128,13 @@ class SSHKeys(object):
                 return
             else:
                 self._log.debug(
-                    f"Creating SSH keys by name {self.container_name}"
+                    f"Creating {self.key_type} SSH keys "
+                    f"by name {self.key_name}"
                 )
-                private_key, public_key = create(self.container_name)
+                with span('keys.generate', key_type=self.key_type):
+                    private_key, public_key = create(
+                        self.key_name, self.key_type
+                    )
 
         # prevent EOF pointer
         private_key.seek(0)
@@ -110,3 +144,48 @@ class SSHKeys(object):
         self.public_key_content = public_key.read()
         self.private_key_path = private_key.name
         self.public_key_path = public_key.name
+
+    def register(self, containers: list) -> None:
+        """
+        Remember that keys are registered to containers.
+        Next time the same key is used for containers with these names.
+
+        Args:
+            containers (list): Names of containers.
+        """
+
+        if self._key_index is None or self.disable_ssh:
+            return
+        self._key_index.register(containers, self.private_key_path)
+
+    def __find_keys(self) -> tuple:
+        """
+        Looking for existing keys when they aren't passed into arguments.
+        At first, key registered to container, then managed key.
+
+        Returns:
+            tuple: Private and public SSH key pair as opened binary files.
+                   Nones if keys are not found.
+        """
+
+        key_path = None
+        if self._key_index is not None:
+            key_path = self._key_index.lookup(self.container_name)
+        if key_path is None:
+            key_path = os.path.join(
+                os.environ['HOME'], '.ssh', self.key_name
+            )
+
+        try:
+            private_key = open(key_path, 'rb')
+        except OSError:
+            return (None, None)
+
+        try:
+            public_key = search_public_key(key_path)
+        except FileNotFoundError:
+            private_key.close()
+            return (None, None)
+
+        self._log.debug(f"Using existing SSH key {key_path}")
+        return (private_key, public_key)
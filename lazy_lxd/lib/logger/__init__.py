@@ -1,5 +1,12 @@
 from .initialize import init
+from .spinner import spinner, set_spinner_enabled
+from .trace import span
+from . import trace
 
 __all__ = [
-    'init'
+    'init',
+    'spinner',
+    'set_spinner_enabled',
+    'span',
+    'trace'
 ]
@@ -0,0 +1,43 @@
+import threading
+
+
+# Whether spinners are shown at all, e.g. benchmarks turn them off
+_enabled = True
+
+
+def set_spinner_enabled(value: bool = True) -> None:
+    """
+    Turn spinners on or off for the whole process.
+    Disabled spinner doesn't write anything to terminal.
+
+    Args:
+        value (bool): True to show spinners.
+    """
+
+    global _enabled
+    _enabled = value
+
+
+def spinner(text: str) -> object:
+    """
+    Build spinner which shows while long operation is performing.
+    Spinner is animated only from the main thread.
+    Worker threads get a disabled one, so parallel jobs
+    don't scramble the terminal.
+
+    Args:
+        text (str): Message which display near the spinner.
+
+    Returns:
+        object: Halo spinner object. Should be used as context manager.
+    """
+
+    from halo import Halo
+
+    return Halo(
+        text=text,
+        spinner="dots12",
+        color="blue",
+        enabled=_enabled and
+        threading.current_thread() is threading.main_thread()
+    )
@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+
+# Spans are recorded only when profiling is turned on
+_enabled = False
+_spans = list()
+_lock = threading.Lock()
+_local = threading.local()
+_trace_id = None
+
+# Parent is taken from spans opened by the same thread
+_CURRENT = object()
+
+
+class Span():
+    """
+    Timed operation of the run.
+    Spans opened inside other span of the same thread become its children.
+
+    Args:
+        name (str): Name of operation.
+        parent (Span): Parent span. None for root span.
+        attributes (dict): Details of operation, e.g. container name.
+    """
+
+    def __init__(self, name: str, parent: 'Span', attributes: dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self.__started = time.perf_counter()
+
+    def set(self, **attributes) -> None:
+        """
+        Add details which became known while operation is performing.
+        """
+
+        self.attributes.update(attributes)
+
+    def finish(self, error: BaseException = None) -> None:
+        """
+        Stop timing of operation.
+
+        Args:
+            error (BaseException): Exception which interrupted operation.
+        """
+
+        self.duration = time.perf_counter() - self.__started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+
+def enable() -> None:
+    """
+    Turn on recording of spans for the rest of the run.
+    """
+
+    global _enabled, _trace_id
+    _enabled = True
+    _trace_id = os.urandom(16).hex()
+
+
+def is_enabled() -> bool:
+    """
+    Check whether spans are recorded.
+
+    Returns:
+        bool: True if profiling is on.
+    """
+
+    return _enabled
+
+
+def current() -> Span:
+    """
+    Get the innermost span opened by current thread.
+
+    Returns:
+        Span: Opened span. None if there is no one or profiling is off.
+    """
+
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name: str, parent: Span = _CURRENT, **attributes) -> Span:
+    """
+    Measure operation performed inside of the context.
+    It costs nothing if profiling is off.
+
+    Coroutines of one thread are interleaved, so spans inside them
+    should get parent explicitly. Such spans don't become parents
+    of other spans implicitly.
+
+    Args:
+        name (str): Name of operation.
+        parent (Span): Parent span. Innermost span of current thread
+                       is used if not set.
+        attributes: Details of operation, e.g. container name.
+
+    Returns:
+        Span: Opened span. None if profiling is off.
+    """
+
+    if not _enabled:
+        yield None
+        return
+
+    detached = parent is not _CURRENT
+    if not detached:
+        parent = current()
+    opened = Span(name, parent, attributes)
+
+    if not detached:
+        if getattr(_local, 'stack', None) is None:
+            _local.stack = list()
+        _local.stack.append(opened)
+    try:
+        yield opened
+    except BaseException as e:
+        opened.finish(e)
+        raise
+    else:
+        opened.finish()
+    finally:
+        if not detached:
+            _local.stack.pop()
+        with _lock:
+            _spans.append(opened)
+
+
+def inherit(function: Callable) -> Callable:
+    """
+    Bind function to the innermost span of current thread,
+    so spans opened by function in other thread, e.g. in thread pool,
+    become children of this span.
+
+    Args:
+        function (callable): Function which will run in other thread.
+
+    Returns:
+        callable: Function with the same arguments.
+    """
+
+    parent = current()
+    if parent is None:
+        return function
+
+    def inherited(*args, **kwargs):
+        if getattr(_local, 'stack', None) is None:
+            _local.stack = list()
+        _local.stack.append(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.stack.pop()
+
+    return inherited
+
+
+def spans() -> list:
+    """
+    Get finished spans ordered by start time.
+
+    Returns:
+        list: Span list.
+    """
+
+    with _lock:
+        return sorted(_spans, key=lambda s: s.start)
+
+
+def report() -> str:
+    """
+    Build timing table of the run.
+    Spans of the same operation are summed up, e.g. commands
+    executed in several containers.
+
+    Returns:
+        str: Human readable table.
+    """
+
+    finished = spans()
+    total = sum(s.duration for s in finished if s.parent_id is None)
+
+    operations = dict()
+    for finished_span in finished:
+        operations.setdefault(finished_span.name, list()).append(
+            finished_span.duration
+        )
+
+    width = max([len(name) for name in operations] + [len('Operation')])
+    lines = [
+        f"{'Operation':<{width}} {'Count':>6} {'Total, s':>9} "
+        f"{'Mean, s':>8} {'Max, s':>8} {'Share':>6}"
+    ]
+    for name, durations in sorted(
+        operations.items(), key=lambda item: sum(item[1]), reverse=True
+    ):
+        spent = sum(durations)
+        share = spent / total * 100 if total > 0 else 0
+        lines.append(
+            f"{name:<{width}} {len(durations):>6} {spent:>9.3f} "
+            f"{spent / len(durations):>8.3f} {max(durations):>8.3f} "
+            f"{share:>5.1f}%"
+        )
+    return '\n'.join(lines)
+
+
+def export() -> dict:
+    """
+    Build trace of the run in OpenTelemetry (OTLP JSON) format,
+    so it could be loaded by tracing tools, e.g. Jaeger.
+
+    Returns:
+        dict: Trace of the run.
+    """
+
+    def attribute(key: str, value: object) -> dict:
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    otlp_spans = list()
+    for finished_span in spans():
+        start = int(finished_span.start * 1e9)
+        otlp_span = {
+            'traceId': _trace_id,
+            'spanId': finished_span.span_id,
+            'name': finished_span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(start),
+            'endTimeUnixNano': str(
+                start + int(finished_span.duration * 1e9)
+            ),
+            'attributes': [
+                attribute(key, value)
+                for key, value in finished_span.attributes.items()
+            ],
+            'status': {'code': 1}
+        }
+        if finished_span.parent_id is not None:
+            otlp_span['parentSpanId'] = finished_span.parent_id
+        if finished_span.error is not None:
+            otlp_span['status'] = {
+                'code': 2, 'message': finished_span.error
+            }
+        otlp_spans.append(otlp_span)
+
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [attribute('service.name', 'lazy-lxd')]
+            },
+            'scopeSpans': [{
+                'scope': {'name': 'lazy_lxd'},
+                'spans': otlp_spans
+            }]
+        }]
+    }
+
+
+def save(path: str) -> None:
+    """
+    Write trace of the run to file in OpenTelemetry JSON format.
+
+    Args:
+        path (str): Path to trace file.
+    """
+
+    with open(path, 'w') as fl:
+        json.dump(export(), fl, indent=2)
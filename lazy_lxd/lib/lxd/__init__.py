@@ -5,7 +5,24 @@ Such as downloading image, wrappers above container states, etc.
 """
 
 from .client import LXDClient
+from .batch import BatchResult, create_batch, create_batch_async
+from .aio import AsyncLXDClient, AsyncLXDError
+from .pool import ContainerPool
+from .connection import shared_client
+from .prefetch import PrefetchResult, parse_target, prefetch
+from .streams import SimpleStreams
 
 __all__ = [
-    'LXDClient'
+    'LXDClient',
+    'BatchResult',
+    'create_batch',
+    'create_batch_async',
+    'AsyncLXDClient',
+    'AsyncLXDError',
+    'ContainerPool',
+    'shared_client',
+    'PrefetchResult',
+    'parse_target',
+    'prefetch',
+    'SimpleStreams'
 ]
@@ -0,0 +1,550 @@
+import os
+import json
+import base64
+import struct
+import asyncio
+import logging
+from typing import Callable
+from urllib.parse import urlencode
+
+from .execute import STDOUT, STDERR, LineSplitter
+
+
+# Sockets of LXD installed from snap and from distribution packages
+SOCKET_PATHS = (
+    '/var/snap/lxd/common/lxd/unix.socket',
+    '/var/lib/lxd/unix.socket'
+)
+# Websocket opcodes which are used by LXD
+WS_CONTINUATION = 0x0
+WS_TEXT = 0x1
+WS_BINARY = 0x2
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+
+
+class AsyncLXDError(Exception):
+    """
+    Error returned by LXD API or occurred while talking to it.
+    """
+
+
+def socket_path() -> str:
+    """
+    Find unix socket of LXD the same way as LXD client does.
+    Socket from LXD_DIR environment variable has priority.
+
+    Returns:
+        str: Path to LXD unix socket.
+    """
+
+    if os.environ.get('LXD_DIR'):
+        return os.path.join(os.environ['LXD_DIR'], 'unix.socket')
+    for path in SOCKET_PATHS:
+        if os.path.exists(path):
+            return path
+    return SOCKET_PATHS[-1]
+
+
+class AsyncLXDClient(object):
+    """
+    Asyncio client of LXD REST API over unix socket.
+    Connections are kept alive and reused from pool,
+    so many operations are performed concurrently in one thread
+    without connecting for each request.
+    Exec is served thru websockets.
+
+    Client should be used inside one event loop.
+
+    Args:
+        path (str): Path to LXD unix socket. Found automatically if not set.
+        pool_size (int): Maximum number of simultaneous requests.
+                         Websockets don't count.
+    """
+
+    def __init__(self, path: str = None, pool_size: int = 8):
+        self.path = path or socket_path()
+        self._pool_size = pool_size
+        self._log = logging.getLogger('lazy_lxd')
+
+        self._idle = list()
+        self._slots = None
+
+    async def request(
+        self, method: str, path: str, body: object = None
+    ) -> dict:
+        """
+        Perform request to LXD API.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path of API endpoint, e.g. /1.0/containers.
+            body (object): JSON body of request.
+
+        Returns:
+            dict: Response of LXD.
+
+        Raises:
+            AsyncLXDError: If LXD returned error.
+        """
+
+        payload = b'' if body is None else json.dumps(body).encode()
+        head = [
+            f"{method} {path} HTTP/1.1",
+            "Host: lxd",
+            f"Content-Length: {len(payload)}",
+            "Content-Type: application/json"
+        ]
+        message = ('\r\n'.join(head) + '\r\n\r\n').encode() + payload
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._pool_size)
+
+        async with self._slots:
+            status, response_headers, data = await self.__send(message)
+
+        try:
+            response = json.loads(data.decode()) if data else {}
+        except ValueError:
+            raise AsyncLXDError(f"Unexpected response of LXD: {data[:200]}")
+        if status >= 400 or response.get('type') == 'error':
+            raise AsyncLXDError(
+                response.get('error') or f"LXD responded {status}"
+            )
+        return response
+
+    async def wait_operation(self, operation: str) -> dict:
+        """
+        Wait until operation is finished.
+
+        Args:
+            operation (str): Path of operation.
+
+        Returns:
+            dict: Metadata of finished operation.
+
+        Raises:
+            AsyncLXDError: If operation was failed.
+        """
+
+        response = await self.request('GET', f"{operation}/wait")
+        metadata = response.get('metadata') or {}
+        if metadata.get('status') != 'Success':
+            raise AsyncLXDError(
+                metadata.get('err') or f"Operation {operation} was failed"
+            )
+        return metadata
+
+    async def operate(
+        self, method: str, path: str, body: object = None
+    ) -> dict:
+        """
+        Perform request which starts background operation,
+        and wait for the operation.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path of API endpoint.
+            body (object): JSON body of request.
+
+        Returns:
+            dict: Metadata of finished operation.
+        """
+
+        response = await self.request(method, path, body)
+        if response.get('type') != 'async':
+            return response.get('metadata') or {}
+        return await self.wait_operation(response['operation'])
+
+    async def get_container(self, name: str) -> dict:
+        """
+        Get container info, including config and devices.
+
+        Args:
+            name (str): Name of container.
+
+        Returns:
+            dict: Container info.
+        """
+
+        response = await self.request('GET', f"/1.0/containers/{name}")
+        return response['metadata']
+
+    async def create_container(self, config: dict) -> None:
+        """
+        Create container and wait until it's created.
+
+        Args:
+            config (dict): Container config, the same as for pylxd.
+        """
+
+        await self.operate('POST', '/1.0/containers', config)
+
+    async def set_state(
+        self, name: str, action: str, force: bool = False
+    ) -> None:
+        """
+        Change state of container and wait for it.
+
+        Args:
+            name (str): Name of container.
+            action (str): start, stop or restart.
+            force (bool): Force stopping.
+        """
+
+        await self.operate('PUT', f"/1.0/containers/{name}/state", {
+            'action': action,
+            'timeout': 30,
+            'force': force
+        })
+
+    async def state(self, name: str) -> dict:
+        """
+        Get current state of container.
+
+        Args:
+            name (str): Name of container.
+
+        Returns:
+            dict: Container state with status and network.
+        """
+
+        response = await self.request(
+            'GET', f"/1.0/containers/{name}/state"
+        )
+        return response['metadata']
+
+    async def delete_container(self, name: str) -> None:
+        """
+        Delete stopped container.
+
+        Args:
+            name (str): Name of container.
+        """
+
+        await self.operate('DELETE', f"/1.0/containers/{name}")
+
+    async def execute(
+        self, name: str, command: list, environment: dict = None,
+        handler: Callable = None
+    ) -> tuple:
+        """
+        Execute command inside container.
+        Output is received thru websockets while command is running.
+        If handler is set, output is passed to it line by line
+        instead of being accumulated.
+
+        Args:
+            name (str): Name of container.
+            command (list): Command with arguments.
+            environment (dict): Environment variables of command.
+            handler (callable): Called with stream name, STDOUT or STDERR,
+                                and line of output.
+
+        Returns:
+            tuple: Exit code, standard and error output.
+                   Output is empty if handler is set.
+        """
+
+        response = await self.request(
+            'POST', f"/1.0/containers/{name}/exec", {
+                'command': command,
+                'environment': environment or {},
+                'wait-for-websocket': True,
+                'interactive': False
+            }
+        )
+        operation = response['operation']
+        fds = response['metadata']['metadata']['fds']
+
+        # command is started only after all websockets are connected
+        stdin, stdout, stderr, control = await asyncio.gather(*[
+            self.websocket(
+                f"{operation}/websocket?{urlencode({'secret': fds[fd]})}"
+            )
+            for fd in ('0', '1', '2', 'control')
+        ])
+        try:
+            await stdin.close()
+            if handler is None:
+                out, err = await asyncio.gather(
+                    stdout.read_all(), stderr.read_all()
+                )
+            else:
+                out, err = b'', b''
+                await asyncio.gather(
+                    stdout.stream(LineSplitter(STDOUT, handler)),
+                    stderr.stream(LineSplitter(STDERR, handler))
+                )
+            metadata = await self.wait_operation(operation)
+        finally:
+            for ws in (stdin, stdout, stderr, control):
+                ws.abort()
+
+        code = (metadata.get('metadata') or {}).get('return')
+        return (code, out.decode(errors='replace'),
+                err.decode(errors='replace'))
+
+    async def websocket(self, path: str) -> '_WebSocket':
+        """
+        Open websocket to LXD API by separate connection.
+
+        Args:
+            path (str): Path of websocket endpoint.
+
+        Returns:
+            _WebSocket: Connected websocket.
+        """
+
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            f"GET {path} HTTP/1.1\r\n"
+            "Host: lxd\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        await writer.drain()
+
+        status, _, data = await _read_response(reader, upgrade=True)
+        if status != 101:
+            writer.close()
+            raise AsyncLXDError(
+                f"Unable to open websocket {path}: {data[:200]}"
+            )
+        return _WebSocket(reader, writer)
+
+    def close(self) -> None:
+        """
+        Close all idle connections.
+        """
+
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def __send(self, message: bytes) -> tuple:
+        """
+        Send HTTP request by connection from pool.
+        Idle connection could be closed by LXD meanwhile,
+        then request is repeated by new connection.
+
+        Args:
+            message (bytes): Whole HTTP request.
+
+        Returns:
+            tuple: Status, headers and body of response.
+        """
+
+        while True:
+            reused = len(self._idle) > 0
+            if reused:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_unix_connection(
+                    self.path
+                )
+
+            try:
+                writer.write(message)
+                await writer.drain()
+                status, headers, data = await _read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                if reused:
+                    continue
+                raise AsyncLXDError(f"Connection to LXD was broken: {e}")
+
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+            else:
+                self._idle.append((reader, writer))
+            return (status, headers, data)
+
+
+async def _read_response(reader: object, upgrade: bool = False) -> tuple:
+    """
+    Internal function for reading HTTP response.
+    Body with content length and chunked body are supported.
+
+    Args:
+        reader (object): asyncio stream reader.
+        upgrade (bool): Response could switch protocol,
+                        then body isn't read.
+
+    Returns:
+        tuple: Status, headers and body of response.
+    """
+
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection was closed by LXD")
+    status = int(line.split()[1])
+
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    if upgrade and status == 101:
+        return (status, headers, b'')
+
+    if 'content-length' in headers:
+        data = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = list()
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip(), 16)
+            if size == 0:
+                # trailers are ended by empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        data = b''.join(chunks)
+    else:
+        data = await reader.read()
+
+    return (status, headers, data)
+
+
+class _WebSocket(object):
+    """
+    Minimal websocket client, enough for LXD exec.
+
+    Args:
+        reader (object): asyncio stream reader of connection.
+        writer (object): asyncio stream writer of connection.
+    """
+
+    def __init__(self, reader: object, writer: object):
+        self._reader = reader
+        self._writer = writer
+        self._closed = False
+
+    async def receive(self) -> tuple:
+        """
+        Receive one message. Pings are answered by the way.
+
+        Returns:
+            tuple: Opcode and payload of message.
+                   Close opcode if connection is closed.
+        """
+
+        message = b''
+        message_opcode = None
+        while True:
+            try:
+                head = await self._reader.readexactly(2)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                return (WS_CLOSE, b'')
+
+            fin, opcode = head[0] & 0x80, head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                extended = await self._reader.readexactly(2)
+                length = struct.unpack('!H', extended)[0]
+            elif length == 127:
+                extended = await self._reader.readexactly(8)
+                length = struct.unpack('!Q', extended)[0]
+            mask = b''
+            if head[1] & 0x80:
+                mask = await self._reader.readexactly(4)
+            payload = await self._reader.readexactly(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+            if opcode == WS_PING:
+                await self.send(payload, WS_PONG)
+                continue
+            if opcode == WS_PONG:
+                continue
+            if opcode == WS_CLOSE:
+                return (WS_CLOSE, payload)
+
+            if opcode != WS_CONTINUATION:
+                message_opcode = opcode
+            message += payload
+            if fin:
+                return (message_opcode, message)
+
+    async def read_all(self) -> bytes:
+        """
+        Read stream until its end.
+        LXD ends stream by empty text message or by closing.
+
+        Returns:
+            bytes: Whole stream.
+        """
+
+        chunks = list()
+        while True:
+            opcode, payload = await self.receive()
+            if opcode == WS_CLOSE or (opcode == WS_TEXT and not payload):
+                return b''.join(chunks)
+            chunks.append(payload)
+
+    async def stream(self, splitter: LineSplitter) -> None:
+        """
+        Pass stream to splitter by messages until its end.
+
+        Args:
+            splitter (LineSplitter): Receiver of stream.
+        """
+
+        while True:
+            opcode, payload = await self.receive()
+            if opcode == WS_CLOSE or (opcode == WS_TEXT and not payload):
+                splitter.close()
+                return
+            splitter.feed(payload)
+
+    async def send(self, payload: bytes, opcode: int = WS_BINARY) -> None:
+        """
+        Send one message. Client messages are always masked.
+
+        Args:
+            payload (bytes): Content of message.
+            opcode (int): Type of message.
+        """
+
+        head = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            head += bytes([0x80 | length])
+        elif length < 1 << 16:
+            head += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            head += bytes([0x80 | 127]) + struct.pack('!Q', length)
+
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self._writer.write(head + mask + masked)
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        """
+        Tell other side that nothing will be sent anymore.
+        """
+
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.send(struct.pack('!H', 1000), WS_CLOSE)
+        except ConnectionError:
+            pass
+
+    def abort(self) -> None:
+        """
+        Close connection without handshake.
+        """
+
+        self._writer.close()
@@ -0,0 +1,169 @@
+import time
+import asyncio
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from lib.logger import span, trace
+from .aio import AsyncLXDClient
+
+
+BatchResult = namedtuple('BatchResult', ['name', 'ip', 'elapsed', 'error'])
+BatchResult.__doc__ = """
+Result of creating one container in batch.
+
+Args:
+    name (str): Name of container.
+    ip (str): IP address of container. None if container wasn't started.
+    elapsed (float): Seconds spent on the container.
+    error (str): Error message. None if container created successfully.
+"""
+
+
+def create_batch(
+    clients: list,
+    concurrency: int = 4,
+    provision: Callable[..., None] = None
+) -> list:
+    """
+    Create and start many containers concurrently.
+    Each container is handled by its own LXD client in a thread pool.
+    Failure of one container doesn't interrupt others.
+
+    Args:
+        clients (list): LXDClient objects, one per container.
+                        Image fingerprint should be resolved already,
+                        otherwise user could be asked from several threads.
+        concurrency (int): Maximum number of containers handled at once.
+        provision (callable): Function which takes LXDClient
+                              and does additional job over started container.
+
+    Returns:
+        list: BatchResult for each client, in the same order as clients.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+    log.debug(
+        f"Creating {len(clients)} containers, "
+        f"{concurrency} at the same time."
+    )
+
+    with span('batch.create', containers=len(clients)), \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        launch = trace.inherit(_launch)
+        futures = [
+            executor.submit(launch, client, provision) for client in clients
+        ]
+        return [future.result() for future in futures]
+
+
+def _launch(client: object, provision: Callable[..., None]) -> BatchResult:
+    """
+    Internal function for creating, starting
+    and provisioning single container from batch.
+
+    Args:
+        client (object): LXDClient object of container.
+        provision (callable): Additional job over started container.
+
+    Returns:
+        BatchResult: Result of container creating.
+    """
+
+    started = time.monotonic()
+    error = None
+    try:
+        with span('container.launch', container=client.container_name):
+            client.create_container()
+            client.start_container()
+            if provision is not None:
+                provision(client)
+    # LXDClient logs errors by itself and exits,
+    # but exit of one container shouldn't stop others
+    except SystemExit:
+        error = "Creating was failed, see errors above."
+    except Exception as e:
+        error = str(e)
+
+    return BatchResult(
+        client.container_name, client.container_ip,
+        time.monotonic() - started, error
+    )
+
+
+def create_batch_async(
+    clients: list,
+    concurrency: int = 4,
+    provisioning: Callable[..., object] = None
+) -> list:
+    """
+    Create, start and provision many containers concurrently
+    thru asyncio LXD client. Everything is done in one thread,
+    while one container waits for LXD, others go on.
+    Failure of one container doesn't interrupt others.
+
+    Args:
+        clients (list): LXDClient objects, one per container.
+                        Image fingerprint should be resolved already.
+        concurrency (int): Maximum number of containers handled at once.
+        provisioning (callable): Function which takes LXDClient
+                                 and returns Provisioning steps
+                                 for started container.
+
+    Returns:
+        list: BatchResult for each client, in the same order as clients.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+    log.debug(
+        f"Creating {len(clients)} containers thru asyncio, "
+        f"{concurrency} at the same time."
+    )
+
+    loop = asyncio.new_event_loop()
+    try:
+        with span('batch.create', containers=len(clients), asyncio=True):
+            return loop.run_until_complete(
+                _launch_all(clients, max(1, concurrency), provisioning)
+            )
+    finally:
+        loop.close()
+
+
+async def _launch_all(
+    clients: list, concurrency: int, provisioning: Callable[..., object]
+) -> list:
+    """
+    Internal coroutine for launching all containers from batch.
+
+    Args:
+        clients (list): LXDClient objects.
+        concurrency (int): Maximum number of containers handled at once.
+        provisioning (callable): Function which returns
+                                 Provisioning steps of container.
+
+    Returns:
+        list: BatchResult for each client.
+    """
+
+    client = AsyncLXDClient(pool_size=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def launch(lxd: object) -> BatchResult:
+        async with slots:
+            started = time.monotonic()
+            error = None
+            try:
+                await lxd.launch_async(client, provisioning)
+            except RuntimeError as e:
+                error = str(e)
+            return BatchResult(
+                lxd.container_name, lxd.container_ip,
+                time.monotonic() - started, error
+            )
+
+    try:
+        return await asyncio.gather(*[launch(lxd) for lxd in clients])
+    finally:
+        client.close()
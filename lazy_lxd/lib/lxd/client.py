@@ -1,11 +1,15 @@
 import logging
-from typing import BinaryIO
+from typing import BinaryIO, Callable
 
 import pylxd
 
+from lib.logger import span, trace
 from .container import (
     set_name,
     create,
+    clone,
+    image_config,
+    copy_config,
     delete,
     run,
     restart,
@@ -14,10 +18,24 @@ from .container import (
 from .image import (
     exists,
     download,
-    get_fingerprint
+    get_fingerprint,
+    ubuntu_codename
 )
-from .execute import (
-    run_command
+from .provision import Provisioning
+from .ssh_image import (
+    get_ssh_image,
+    build_ssh_image
+)
+from .index import shared_index
+from .streams import SimpleStreams
+from .connection import shared_client
+from .pool import ContainerPool
+from .aio import AsyncLXDClient, AsyncLXDError
+from .readiness import (
+    wait_network_address_async,
+    NETWORK_TIMEOUT,
+    NETWORK_INTERVAL,
+    NETWORK_MAX_INTERVAL
 )
 
 
@@ -32,58 +50,103 @@ class LXDClient():
                            where will create container.
         os_version (str): Version of requested image.
                           Could be as codename and version.
+        network_timeout (float): Seconds to wait for container network.
+        network_interval (float): Initial delay between checks
+                                  of container network in seconds.
+        network_max_interval (float): Upper limit of delay between checks
+                                      of container network in seconds.
+        image_cache (str): Path to file of on-disk cache of images list.
+                           Cache is disabled if not set.
+        container_config (dict): Additional config of future LXD container.
+        source_container (str): Name of container, or container/snapshot,
+                                which is copied instead of creating
+                                container from image.
+        client (object): pylxd client object.
+                         Client shared by the process is used if not set.
+        streams (SimpleStreams): Index of server where images are
+                                 downloaded from. linuxcontainers.org
+                                 without cache is used if not set.
     """
 
     def __init__(
         self,
         name: str,
         os_template: str, os_version: str,
+        network_timeout: float = NETWORK_TIMEOUT,
+        network_interval: float = NETWORK_INTERVAL,
+        network_max_interval: float = NETWORK_MAX_INTERVAL,
+        image_cache: str = None,
+        container_config: dict = None,
+        source_container: str = None,
+        client: object = None,
+        streams: SimpleStreams = None
     ):
         # functions
         # container
         self.__set_container_name = set_name
         self._create_container = create
+        self._clone_container = clone
         # image
         self.__is_exists_image = exists
         self._download_image = download
         self._get_image_fingerprint = get_fingerprint
 
         # variables and constants
-        self._client = pylxd.Client()
+        self._client = client if client is not None else shared_client()
         self._log = logging.getLogger('lazy_lxd')
+        self._image_index = shared_index(self._client, image_cache)
+        self._streams = streams if streams is not None else SimpleStreams()
 
         self.__container = None
         self.container_name = self.__set_container_name(self, name)
         self.container_ip = None
         self.container_is_running = False
+        self.container_config = dict(container_config or {})
+        self.source_container = source_container
+        self.network_wait = {
+            'timeout': network_timeout,
+            'interval': network_interval,
+            'max_interval': network_max_interval
+        }
 
         self.image_os = os_template
         self.image_version = self.__get_os_codename_version(os_version)
-        self.image_exists = self.__is_exists_image(self)
         self.image_fingerprint = None
+        self.image_ssh_ready = False
+
+    @property
+    def image_exists(self) -> bool:
+        """
+        Whether requested image is in local storage.
+        Images are listed on first use only, so cloned containers
+        and containers from pool don't wait for it.
+        """
+
+        return self.__is_exists_image(self)
 
     def download_image(self) -> None:
         """
-        Download LXD image from linuxcontainers.org to local storage.
+        Download LXD image from simplestreams server to local storage.
         """
 
         try:
             self._log.debug(
                 f"Downloading image {self.image_os}:{self.image_version} from "
-                "linuxcontainers.org."
+                f"{self._streams.server}"
             )
             self._download_image(self)
-        except pylxd.exceptions.LXDAPIException as e:
+        except (pylxd.exceptions.LXDAPIException, RuntimeError) as e:
             self._log.error(str(e))
             raise SystemExit
 
-    def create_container(self) -> None:
+    def resolve_image_fingerprint(self) -> str:
         """
-        Create LXD empty container from the existing image
-        using it fingerprint.
-        At first, looking for image fingerprint.
+        Looking for fingerprint of requested image in local storage.
         If found more than one requested image, offer choose from list.
-        List contains images which fits by requested criteria.
+        Found fingerprint is remembered for creating container.
+
+        Returns:
+            str: Fingerprint of image.
         """
 
         self.image_fingerprint = self._get_image_fingerprint(self)
@@ -91,6 +154,68 @@ class LXDClient():
             f"Got image {self.image_os}:{self.image_version} "
             f"fingerprint: {self.image_fingerprint}"
         )
+        return self.image_fingerprint
+
+    def use_ssh_image(self) -> str:
+        """
+        Switch container creating to ssh-ready image,
+        which is derived from requested image with OpenSSH server installed.
+        Ssh-ready image is built on first use
+        and rebuilt when requested image changes.
+
+        Returns:
+            str: Fingerprint of ssh-ready image.
+        """
+
+        if self.image_fingerprint is None:
+            self.resolve_image_fingerprint()
+        base_fingerprint = self.image_fingerprint
+
+        fingerprint = get_ssh_image(self, base_fingerprint)
+        if fingerprint is None:
+            self._log.info(
+                f"Building ssh-ready image of {self.image_os} "
+                f"{self.image_version}. It's needed only once."
+            )
+            try:
+                with span('ssh_image.build', os=self.image_os,
+                          release=self.image_version):
+                    fingerprint = build_ssh_image(
+                        self, base_fingerprint,
+                        self._openssh_steps() + self._ssh_dir_steps()
+                    )
+            except (RuntimeError, TimeoutError,
+                    pylxd.exceptions.LXDAPIException) as e:
+                self._log.error(
+                    f"Occurred error while building ssh-ready image: {e}"
+                )
+                raise SystemExit(1)
+
+        self._log.debug(
+            f"Using ssh-ready image {fingerprint} "
+            f"derived from {base_fingerprint}"
+        )
+        self.image_fingerprint = fingerprint
+        self.image_ssh_ready = True
+        return fingerprint
+
+    def create_container(self) -> None:
+        """
+        Create LXD empty container from the existing image
+        using it fingerprint.
+        At first, looking for image fingerprint.
+        If found more than one requested image, offer choose from list.
+        List contains images which fits by requested criteria.
+        Fingerprint which was resolved earlier is reused as is.
+        If source container is set, it's copied instead.
+        """
+
+        if self.source_container is not None:
+            self.__clone_container()
+            return
+
+        if self.image_fingerprint is None:
+            self.resolve_image_fingerprint()
 
         try:
             self._log.debug(
@@ -102,6 +227,120 @@ class LXDClient():
             self._log.error(str(e))
             raise SystemExit
 
+    def __clone_container(self) -> None:
+        """
+        Create LXD container as copy of source container.
+        OS and release are taken from the copy, they are needed
+        for installing OpenSSH server.
+        """
+
+        try:
+            self._log.debug(
+                f"Cloning container {self.container_name} "
+                f"from {self.source_container}"
+            )
+            self.__container = self._clone_container(self)
+        except pylxd.exceptions.LXDAPIException as e:
+            self._log.error(str(e))
+            raise SystemExit
+
+        config = self.__container.config
+        self.image_os = config.get('image.os', self.image_os).lower()
+        self.image_version = config.get(
+            'image.release', self.image_version
+        ).lower()
+
+    def list_containers(self) -> list:
+        """
+        Get names of all LXD containers by one request.
+
+        Returns:
+            list: Names of containers.
+        """
+
+        response = self._client.api.containers.get()
+        return [url.split('/')[-1] for url in response.json()['metadata']]
+
+    def bridge_dns(self) -> dict:
+        """
+        Get DNS server of LXD bridge which container is attached to.
+        LXD serves names of containers on it by itself.
+
+        Returns:
+            dict: Bridge name, address of DNS server and domain
+                  of containers. None if container isn't on LXD bridge.
+        """
+
+        devices = self.__container.expanded_devices or {}
+        nic = devices.get('eth0') or {}
+        bridge = nic.get('network') or nic.get('parent')
+        if bridge is None:
+            return None
+
+        try:
+            response = self._client.api.networks[bridge].get()
+        except pylxd.exceptions.LXDAPIException as e:
+            self._log.debug(f"Unable to get network {bridge}: {e}")
+            return None
+
+        config = response.json()['metadata'].get('config') or {}
+        address = config.get('ipv4.address', 'none').split('/')[0]
+        if address in ('', 'none'):
+            return None
+
+        return {
+            'bridge': bridge,
+            'dns': address,
+            'domain': config.get('dns.domain') or 'lxd'
+        }
+
+    def container_pool(self) -> ContainerPool:
+        """
+        Pool of ready containers of the same OS, release and image
+        as requested container.
+
+        Returns:
+            ContainerPool: Pool of containers.
+        """
+
+        if self.image_fingerprint is None:
+            self.resolve_image_fingerprint()
+
+        return ContainerPool(
+            self._client, self.image_os, self.image_version,
+            self.image_fingerprint, self.network_wait
+        )
+
+    def checkout_container(self) -> bool:
+        """
+        Take ready container from pool instead of creating and starting
+        new one. Container is renamed to requested name.
+
+        Returns:
+            bool: True if container was taken.
+                  False if pool is empty or container couldn't be taken.
+        """
+
+        try:
+            with span('pool.checkout', container=self.container_name):
+                container = self.container_pool().checkout(self.container_name)
+        except (TimeoutError, pylxd.exceptions.LXDAPIException) as e:
+            self._log.warning(f"Unable to take container from pool: {e}")
+            return False
+
+        if container is None:
+            self._log.debug("Pool of containers is empty.")
+            return False
+
+        self.__container = container
+        self.container_is_running = True
+        self.container_ip = get_network_address(container)
+        self._log.debug(
+            f"Container {self.container_name} "
+            f"has IP address {self.container_ip}"
+        )
+        return True
+
     def start_container(self):
         """
         Start LXD container.
@@ -110,7 +349,7 @@ class LXDClient():
 
         try:
             self._log.debug(f"Starting container {self.container_name}")
-            run(self.__container)
+            run(self.__container, **self.network_wait)
             self.container_is_running = True
 
         except TimeoutError as e:
@@ -124,7 +363,7 @@ class LXDClient():
                     self._log.debug(
                         f"Restarting container. Occurred exception {e}."
                     )
-                    restart(self.__container)
+                    restart(self.__container, **self.network_wait)
             except pylxd.exceptions.LXDAPIException as e:
                 self._log.error(str(e))
                 self.__delete_container()
@@ -143,29 +382,10 @@ class LXDClient():
         Running install command inside container.
         """
 
-        if self.image_os == 'ubuntu':
-            install_command = 'apt-get -y install openssh-server'
-        elif self.image_os == 'centos':
-            install_command = 'yum -y install openssh-server'
-
-        try:
-            out, err = run_command(self.__container, install_command)
-            if self.image_os == 'centos':
-                install_command += '; service sshd start'
-                out, err = run_command(
-                    self.__container, 'service sshd start'
-                )
-        except (RuntimeError, ValueError) as e:
-            self._log.error(
-                "Occurred error while installing openssh "
-                "server into container. "
-                f"Got exit code {e} while performing "
-                f"'{install_command}' inside container."
-            )
-            raise SystemExit(1)
-        else:
-            if err != '':
-                self._log.debug(f"Got error message: {err.strip()}")
+        self.__provision(
+            Provisioning(self._openssh_steps()),
+            "installing openssh server into container"
+        )
 
     def add_ssh_key(self, key: BinaryIO):
         """
@@ -177,39 +397,272 @@ class LXDClient():
             key (BinaryIO): Public part of SSH key.
         """
 
+        self.__provision(
+            Provisioning(self._ssh_key_steps(key)),
+            "write SSH public key to Authorized keys"
+        )
+
+    def setup_ssh(self, key: BinaryIO):
+        """
+        Installing OpenSSH server and copy public SSH key to container.
+        The same as install_openssh and add_ssh_key,
+        but all jobs are performed by one exec inside container.
+
+        Args:
+            key (BinaryIO): Public part of SSH key.
+        """
+
+        self.__provision(
+            self.ssh_provisioning(key),
+            "setting up SSH access into container"
+        )
+
+    def ssh_provisioning(self, key: BinaryIO) -> Provisioning:
+        """
+        Steps of installing OpenSSH server and copying public SSH key.
+
+        Args:
+            key (BinaryIO): Public part of SSH key.
+
+        Returns:
+            Provisioning: Steps of setting up SSH access.
+        """
+
+        return Provisioning(self._openssh_steps() + self._ssh_key_steps(key))
+
+    async def launch_async(
+        self,
+        client: AsyncLXDClient,
+        provisioning: Callable[..., Provisioning] = None
+    ) -> None:
+        """
+        Create, start and provision container thru asyncio client.
+        The same as create_container, start_container and provisioning
+        together, but every request is awaited, so many containers
+        are launched concurrently in one thread.
+        Container is deleted if something went wrong.
+        OS and release of cloned container are taken from the copy,
+        so provisioning steps are built only after container is created.
+
+        Args:
+            client (AsyncLXDClient): Asyncio LXD client.
+            provisioning (callable): Function which takes LXDClient
+                                     and returns Provisioning steps
+                                     performed after start.
+
+        Raises:
+            RuntimeError: If container wasn't launched.
+        """
+
+        name = self.container_name
+        # coroutines share the thread, so spans get parent explicitly
+        parent = trace.current()
         try:
-            run_command(self.__container, 'test -d /root/.ssh')
-        except RuntimeError:
-            try:
-                command = 'mkdir /root/.ssh; chmod 700 /root/.ssh'
-                out, err = run_command(self.__container, 'mkdir /root/.ssh')
-                out, err = run_command(
-                    self.__container, 'chmod 700 /root/.ssh'
+            if self.source_container is not None:
+                self._log.debug(
+                    f"Cloning container {name} from {self.source_container}"
                 )
-            except (RuntimeError, ValueError) as e:
-                self._log.error(
-                    "Occurred error while preparing directories for SSH. "
-                    f"Got exit code {e} while performing "
-                    f"'{command}' inside container."
+                source = await client.get_container(
+                    self.source_container.split('/')[0]
                 )
-                raise SystemExit(1)
+                source_config = source.get('config') or {}
+                config = copy_config(self, source_config)
+                self.image_os = source_config.get(
+                    'image.os', self.image_os
+                ).lower()
+                self.image_version = source_config.get(
+                    'image.release', self.image_version
+                ).lower()
             else:
-                if err != '':
-                    self._log.debug(f"Got error message: {err.strip()}")
+                self._log.debug(
+                    f"Creating container {name} "
+                    f"from image {self.image_os}:{self.image_version}"
+                )
+                config = image_config(self)
+            with span('container.create', parent, container=name):
+                await client.create_container(config)
+        except AsyncLXDError as e:
+            self._log.error(f"{name}: {e}")
+            raise RuntimeError(str(e))
 
         try:
-            self.__container.files.put('/root/.ssh/authorized_keys', key)
-            command = 'chmod 600 /root/.ssh/authorized_keys'
-            out, err = run_command(self.__container, command)
-        except (RuntimeError, ValueError) as e:
-            self._log.error(
-                "Occurred error while write SSH public key "
-                "to Authorized keys. "
-                f"Got exit code {e} while performing "
-                f"'{command}' inside container."
+            with span('container.start', parent, container=name) as start:
+                await client.set_state(name, 'start')
+                self.container_is_running = True
+                with span('network.wait', start, container=name):
+                    self.container_ip = await wait_network_address_async(
+                        client, name, **self.network_wait
+                    )
+            self._log.debug(f"Container {name} has IP address "
+                            f"{self.container_ip}")
+
+            if provisioning is not None:
+                steps = provisioning(self)
+                with span('container.exec', parent, container=name):
+                    results, out, err = await steps.run_async(
+                        client, name, self._output_handler()
+                    )
+                if not self.__check_provisioning(
+                    results, err, f"provisioning container {name}"
+                ):
+                    raise RuntimeError("Provisioning was failed")
+        except (AsyncLXDError, TimeoutError, RuntimeError) as e:
+            self._log.error(f"{name}: {e}")
+            try:
+                if self.container_is_running:
+                    await client.set_state(name, 'stop', force=True)
+                await client.delete_container(name)
+                self.container_is_running = False
+            except AsyncLXDError as delete_error:
+                self._log.error(
+                    f"Please delete container {name} by yourself: "
+                    f"{delete_error}"
+                )
+            raise RuntimeError(str(e))
+
+        # it's loaded lazily on first use by sync methods
+        self.__container = pylxd.models.Container(self._client, name=name)
+
+    def _openssh_steps(self) -> list:
+        """
+        Steps of installing and starting OpenSSH server.
+        Container from ssh-ready image has OpenSSH server already,
+        but hasn't host keys, so they're generated before starting.
+
+        Returns:
+            list: Pairs of step name and shell command.
+        """
+
+        if self.image_ssh_ready:
+            steps = [('generate-host-keys', 'ssh-keygen -A')]
+            if self.image_os == 'ubuntu':
+                return steps + [('start-sshd', 'service ssh start')]
+            elif self.image_os == 'centos':
+                return steps + [('start-sshd', 'service sshd start')]
+            return steps
+
+        if self.image_os == 'ubuntu':
+            return [('install-openssh', 'apt-get -y install openssh-server')]
+        elif self.image_os == 'centos':
+            return [
+                ('install-openssh', 'yum -y install openssh-server'),
+                ('start-sshd', 'service sshd start')
+            ]
+        return []
+
+    def _ssh_key_steps(self, key: BinaryIO) -> list:
+        """
+        Steps of preparing ~/.ssh directory and writing
+        public SSH key to Authorized keys.
+        Key is passed into container inside the script itself,
+        so there is no separate request for file uploading.
+
+        Args:
+            key (BinaryIO): Public part of SSH key.
+
+        Returns:
+            list: Pairs of step name and shell command.
+        """
+
+        if isinstance(key, bytes):
+            key = key.decode()
+
+        return self._ssh_dir_steps() + [
+            (
+                'write-authorized-keys',
+                "cat > /root/.ssh/authorized_keys <<'LAZY_LXD_KEY'\n"
+                f"{key.strip()}\n"
+                "LAZY_LXD_KEY\n"
+                "chmod 600 /root/.ssh/authorized_keys"
+            )
+        ]
+
+    def _ssh_dir_steps(self) -> list:
+        """
+        Steps of preparing ~/.ssh directory.
+
+        Returns:
+            list: Pairs of step name and shell command.
+        """
+
+        if self.image_ssh_ready:
+            return []
+        return [
+            ('prepare-ssh-dir', 'mkdir -p /root/.ssh; chmod 700 /root/.ssh')
+        ]
+
+    def _output_handler(self) -> Callable:
+        """
+        Handler of output of commands performed inside container.
+        Output is logged line by line while command is running,
+        only in verbose mode.
+
+        Returns:
+            callable: Output handler. None if not verbose.
+        """
+
+        if not self._log.isEnabledFor(logging.DEBUG):
+            return None
+
+        name = self.container_name
+        return lambda stream, line: self._log.debug(f"{name} {stream}: {line}")
+
+    def __provision(self, provisioning: Provisioning, action: str):
+        """
+        Perform provisioning steps inside container.
+        Exit from script if some step was failed.
+
+        Args:
+            provisioning (Provisioning): Steps which need to perform.
+            action (str): Human readable description of steps
+                          for error message.
+        """
+
+        try:
+            results, out, err = provisioning.run(
+                self.__container, self._output_handler()
             )
+        except (RuntimeError, ValueError) as e:
+            self._log.error(f"Occurred error while {action}: {e}")
+            raise SystemExit(1)
+
+        if not self.__check_provisioning(results, err, action):
             raise SystemExit(1)
 
+    def __check_provisioning(
+        self, results: list, err: str, action: str
+    ) -> bool:
+        """
+        Check results of provisioning steps and log failed step.
+
+        Args:
+            results (list): StepResult list.
+            err (str): Error output of steps.
+            action (str): Human readable description of steps
+                          for error message.
+
+        Returns:
+            bool: True if all steps were succeeded.
+        """
+
+        for result in results:
+            self._log.debug(
+                f"Step {result.name} finished with code {result.code}"
+            )
+            if result.code is not None and result.code != 0:
+                self._log.error(
+                    f"Occurred error while {action}. "
+                    f"Got exit code {result.code} while performing "
+                    f"'{result.command}' inside container."
+                )
+                if err.strip() != '':
+                    self._log.error(err.strip())
+                return False
+
+        if err.strip() != '':
+            self._log.debug(f"Got error message: {err.strip()}")
+        return True
+
     def __delete_container(self):
         """
         Delete empty LXD container.
@@ -245,14 +698,6 @@ class LXDClient():
             tuple: OS version
         """
 
-        versions = {
-            "14.04": "trusty",
-            "16.04": "xenial",
-            "18.04": "bionic",
-            "19.10": "eoan",
-            "20.04": "focal"
-        }
-
         if self.image_os != 'ubuntu' and version != 'bionic':
             return version
         elif self.image_os != 'ubuntu':
@@ -264,9 +709,4 @@ class LXDClient():
                 )
                 raise SystemExit
 
-        version_num = None
-        for key, value in versions.items():
-            if key == version or value == version:
-                version_num = value
-                break
-        return version_num if version_num is not None else version
+        return ubuntu_codename(version)
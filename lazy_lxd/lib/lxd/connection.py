@@ -0,0 +1,35 @@
+import os
+import threading
+
+import pylxd
+
+
+_clients = dict()
+_lock = threading.Lock()
+
+
+def shared_client() -> object:
+    """
+    Get pylxd client shared by all LXD clients of the process.
+    Socket discovery and /1.0 handshake are done only once.
+    Connections to unix socket are kept alive in connection pool
+    of requests session inside pylxd client, which is safe
+    to use from several threads.
+
+    Client is created per LXD_DIR, so changed environment
+    leads to new client.
+
+    Returns:
+        object: pylxd client object.
+    """
+
+    key = os.environ.get('LXD_DIR')
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        # other thread could create it while waiting for lock
+        if key not in _clients:
+            _clients[key] = pylxd.Client()
+        return _clients[key]
@@ -1,8 +1,10 @@
 from coolname import generate_slug
 from colorama import Style
-from halo import Halo
+from lib.logger import spinner, span
 from lib import inquirer
 
+from .readiness import wait_network_address, network_address
+
 
 def set_name(self, name: str) -> str:
     """
@@ -31,6 +33,7 @@ def set_name(self, name: str) -> str:
             "Please prompt new container name.\n"
             "If you leave blank input form, will be generate random name."
         )
+        # random name is generated in unattended mode
         new_name = inquirer.input_text("New container name:")
 
         return set_name(self, new_name)
@@ -44,49 +47,105 @@ def create(self) -> object:
         object: pylxd container object
     """
 
-    config = {
+    config = image_config(self)
+    try:
+        with span('container.create', container=self.container_name), \
+                spinner("Create container..."):
+            container = self._client.containers.create(config, wait=True)
+    except Exception as e:
+        raise e
+
+    return container
+
+
+def clone(self) -> object:
+    """
+    Create container as copy of existing container or its snapshot.
+    On copy-on-write storage pools, such as btrfs and zfs,
+    it's much cheaper than unpacking image.
+    Snapshots of source container aren't copied.
+
+    Returns:
+        object: pylxd container object
+    """
+
+    source = self._client.containers.get(self.source_container.split('/')[0])
+    config = copy_config(self, source.config)
+    with span('container.clone', container=self.container_name,
+              source=self.source_container), \
+            spinner("Clone container..."):
+        container = self._client.containers.create(config, wait=True)
+
+    return container
+
+
+def image_config(self) -> dict:
+    """
+    Build config for creating container from image.
+
+    Returns:
+        dict: Container config for LXD API.
+    """
+
+    return {
         'name': self.container_name,
         'source': {
             'type': 'image',
             'fingerprint': self.image_fingerprint
         },
+        'config': self.container_config,
     }
-    try:
-        with Halo(text="Create container...", spinner="dots12", color="blue"):
-            container = self._client.containers.create(config, wait=True)
-    except Exception as e:
-        raise e
 
-    return container
 
+def copy_config(self, source_config: dict) -> dict:
+    """
+    Build config for creating container as copy of source container.
+    Config of source is kept, as LXD does for copy without config.
+
+    Args:
+        source_config (dict): Config of source container.
+
+    Returns:
+        dict: Container config for LXD API.
+    """
+
+    container_config = {
+        key: value for key, value in source_config.items()
+        if not key.startswith('volatile.')
+    }
+    container_config.update(self.container_config)
+
+    return {
+        'name': self.container_name,
+        'source': {
+            'type': 'copy',
+            'source': self.source_container,
+            'container_only': True
+        },
+        'config': container_config,
+    }
 
-def run(container: object) -> bool:
+
+def run(container: object, **network_wait) -> bool:
     """
     Start LXD container. Wait until network becomes available.
 
     Args:
         container (object): pylxd container object
+        network_wait: Policy of waiting for network.
+                      Arguments of readiness.wait_network_address:
+                      timeout, interval and max_interval.
 
     Returns:
         bool: Return True if container started. False if something went wrong
     """
 
-    import time
-
-    # 30 seconds timeout
-    timeout = time.time() + 30
     try:
-        with Halo(text="Start container...", spinner="dots12", color="blue"):
+        with span('container.start', container=container.name), \
+                spinner("Start container..."):
             container.start(wait=True)
-            while True:
-                address = get_network_address(container)
-                if address is not None:
-                    break
-                if time.time() > timeout:
-                    raise TimeoutError(
-                        "The container doesn't receive network too long"
-                    )
-                time.sleep(1)
+            with span('network.wait', container=container.name):
+                wait_network_address(container, **network_wait)
             return True
     except Exception as e:
         raise e
@@ -105,7 +164,7 @@ def stop(container: object) -> bool:
     """
 
     try:
-        with Halo(text="Stop container...", spinner="dots12", color="blue"):
+        with spinner("Stop container..."):
             container.stop(wait=True)
             return True
     except Exception as e:
@@ -113,13 +172,14 @@ def stop(container: object) -> bool:
         return False
 
 
-def restart(container: object) -> bool:
+def restart(container: object, **network_wait) -> bool:
     """
     Restart LXD container.
     Do it with stop and start function to guarantee full start with network.
 
     Args:
         container (object): pylxd container object.
+        network_wait: Policy of waiting for network. See run function.
 
     Returns:
         bool: Return True if container restarted.
@@ -128,7 +188,7 @@ def restart(container: object) -> bool:
 
     try:
         stop(container)
-        run(container)
+        run(container, **network_wait)
         return True
     except Exception as e:
         raise e
@@ -148,7 +208,7 @@ def delete(container: object) -> bool:
 
     try:
         stop(container)
-        with Halo(text="Delete container...", spinner="dots12", color="blue"):
+        with spinner("Delete container..."):
             container.delete(wait=True)
             return True
     except Exception as e:
@@ -167,14 +227,9 @@ def get_network_address(container: object) -> str:
         str: Container network address
     """
 
-    try:
+    state = container.state()
+    if state.status == 'Stopped':
+        run(container)
         state = container.state()
-        for network, interface in state.network.items():
-            if network == 'eth0':
-                for ipv in interface['addresses']:
-                    if ipv['family'] == 'inet':
-                        return ipv['address']
-    except AttributeError:
-        if state.status == 'Stopped':
-            run(container)
-            get_network_address(container)
+
+    return network_address(state)
@@ -1,4 +1,102 @@
-from halo import Halo
+import codecs
+from collections import deque
+from typing import Callable
+
+from lib.logger import spinner, span
+
+
+# Names of output streams which are passed to output handlers
+STDOUT = 'stdout'
+STDERR = 'stderr'
+# Lines of each stream which are kept for error reporting
+TAIL_LINES = 100
+# Longer line is passed to handler by parts, so memory stays bounded
+LINE_LIMIT = 64 * 1024
+
+
+class LineSplitter(object):
+    """
+    Split output stream received by chunks into lines.
+    Chunks could break lines and multibyte characters anywhere,
+    only incomplete line is kept between chunks.
+
+    Args:
+        stream (str): Name of stream, STDOUT or STDERR.
+        handler (callable): Called with stream name and line
+                            without line break for each line.
+    """
+
+    def __init__(self, stream: str, handler: Callable):
+        self.stream = stream
+        self.handler = handler
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._pending = ''
+
+    def feed(self, data: bytes) -> None:
+        """
+        Process next chunk of stream.
+
+        Args:
+            data (bytes): Chunk of stream.
+        """
+
+        text = self._pending + self._decoder.decode(data)
+        lines = text.split('\n')
+        self._pending = lines.pop()
+        for line in lines:
+            self.handler(self.stream, line.rstrip('\r'))
+        while len(self._pending) >= LINE_LIMIT:
+            self.handler(self.stream, self._pending[:LINE_LIMIT])
+            self._pending = self._pending[LINE_LIMIT:]
+
+    def close(self) -> None:
+        """
+        Pass the last line, which isn't ended by line break.
+        """
+
+        self._pending += self._decoder.decode(b'', final=True)
+        if self._pending:
+            self.handler(self.stream, self._pending.rstrip('\r'))
+            self._pending = ''
+
+
+class OutputTail(object):
+    """
+    Ring buffer of the last lines of output stream.
+    Older lines are dropped, only their number is kept.
+
+    Args:
+        size (int): How many lines are kept.
+    """
+
+    def __init__(self, size: int = TAIL_LINES):
+        self.lines = deque(maxlen=size)
+        self.skipped = 0
+
+    def append(self, line: str) -> None:
+        """
+        Keep line, the oldest one is dropped if buffer is full.
+
+        Args:
+            line (str): Line of output.
+        """
+
+        if len(self.lines) == self.lines.maxlen:
+            self.skipped += 1
+        self.lines.append(line)
+
+    def text(self) -> str:
+        """
+        Kept lines as text.
+
+        Returns:
+            str: Kept lines, with note about dropped ones if any.
+        """
+
+        lines = list(self.lines)
+        if self.skipped:
+            lines.insert(0, f"[{self.skipped} earlier lines skipped]")
+        return '\n'.join(lines)
 
 
 def run_command(container: object, cmd: str) -> tuple:
@@ -13,11 +111,43 @@ def run_command(container: object, cmd: str) -> tuple:
         tuple: Standart and error command output.
     """
 
-    with Halo(
-        text="Executing a job inside container...",
-        spinner="dots12", color="blue"
-    ):
+    with span('container.exec', container=container.name, command=cmd), \
+            spinner("Executing a job inside container..."):
         code, out, err = container.execute(cmd.split(' '))
         if code != 0:
             raise RuntimeError(code)
         return (out, err)
+
+
+def stream_command(
+    container: object, command: list, handler: Callable
+) -> int:
+    """
+    Run command inside in container and pass its output to handler
+    line by line while command is running. Output isn't accumulated,
+    so long commands, such as package installation, use constant memory.
+    Handler is called from websocket thread of pylxd.
+
+    Args:
+        container (object): pylxd container object
+        command (list): Command with arguments.
+        handler (callable): Called with stream name, STDOUT or STDERR,
+                            and line of output.
+
+    Returns:
+        int: Exit code of command.
+    """
+
+    out = LineSplitter(STDOUT, handler)
+    err = LineSplitter(STDERR, handler)
+    with span('container.exec', container=container.name) as timed, \
+            spinner("Executing a job inside container..."):
+        code, _, _ = container.execute(
+            command, decode=False,
+            stdout_handler=out.feed, stderr_handler=err.feed
+        )
+        out.close()
+        err.close()
+        if timed is not None:
+            timed.set(exit_code=code)
+        return code
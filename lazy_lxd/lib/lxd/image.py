@@ -1,4 +1,31 @@
+import logging
+
 from lib import inquirer
+from .streams import SimpleStreams, host_architecture
+
+
+# Ubuntu releases could be requested by version or by codename
+UBUNTU_RELEASES = {
+    "14.04": "trusty",
+    "16.04": "xenial",
+    "18.04": "bionic",
+    "19.10": "eoan",
+    "20.04": "focal"
+}
+
+
+def ubuntu_codename(version: str) -> str:
+    """
+    Get codename of Ubuntu release, images are published by it.
+
+    Args:
+        version (str): Ubuntu version or codename.
+
+    Returns:
+        str: Codename. Version as is if it's unknown.
+    """
+
+    return UBUNTU_RELEASES.get(version, version)
 
 
 def exists(self) -> bool:
@@ -9,11 +36,7 @@ def exists(self) -> bool:
         bool: True image exists. False if not.
     """
 
-    all_images = self._client.images.all()
-    for image in all_images:
-        if _search_image(self.image_os, self.image_version, image) is not None:
-            return True
-    return False
+    return len(self._image_index.find(self.image_os, self.image_version)) > 0
 
 
 def get_fingerprint(self) -> list:
@@ -25,18 +48,9 @@ def get_fingerprint(self) -> list:
               uploaded datetime and fingerprint.
     """
 
-    images = self._client.images.all()
-    images_properties = list()
-
-    for image in images:
-        if _search_image(self.image_os, self.image_version, image) is not None:
-            pass
-            properties = image.properties
-            properties.update({
-                'uploaded_at': image.uploaded_at,
-                'fingerprint': image.fingerprint
-            })
-            images_properties.append(properties)
+    images_properties = self._image_index.find(
+        self.image_os, self.image_version
+    )
 
     if len(images_properties) > 1:
         self._log.warning("Found more than one requested image.")
@@ -45,28 +59,11 @@ def get_fingerprint(self) -> list:
         return images_properties[0]['fingerprint']
 
 
-def _search_image(os: str, codename: str, image: object) -> object:
-    """
-    Internal function for compare image properties such as os and codename
-    with search criteria.
-
-    Args:
-        os (str): Operating system name
-        codename (str): OS codename, like xenial for Ubuntu 16.04 Xenial Xerus
-        image (object): image object from lxd api
-    Returns:
-        object: lxd image object, which fits the search criteria
-    """
-
-    props = image.properties
-    if props['os'].lower() == os and props['release'].lower() == codename:
-        return image
-
-
 def _choose_image(images: list) -> str:
     """
     Ask user what image he want use from many found images.
     Build human readable string with information about each image.
+    The newest image is chosen in unattended mode.
 
     Args:
         images (list): LXC images list.
@@ -80,9 +77,12 @@ def _choose_image(images: list) -> str:
     import humanize
 
     images_list = list()
-    for image in images:
+    newest_index, newest_time = 0, None
+    for index, image in enumerate(images):
         # convert uploaded_at to relative days
         uploaded_time = dateutil.parser.isoparse(image['uploaded_at'])
+        if newest_time is None or uploaded_time > newest_time:
+            newest_index, newest_time = index, uploaded_time
         time_diff = datetime.now() - uploaded_time.replace(tzinfo=None)
         uploaded_diff = humanize.naturaldelta(time_diff)
 
@@ -94,24 +94,99 @@ def _choose_image(images: list) -> str:
         )
         images_list.append(image_representation)
 
-    chosed_image_index = inquirer.choose(images_list)
+    chosed_image_index = inquirer.choose(images_list, default=newest_index)
 
     return images[chosed_image_index]['fingerprint']
 
 
 def download(self) -> None:
     """
-    Downloading LXD image from linuxcontainers.org to local storage.
+    Downloading LXD image from simplestreams server,
+    linuxcontainers.org by default, or from local mirror to local storage.
     """
 
-    from halo import Halo
+    from lib.logger import spinner, span
 
     try:
-        with Halo(text="Loading image...", spinner="dots12", color="blue"):
-            self._client.images.create_from_simplestreams(
-                'https://images.linuxcontainers.org',
-                f'{self.image_os}/{self.image_version}',
-                auto_update=True
-            )
+        with span('image.download', os=self.image_os,
+                  release=self.image_version), \
+                spinner("Loading image..."):
+            pull(self._client, self._streams,
+                 self.image_os, self.image_version)
     except Exception as e:
         raise e
+    finally:
+        self._image_index.invalidate()
+
+
+def pull(
+    client: object, streams: SimpleStreams,
+    os_name: str, release: str, architecture: str = None
+) -> object:
+    """
+    Download image to local LXD storage.
+    Alias is resolved by index of server, so present image
+    isn't pulled again. LXD pulls image by alias anyway,
+    otherwise it wouldn't update image automatically.
+    Images of local mirror are uploaded to LXD.
+
+    Args:
+        client (object): pylxd client object.
+        streams (SimpleStreams): Index of simplestreams server.
+        os_name (str): Operating system name.
+        release (str): Codename or version of release.
+        architecture (str): Image architecture.
+                            Architecture of host is used if not set.
+
+    Returns:
+        object: pylxd image object.
+
+    Raises:
+        RuntimeError: If server hasn't requested image.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    architecture = architecture or host_architecture()
+    alias = f"{os_name}/{release}"
+    try:
+        image = streams.find(os_name, release, architecture)
+    except RuntimeError as e:
+        if streams.is_mirror:
+            raise
+        log.debug(e)
+        return client.images.create_from_simplestreams(
+            streams.server, f"{alias}/{architecture}", auto_update=True
+        )
+
+    if image is None:
+        raise RuntimeError(
+            f"Image {alias}/{architecture} isn't found on {streams.server}"
+        )
+    if client.images.exists(image.fingerprint):
+        log.debug(f"Image {image.fingerprint} is present already.")
+        return client.images.get(image.fingerprint)
+
+    if not streams.is_mirror:
+        # LXD updates only images which were pulled by alias
+        return client.images.create_from_simplestreams(
+            streams.server, f"{alias}/{architecture}", auto_update=True
+        )
+
+    log.debug(f"Uploading image {alias}/{architecture} from mirror.")
+    with streams.open(image.metadata) as metadata:
+        if image.rootfs is None:
+            uploaded = client.images.create(metadata)
+        else:
+            with streams.open(image.rootfs) as rootfs:
+                uploaded = client.images.create(rootfs, metadata=metadata)
+    # properties are set as LXD sets them for pulled images,
+    # so uploaded image is found by OS and release
+    uploaded.properties.update({
+        'os': image.os,
+        'release': image.release,
+        'architecture': image.architecture,
+        'description': f"{image.os} {image.release} {image.architecture}"
+    })
+    uploaded.save()
+    return uploaded
@@ -0,0 +1,205 @@
+import json
+import logging
+import threading
+
+from lib.config import write_atomic
+from lib.logger import span
+
+
+# Images derived by lazy-lxd have fingerprint of base image in property
+DERIVED_PROPERTY = 'lazy_lxd.base'
+
+_indexes = dict()
+_lock = threading.Lock()
+
+
+def shared_index(client: object, cache_path: str = None) -> 'ImageIndex':
+    """
+    Get index of images shared by all LXD clients
+    which use the same pylxd client and cache.
+    Images are listed once per process instead of once per container.
+
+    Args:
+        client (object): pylxd client object.
+        cache_path (str): Path to file of on-disk cache.
+                          Cache is disabled if not set.
+
+    Returns:
+        ImageIndex: Index of images from local LXD storage.
+    """
+
+    key = (client, cache_path)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+
+    with _lock:
+        # other thread could create it while waiting for lock
+        if key not in _indexes:
+            _indexes[key] = ImageIndex(client, cache_path)
+        return _indexes[key]
+
+
+class ImageIndex(object):
+    """
+    Index of images from local LXD storage.
+    Images are keyed by OS, release and architecture,
+    so lookup doesn't scan the whole storage.
+    Index is built from a single listing of images.
+
+    Optionally the listing is kept in on-disk cache.
+    Cache is valid while the set of images fingerprints in LXD storage
+    is the same, so repeat runs fetch only the list of fingerprints.
+
+    Args:
+        client (object): pylxd client object.
+        cache_path (str): Path to file of on-disk cache.
+                          Cache is disabled if not set.
+    """
+
+    def __init__(self, client: object, cache_path: str = None):
+        self._client = client
+        self._cache_path = cache_path
+        self._log = logging.getLogger('lazy_lxd')
+
+        self._index = None
+
+    def find(
+        self, os: str, release: str, architecture: str = None
+    ) -> list:
+        """
+        Find images by OS, release and optionally architecture.
+
+        Args:
+            os (str): Operating system name.
+            release (str): OS codename or version.
+            architecture (str): Image architecture.
+                                Images of any architecture fit if not set.
+
+        Returns:
+            list: Dicts with image properties, uploaded datetime
+                  and fingerprint.
+        """
+
+        if self._index is None:
+            with span('image.lookup'):
+                self._index = self.__build(self.__load())
+
+        if architecture is not None:
+            return list(self._index.get((os, release, architecture), []))
+
+        found = list()
+        for key, images in self._index.items():
+            if key[:2] == (os, release):
+                found.extend(images)
+        return found
+
+    def invalidate(self) -> None:
+        """
+        Forget indexed images.
+        Used after changing of LXD images storage,
+        the next lookup builds index again.
+        """
+
+        self._index = None
+
+    def __load(self) -> list:
+        """
+        Get properties of all images from LXD storage.
+        Take them from on-disk cache if it's up to date.
+
+        Returns:
+            list: Dicts with image properties, uploaded datetime
+                  and fingerprint.
+        """
+
+        if self._cache_path is None:
+            return self.__fetch()
+
+        # only fingerprints, without fetching each image
+        response = self._client.api.images.get()
+        fingerprints = sorted(
+            url.split('/')[-1] for url in response.json()['metadata']
+        )
+
+        cache = self.__read_cache()
+        if cache is not None and cache['fingerprints'] == fingerprints:
+            self._log.debug(f"Using images from cache {self._cache_path}")
+            return cache['images']
+
+        images = self.__fetch()
+        try:
+            write_atomic(self._cache_path, json.dumps({
+                'fingerprints': sorted(i['fingerprint'] for i in images),
+                'images': images
+            }))
+        except OSError as e:
+            self._log.debug(f"Unable to save images cache: {e}")
+
+        return images
+
+    def __fetch(self) -> list:
+        """
+        Get properties of all images by one request to LXD API.
+
+        Returns:
+            list: Dicts with image properties, uploaded datetime
+                  and fingerprint.
+        """
+
+        response = self._client.api.images.get(params={'recursion': 1})
+
+        images = list()
+        for image in response.json()['metadata']:
+            properties = dict(image.get('properties') or {})
+            properties.setdefault('architecture', image.get('architecture'))
+            properties.update({
+                'uploaded_at': image['uploaded_at'],
+                'fingerprint': image['fingerprint']
+            })
+            images.append(properties)
+
+        return images
+
+    def __read_cache(self) -> dict:
+        """
+        Read on-disk cache.
+
+        Returns:
+            dict: Cached fingerprints and images.
+                  None if cache is absent or broken.
+        """
+
+        try:
+            with open(self._cache_path) as fl:
+                cache = json.load(fl)
+            if 'fingerprints' in cache and 'images' in cache:
+                return cache
+        except (OSError, ValueError, TypeError) as e:
+            self._log.debug(f"Unable to read images cache: {e}")
+        return None
+
+    @staticmethod
+    def __build(images: list) -> dict:
+        """
+        Group images by OS, release and architecture.
+        Images without OS or release properties can't be requested,
+        so they aren't indexed. Images derived by lazy-lxd itself,
+        such as ssh-ready ones, aren't indexed too.
+
+        Args:
+            images (list): Dicts with image properties.
+
+        Returns:
+            dict: Lists of images keyed by (os, release, architecture).
+        """
+
+        index = dict()
+        for image in images:
+            os = image.get('os')
+            release = image.get('release')
+            if not os or not release or image.get(DERIVED_PROPERTY):
+                continue
+            key = (os.lower(), release.lower(), image.get('architecture'))
+            index.setdefault(key, []).append(image)
+        return index
@@ -0,0 +1,211 @@
+import fcntl
+import logging
+
+import pylxd
+from coolname import generate_slug
+
+from lib.logger import spinner
+from .container import run, delete
+
+
+# Pool containers are marked by config keys, so pool lives in LXD itself
+POOL_PROPERTY = 'user.lazy_lxd.pool'
+POOL_IMAGE_PROPERTY = 'user.lazy_lxd.pool.image'
+POOL_READY_PROPERTY = 'user.lazy_lxd.pool.ready'
+# Names of pool containers look like <prefix>-<random slug>
+POOL_PREFIX = 'lazy-lxd-pool'
+
+
+class ContainerPool(object):
+    """
+    Pool of containers which are created, started and ready for SSH
+    in advance. Container is taken from pool instead of creating new one,
+    so user gets it in a few seconds.
+
+    Pool is kept for each OS and release. Members of pool are containers
+    marked by config keys, with image fingerprint they were created from.
+    Member becomes ready only after it's provisioned,
+    so half-created containers are never taken.
+
+    Args:
+        client (object): pylxd client object.
+        os (str): Operating system name.
+        release (str): OS codename or version.
+        image_fingerprint (str): Fingerprint of image for pool containers.
+        network_wait (dict): Policy of waiting for network.
+                             Arguments of readiness.wait_network_address.
+    """
+
+    def __init__(
+        self,
+        client: object,
+        os: str, release: str,
+        image_fingerprint: str,
+        network_wait: dict = None
+    ):
+        self._client = client
+        self._log = logging.getLogger('lazy_lxd')
+        self._lock = None
+
+        self.name = f"{os}:{release}"
+        self.image_fingerprint = image_fingerprint
+        self.network_wait = network_wait or dict()
+
+    def members(self) -> list:
+        """
+        Get containers of pool by one request to LXD API.
+
+        Returns:
+            list: Dicts with name, status, image fingerprint
+                  and readiness of each container.
+        """
+
+        response = self._client.api.containers.get(params={'recursion': 1})
+
+        members = list()
+        for container in response.json()['metadata']:
+            config = container.get('config') or {}
+            if config.get(POOL_PROPERTY) != self.name:
+                continue
+            members.append({
+                'name': container['name'],
+                'status': container.get('status'),
+                'image': config.get(POOL_IMAGE_PROPERTY),
+                'ready': config.get(POOL_READY_PROPERTY) == 'true'
+            })
+        return members
+
+    def checkout(self, name: str) -> object:
+        """
+        Take ready container from pool and rename it.
+        LXD renames only stopped containers, so container is stopped,
+        renamed and started again. It's already booted and provisioned once,
+        thus it starts much faster than a new one.
+        Container which is taken by another run at the same time is skipped.
+
+        Args:
+            name (str): New name of container.
+
+        Returns:
+            object: pylxd container object. None if pool is empty.
+        """
+
+        container = None
+        for member in self.members():
+            if not member['ready'] or member['status'] != 'Running' or \
+                    member['image'] != self.image_fingerprint:
+                continue
+            try:
+                with spinner("Take container from pool..."):
+                    container = self._client.containers.get(member['name'])
+                    container.stop(force=True, wait=True)
+                    container.rename(name, wait=True)
+                break
+            except pylxd.exceptions.LXDAPIException as e:
+                self._log.debug(
+                    f"Container {member['name']} isn't taken from pool: {e}"
+                )
+                container = None
+
+        if container is None:
+            return None
+
+        self._log.debug(f"Took container {member['name']} from pool")
+        for key in (POOL_PROPERTY, POOL_IMAGE_PROPERTY, POOL_READY_PROPERTY):
+            container.config.pop(key, None)
+        try:
+            container.save(wait=True)
+            run(container, **self.network_wait)
+        except Exception:
+            # it has requested name already, so it isn't left behind
+            delete(container)
+            raise
+
+        return container
+
+    def acquire(self, lock_path: str) -> bool:
+        """
+        Lock pool for refilling, so only one run refills it at the same time.
+        Lock is held until the process exits.
+
+        Args:
+            lock_path (str): Path to lock file.
+
+        Returns:
+            bool: True if pool is locked. False if it's refilling by other run.
+        """
+
+        lock = open(lock_path, 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+
+        self._lock = lock
+        return True
+
+    def prune(self) -> None:
+        """
+        Delete containers from pool which shouldn't be taken anymore.
+        Those are containers from outdated image and containers
+        which weren't provisioned, e.g. leftovers of interrupted refilling.
+        Should be called only by holder of lock.
+        """
+
+        for member in self.members():
+            if member['ready'] and member['image'] == self.image_fingerprint:
+                continue
+            self._log.debug(f"Deleting stale pool container {member['name']}")
+            try:
+                delete(self._client.containers.get(member['name']))
+            except pylxd.exceptions.LXDAPIException as e:
+                self._log.warning(
+                    f"Unable to delete pool container {member['name']}: {e}"
+                )
+
+    def missing(self, size: int) -> int:
+        """
+        Count how many containers pool lacks.
+
+        Args:
+            size (int): Desired number of containers in pool.
+
+        Returns:
+            int: Number of containers which need to create.
+        """
+
+        current = [
+            member for member in self.members()
+            if member['image'] == self.image_fingerprint
+        ]
+        return max(0, size - len(current))
+
+    def new_member(self) -> tuple:
+        """
+        Name and config for new container of pool.
+        Container isn't ready until mark_ready is called.
+
+        Returns:
+            tuple: Name of container and its config.
+        """
+
+        return (
+            f"{POOL_PREFIX}-{generate_slug(2)}",
+            {
+                POOL_PROPERTY: self.name,
+                POOL_IMAGE_PROPERTY: self.image_fingerprint
+            }
+        )
+
+    def mark_ready(self, name: str) -> None:
+        """
+        Mark container of pool as ready to be taken.
+
+        Args:
+            name (str): Name of container.
+        """
+
+        container = self._client.containers.get(name)
+        container.config[POOL_READY_PROPERTY] = 'true'
+        container.save(wait=True)
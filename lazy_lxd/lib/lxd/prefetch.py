@@ -0,0 +1,187 @@
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.logger import span, trace
+from .image import pull, ubuntu_codename
+from .index import shared_index
+from .streams import SimpleStreams, host_architecture
+from .connection import shared_client
+
+
+PrefetchResult = namedtuple(
+    'PrefetchResult', ['target', 'fingerprint', 'size', 'elapsed', 'error']
+)
+PrefetchResult.__doc__ = """
+Result of prefetching one image.
+
+Args:
+    target (tuple): OS, release and architecture of image.
+    fingerprint (str): Fingerprint of image. None if downloading failed.
+    size (int): Downloaded bytes. None if image was present already.
+    elapsed (float): Seconds spent on downloading.
+    error (str): Error message. None if image is in local storage.
+"""
+
+
+def parse_target(target: str, architecture: str = None) -> tuple:
+    """
+    Parse image target written as os/release or os/release/architecture.
+    Ubuntu release could be version or codename.
+
+    Args:
+        target (str): Image target.
+        architecture (str): Architecture if target doesn't set it.
+                            Architecture of host is used if not set.
+
+    Returns:
+        tuple: OS, release and architecture.
+
+    Raises:
+        ValueError: If target is malformed.
+    """
+
+    parts = [part.strip().lower() for part in target.split('/')]
+    if len(parts) not in (2, 3) or not all(parts):
+        raise ValueError(
+            f"Image {target} should be written as os/release[/architecture]"
+        )
+    if len(parts) == 2:
+        parts.append(architecture or host_architecture())
+
+    os_name, release, arch = parts
+    if os_name == 'ubuntu':
+        release = ubuntu_codename(release)
+    return (os_name, release, arch)
+
+
+def prefetch(
+    targets: list,
+    concurrency: int = 4,
+    client: object = None,
+    image_cache: str = None,
+    streams: SimpleStreams = None
+) -> list:
+    """
+    Download images to local storage concurrently.
+    Images which are present already are skipped.
+    Failure of one image doesn't interrupt others.
+
+    Args:
+        targets (list): Tuples of OS, release and architecture.
+        concurrency (int): Maximum number of images downloaded at once.
+        client (object): pylxd client object.
+                         Client shared by the process is used if not set.
+        image_cache (str): Path to file of on-disk cache of images list.
+                           Cache is disabled if not set.
+        streams (SimpleStreams): Index of server where images are
+                                 downloaded from. linuxcontainers.org
+                                 without cache is used if not set.
+
+    Returns:
+        list: PrefetchResult for each target, in the same order as targets.
+    """
+
+    log = logging.getLogger('lazy_lxd')
+
+    client = client if client is not None else shared_client()
+    streams = streams if streams is not None else SimpleStreams()
+    index = shared_index(client, image_cache)
+
+    # targets with release named as server names it
+    resolved = dict()
+    results = dict()
+    missing = list()
+    for requested in targets:
+        if requested in resolved:
+            continue
+        target = requested
+        images = index.find(*target)
+        if not images:
+            target = _server_target(streams, target)
+            images = index.find(*target)
+        resolved[requested] = target
+        if images:
+            newest = max(images, key=lambda image: image['uploaded_at'])
+            log.debug(f"Image {'/'.join(target)} is present already.")
+            results[target] = PrefetchResult(
+                target, newest['fingerprint'], None, 0.0, None
+            )
+        elif target not in missing:
+            missing.append(target)
+
+    if missing:
+        log.debug(
+            f"Downloading {len(missing)} images, "
+            f"{concurrency} at the same time."
+        )
+        workers = max(1, concurrency)
+        with span('image.prefetch', images=len(missing)), \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            download = trace.inherit(_download)
+            futures = [
+                executor.submit(download, client, streams, target)
+                for target in missing
+            ]
+            for future in futures:
+                result = future.result()
+                results[result.target] = result
+
+    return [results[resolved[target]] for target in targets]
+
+
+def _server_target(streams: SimpleStreams, target: tuple) -> tuple:
+    """
+    Internal function for naming release of target as server names it.
+
+    Args:
+        streams (SimpleStreams): Index of server.
+        target (tuple): OS, release and architecture of image.
+
+    Returns:
+        tuple: Target with release of server. Target as is
+               if server index is unavailable or hasn't such image.
+    """
+
+    try:
+        image = streams.find(*target)
+    except RuntimeError:
+        return target
+    if image is None:
+        return target
+    return (target[0], image.release, target[2])
+
+
+def _download(
+    client: object, streams: SimpleStreams, target: tuple
+) -> PrefetchResult:
+    """
+    Internal function for downloading single image.
+
+    Args:
+        client (object): pylxd client object.
+        streams (SimpleStreams): Index of server.
+        target (tuple): OS, release and architecture of image.
+
+    Returns:
+        PrefetchResult: Result of downloading.
+    """
+
+    os_name, release, architecture = target
+    started = time.monotonic()
+    try:
+        with span('image.download', os=os_name, release=release,
+                  architecture=architecture) as timed:
+            image = pull(client, streams, *target)
+            if timed is not None:
+                timed.set(size=image.size)
+    except Exception as e:
+        return PrefetchResult(
+            target, None, None, time.monotonic() - started, str(e)
+        )
+
+    return PrefetchResult(
+        target, image.fingerprint, image.size,
+        time.monotonic() - started, None
+    )
@@ -0,0 +1,206 @@
+from collections import namedtuple
+from typing import Callable
+
+from .execute import (
+    STDOUT,
+    STDERR,
+    TAIL_LINES,
+    OutputTail,
+    stream_command
+)
+
+
+# Line which script prints after each step. Followed by step name and code.
+# It's preceded by line break, in case step output doesn't end with it.
+STEP_MARKER = '__lazy_lxd_step__'
+
+StepResult = namedtuple('StepResult', ['name', 'command', 'code'])
+StepResult.__doc__ = """
+Result of one provisioning step.
+
+Args:
+    name (str): Name of step.
+    command (str): Shell command of step.
+    code (int): Exit code of step. None if step wasn't performed.
+"""
+
+
+class Provisioning(object):
+    """
+    Pipeline of shell commands which are performed inside container
+    by a single exec instead of exec per command.
+    Commands are composed into one shell script,
+    which prints exit code of each step to stdout.
+    Script stops on the first failed step.
+
+    Args:
+        steps (list): Pairs of step name and shell command.
+                      Name shouldn't contain spaces.
+    """
+
+    def __init__(self, steps: list = None):
+        self.steps = list(steps or [])
+
+    def script(self) -> str:
+        """
+        Compose steps into shell script.
+        Each step is performed in subshell, so exit inside step
+        doesn't break reporting of its code. Code is printed
+        on its own line, even if output of step has no trailing newline.
+
+        Returns:
+            str: Shell script.
+        """
+
+        lines = list()
+        for name, command in self.steps:
+            lines.extend([
+                '(',
+                command,
+                ')',
+                'rc=$?',
+                f"printf '\\n%s %s %s\\n' {STEP_MARKER} {name} \"$rc\"",
+                '[ $rc -eq 0 ] || exit $rc'
+            ])
+        return '\n'.join(lines) + '\n'
+
+    def run(
+        self, container: object,
+        handler: Callable = None, tail: int = TAIL_LINES
+    ) -> tuple:
+        """
+        Perform all steps inside container by one exec.
+        Output is streamed, only its last lines are kept.
+
+        Args:
+            container (object): pylxd container object.
+            handler (callable): Called with stream name and line
+                                of output while steps are performed.
+                                Step markers aren't passed.
+            tail (int): How many last lines of each stream are kept.
+
+        Returns:
+            tuple: StepResult list in steps order, last lines
+                   of standard and error output without step markers.
+        """
+
+        if len(self.steps) == 0:
+            return ([], '', '')
+
+        output = _StepOutput(handler, tail)
+        code = stream_command(container, ['sh', '-c', self.script()], output)
+        return output.results(self, code)
+
+    async def run_async(
+        self, client: object, name: str,
+        handler: Callable = None, tail: int = TAIL_LINES
+    ) -> tuple:
+        """
+        Perform all steps inside container by one exec
+        thru asyncio client.
+
+        Args:
+            client (object): AsyncLXDClient object.
+            name (str): Name of container.
+            handler (callable): The same as in run.
+            tail (int): The same as in run.
+
+        Returns:
+            tuple: The same as run.
+        """
+
+        if len(self.steps) == 0:
+            return ([], '', '')
+
+        output = _StepOutput(handler, tail)
+        code, _, _ = await client.execute(
+            name, ['sh', '-c', self.script()], handler=output
+        )
+        return output.results(self, code)
+
+    def _results(self, code: int, codes: dict) -> list:
+        """
+        Build results of steps from codes reported by script.
+
+        Args:
+            code (int): Exit code of script.
+            codes (dict): Exit codes keyed by step name.
+
+        Returns:
+            list: StepResult list in steps order.
+        """
+
+        results = [
+            StepResult(name, command, codes.get(name))
+            for name, command in self.steps
+        ]
+
+        # script was broken before step could report its code
+        if code != 0 and not any(result.code for result in results):
+            for index, result in enumerate(results):
+                if result.code is None:
+                    results[index] = result._replace(code=code)
+                    break
+
+        return results
+
+
+class _StepOutput(object):
+    """
+    Output handler of provisioning script.
+    Collects codes of steps and last lines of output,
+    other lines are passed to handler of caller.
+    Empty line before step marker is printed by script itself,
+    so it's held until the next line and dropped before marker.
+
+    Args:
+        handler (callable): Handler of caller. Could be None.
+        tail (int): How many last lines of each stream are kept.
+    """
+
+    def __init__(self, handler: Callable, tail: int):
+        self.handler = handler
+        self.codes = dict()
+        self.tails = {stream: OutputTail(tail) for stream in (STDOUT, STDERR)}
+        self.blank = False
+
+    def __call__(self, stream: str, line: str) -> None:
+        if stream == STDOUT:
+            if line.startswith(STEP_MARKER):
+                _, name, step_code = line.split(' ')
+                self.codes[name] = int(step_code)
+                self.blank = False
+                return
+            if self.blank:
+                self.blank = False
+                self.__emit(stream, '')
+            if line == '':
+                self.blank = True
+                return
+        self.__emit(stream, line)
+
+    def __emit(self, stream: str, line: str) -> None:
+        self.tails[stream].append(line)
+        if self.handler is not None:
+            self.handler(stream, line)
+
+    def results(self, provisioning: Provisioning, code: int) -> tuple:
+        """
+        Results of performed script.
+
+        Args:
+            provisioning (Provisioning): Performed steps.
+            code (int): Exit code of script.
+
+        Returns:
+            tuple: The same as Provisioning.run.
+        """
+
+        if self.blank:
+            self.blank = False
+            self.__emit(STDOUT, '')
+        return (
+            provisioning._results(code, self.codes),
+            self.tails[STDOUT].text(),
+            self.tails[STDERR].text()
+        )
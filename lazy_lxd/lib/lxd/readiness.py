@@ -0,0 +1,126 @@
+import time
+import asyncio
+
+
+# Default policy of waiting for container network
+NETWORK_TIMEOUT = 30.0
+NETWORK_INTERVAL = 0.1
+NETWORK_MAX_INTERVAL = 1.0
+NETWORK_BACKOFF = 1.5
+
+
+def wait_network_address(
+    container: object,
+    timeout: float = NETWORK_TIMEOUT,
+    interval: float = NETWORK_INTERVAL,
+    max_interval: float = NETWORK_MAX_INTERVAL
+) -> str:
+    """
+    Wait until container receives IPv4 address on eth0.
+    Container state is polled with adaptive backoff:
+    first checks are frequent, so address is noticed right after
+    DHCP lease, then delay grows up to max interval
+    to not hammer LXD API by slow containers.
+
+    LXD events don't report address assignment,
+    that's why the state is polled instead of subscribing to them.
+
+    Args:
+        container (object): pylxd container object.
+        timeout (float): Seconds to wait before giving up.
+        interval (float): Delay before the second check in seconds.
+        max_interval (float): Upper limit of delay between checks.
+
+    Returns:
+        str: Container network address.
+
+    Raises:
+        TimeoutError: If container doesn't receive address in time.
+    """
+
+    deadline = time.monotonic() + timeout
+    delay = interval
+    while True:
+        address = network_address(container.state())
+        if address is not None:
+            return address
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(
+                "The container doesn't receive network too long"
+            )
+        time.sleep(min(delay, remaining))
+        delay = min(delay * NETWORK_BACKOFF, max_interval)
+
+
+async def wait_network_address_async(
+    client: object,
+    name: str,
+    timeout: float = NETWORK_TIMEOUT,
+    interval: float = NETWORK_INTERVAL,
+    max_interval: float = NETWORK_MAX_INTERVAL
+) -> str:
+    """
+    The same as wait_network_address, but for asyncio client.
+    Other containers are handled while this one is waiting.
+
+    Args:
+        client (object): AsyncLXDClient object.
+        name (str): Name of container.
+        timeout (float): Seconds to wait before giving up.
+        interval (float): Delay before the second check in seconds.
+        max_interval (float): Upper limit of delay between checks.
+
+    Returns:
+        str: Container network address.
+
+    Raises:
+        TimeoutError: If container doesn't receive address in time.
+    """
+
+    deadline = time.monotonic() + timeout
+    delay = interval
+    while True:
+        address = network_address(await client.state(name))
+        if address is not None:
+            return address
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(
+                "The container doesn't receive network too long"
+            )
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * NETWORK_BACKOFF, max_interval)
+
+
+def network_address(state: object) -> str:
+    """
+    Find external IPv4 address of eth0 interface in container state.
+
+    Args:
+        state (object): pylxd container state object,
+                        or state as dict from LXD API.
+
+    Returns:
+        str: Container network address. None if it isn't assigned yet.
+    """
+
+    if isinstance(state, dict):
+        network = state.get('network')
+    else:
+        network = state.network
+
+    # network is empty until container is running
+    if not network:
+        return None
+
+    interface = network.get('eth0')
+    if interface is None:
+        return None
+
+    for ipv in interface['addresses']:
+        if ipv['family'] == 'inet':
+            return ipv['address']
+    return None
@@ -0,0 +1,205 @@
+import re
+
+import pylxd
+from coolname import generate_slug
+
+from .container import run, stop
+from .index import DERIVED_PROPERTY
+from .provision import Provisioning
+
+
+# Aliases of ssh-ready images look like <prefix>-<os>-<release>-<base>
+ALIAS_PREFIX = 'lazy-lxd-ssh'
+# Ubuntu refuses to start sshd without host keys, so they're generated
+# before the check on every start
+SSH_HOST_KEYS_DROPIN = (
+    '/etc/systemd/system/ssh.service.d/lazy-lxd-host-keys.conf'
+)
+
+
+def alias(os: str, release: str, base_fingerprint: str) -> str:
+    """
+    Build deterministic alias of ssh-ready image.
+    Alias contains base image fingerprint,
+    so new base image leads to new ssh-ready image.
+
+    Args:
+        os (str): Operating system name.
+        release (str): OS codename or version.
+        base_fingerprint (str): Fingerprint of base image.
+
+    Returns:
+        str: Alias of ssh-ready image.
+    """
+
+    return f"{_alias_prefix(os, release)}{base_fingerprint[:12]}"
+
+
+def get_ssh_image(self, base_fingerprint: str) -> str:
+    """
+    Looking for ssh-ready image which derived from base image.
+
+    Args:
+        base_fingerprint (str): Fingerprint of base image.
+
+    Returns:
+        str: Fingerprint of ssh-ready image. None if it isn't built yet.
+    """
+
+    name = alias(self.image_os, self.image_version, base_fingerprint)
+    try:
+        response = self._client.api.images.aliases[name].get()
+    except pylxd.exceptions.NotFound:
+        return None
+
+    return response.json()['metadata']['target']
+
+
+def build_ssh_image(self, base_fingerprint: str, steps: list) -> str:
+    """
+    Build ssh-ready image from base image.
+    Temporary container with unique name is created from base image,
+    provisioned, stopped and published as image under deterministic alias.
+    SSH host keys are removed before publishing,
+    so every container gets its own keys on first start.
+    Ssh-ready images of previous base images are deleted.
+
+    Args:
+        base_fingerprint (str): Fingerprint of base image.
+        steps (list): Pairs of step name and shell command
+                      which prepare container for SSH.
+
+    Returns:
+        str: Fingerprint of ssh-ready image.
+    """
+
+    name = alias(self.image_os, self.image_version, base_fingerprint)
+
+    # concurrent builds don't touch containers of each other
+    container = self._client.containers.create({
+        'name': f"{ALIAS_PREFIX}-build-{generate_slug(2)}",
+        'source': {'type': 'image', 'fingerprint': base_fingerprint}
+    }, wait=True)
+
+    try:
+        run(container, **self.network_wait)
+        results, out, err = Provisioning(
+            steps + _host_keys_steps(self.image_os)
+        ).run(
+            container, self._output_handler()
+        )
+        for result in results:
+            if result.code is not None and result.code != 0:
+                raise RuntimeError(
+                    f"Got exit code {result.code} while performing "
+                    f"'{result.command}' inside container. {err.strip()}"
+                )
+        stop(container)
+
+        response = self._client.api.images.post(json={
+            'public': False,
+            'source': {'type': 'container', 'name': container.name},
+            'properties': {
+                'os': self.image_os,
+                'release': self.image_version,
+                'description': f"{self.image_os} {self.image_version} "
+                               "with OpenSSH server",
+                DERIVED_PROPERTY: base_fingerprint
+            },
+            'aliases': [{'name': name}]
+        })
+        operation = self._client.operations.wait_for_operation(
+            response.json()['operation']
+        )
+        fingerprint = operation.metadata['fingerprint']
+    finally:
+        # error of cleanup shouldn't hide error of build
+        try:
+            container.sync()
+            if container.status != 'Stopped':
+                container.stop(force=True, wait=True)
+            container.delete(wait=True)
+        except pylxd.exceptions.LXDAPIException as e:
+            self._log.warning(
+                f"Please delete container {container.name} by yourself: {e}"
+            )
+
+    _delete_outdated(self, name)
+    self._image_index.invalidate()
+
+    return fingerprint
+
+
+def _delete_outdated(self, current: str) -> None:
+    """
+    Internal function for deleting ssh-ready images
+    of the same OS and release which derived from outdated base images.
+
+    Args:
+        current (str): Alias of actual ssh-ready image.
+    """
+
+    prefix = _alias_prefix(self.image_os, self.image_version)
+    # prefix of other release could start the same, e.g. 8 and 8-stream
+    pattern = re.compile(re.escape(prefix) + '[0-9a-f]{12}')
+
+    response = self._client.api.images.aliases.get(params={'recursion': 1})
+    for image_alias in response.json()['metadata']:
+        if not pattern.fullmatch(image_alias['name']):
+            continue
+        if image_alias['name'] == current:
+            continue
+
+        self._log.debug(
+            f"Deleting outdated ssh-ready image {image_alias['name']}"
+        )
+        try:
+            self._client.images.get(image_alias['target']).delete(wait=True)
+        except pylxd.exceptions.LXDAPIException as e:
+            self._log.warning(
+                f"Unable to delete outdated image {image_alias['name']}: {e}"
+            )
+
+
+def _host_keys_steps(os: str) -> list:
+    """
+    Internal function for building steps which remove SSH host keys
+    from container before publishing, so they aren't shared
+    by all containers of image. Keys are generated again on start
+    of sshd, Ubuntu needs systemd drop-in for it.
+
+    Args:
+        os (str): Operating system name.
+
+    Returns:
+        list: Pairs of step name and shell command.
+    """
+
+    steps = list()
+    if os == 'ubuntu':
+        steps.append((
+            'generate-host-keys-on-start',
+            f"mkdir -p {SSH_HOST_KEYS_DROPIN.rsplit('/', 1)[0]} && "
+            "printf '[Service]\\nExecStartPre=\\n"
+            "ExecStartPre=/usr/bin/ssh-keygen -A\\n"
+            "ExecStartPre=/usr/sbin/sshd -t\\n' "
+            f"> {SSH_HOST_KEYS_DROPIN}"
+        ))
+    steps.append(('remove-host-keys', 'rm -f /etc/ssh/ssh_host_*'))
+    return steps
+
+
+def _alias_prefix(os: str, release: str) -> str:
+    """
+    Internal function for building common part of aliases
+    of ssh-ready images for OS and release.
+
+    Args:
+        os (str): Operating system name.
+        release (str): OS codename or version.
+
+    Returns:
+        str: Beginning of ssh-ready image alias.
+    """
+
+    return f"{ALIAS_PREFIX}-{os}-{release}-".replace('.', '-')
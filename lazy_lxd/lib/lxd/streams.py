@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import logging
+import platform
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen, pathname2url, url2pathname
+from urllib.error import HTTPError
+
+from lib.config import write_atomic
+from lib.logger import span
+
+
+# Images are downloaded from linuxcontainers.org by default
+SIMPLESTREAMS_SERVER = 'https://images.linuxcontainers.org'
+INDEX_PATH = 'streams/v1/index.json'
+# Seconds while cached index is used without asking server
+STREAMS_TTL = 3600
+STREAMS_TIMEOUT = 10
+# Simplestreams architecture names by machine names
+ARCHITECTURES = {
+    'x86_64': 'amd64',
+    'aarch64': 'arm64',
+    'armv7l': 'armhf',
+    'i686': 'i386',
+    'ppc64le': 'ppc64el',
+    's390x': 's390x'
+}
+
+StreamImage = namedtuple('StreamImage', [
+    'os', 'release', 'architecture', 'fingerprint', 'size',
+    'metadata', 'rootfs'
+])
+StreamImage.__doc__ = """
+The newest version of image published by simplestreams server.
+
+Args:
+    os (str): Operating system name.
+    release (str): Codename or version of release, as server names it.
+    architecture (str): Image architecture.
+    fingerprint (str): Fingerprint which image gets in LXD.
+    size (int): Size of image files in bytes.
+    metadata (str): Path of metadata tarball relative to server.
+    rootfs (str): Path of root filesystem relative to server.
+                  None for unified image, which is one tarball.
+"""
+
+
+def host_architecture() -> str:
+    """
+    Architecture of images which fit this host.
+
+    Returns:
+        str: Simplestreams architecture name.
+    """
+
+    machine = platform.machine()
+    return ARCHITECTURES.get(machine, machine)
+
+
+class SimpleStreams(object):
+    """
+    Index of images published by simplestreams server,
+    so aliases such as ubuntu/18.04 are resolved to image fingerprint
+    without asking LXD to fetch and parse the remote index.
+
+    Index of remote server is kept in on-disk cache. Cache is used
+    as is within TTL, later it's refreshed by conditional request,
+    so unchanged index isn't downloaded again. Stale cache is used
+    if server is unreachable.
+
+    Server could be a local mirror: directory, or file:// URL,
+    with the same layout as server. Mirror is read directly.
+
+    Args:
+        server (str): URL of simplestreams server or path to mirror.
+        cache_path (str): Path to file of on-disk cache of index.
+                          Cache is disabled if not set.
+        ttl (float): Seconds while cache is used without asking server.
+    """
+
+    def __init__(
+        self,
+        server: str = SIMPLESTREAMS_SERVER,
+        cache_path: str = None,
+        ttl: float = STREAMS_TTL
+    ):
+        if urlsplit(server).scheme in ('http', 'https', 'file'):
+            self.server = server.rstrip('/') + '/'
+        else:
+            self.server = 'file://' + pathname2url(
+                os.path.abspath(server)
+            ) + '/'
+        self._cache_path = cache_path if not self.is_mirror else None
+        self._ttl = ttl
+        self._log = logging.getLogger('lazy_lxd')
+
+        self._images = None
+        self._error = None
+
+    @property
+    def is_mirror(self) -> bool:
+        """
+        Whether server is local mirror, which LXD can't pull from,
+        so its images should be uploaded.
+        """
+
+        return urlsplit(self.server).scheme == 'file'
+
+    def find(self, os_name: str, release: str, architecture: str) -> object:
+        """
+        Find the newest image by alias, such as ubuntu/18.04
+        or ubuntu/bionic, and architecture.
+
+        Args:
+            os_name (str): Operating system name.
+            release (str): Codename or version of release.
+            architecture (str): Image architecture.
+
+        Returns:
+            StreamImage: Found image. None if server hasn't such image.
+
+        Raises:
+            RuntimeError: If index is unavailable.
+        """
+
+        if self._images is None:
+            # unavailable server isn't asked again by the same run
+            if self._error is not None:
+                raise RuntimeError(self._error)
+            try:
+                with span('streams.index', server=self.server):
+                    self._images = self.__load()
+            except RuntimeError as e:
+                self._error = str(e)
+                raise
+
+        image = self._images.get(
+            f"{os_name.lower()}/{release.lower()}:{architecture}"
+        )
+        return StreamImage(**image) if image is not None else None
+
+    def open(self, path: str) -> object:
+        """
+        Open file of mirror for reading.
+
+        Args:
+            path (str): Path relative to server.
+
+        Returns:
+            object: Binary file object.
+        """
+
+        url = urljoin(self.server, path)
+        return open(url2pathname(urlsplit(url).path), 'rb')
+
+    def __load(self) -> dict:
+        """
+        Get images of server from cache or from server itself.
+
+        Returns:
+            dict: Images keyed by alias and architecture.
+        """
+
+        cache = self.__read_cache()
+        if cache is not None and time.time() - cache['fetched'] < self._ttl:
+            self._log.debug(f"Using index of {self.server} from cache")
+            return cache['images']
+
+        try:
+            index = self.__fetch(INDEX_PATH)[0]
+            path = next(
+                stream['path'] for stream in index['index'].values()
+                if stream.get('datatype') == 'image-downloads'
+            )
+            # unchanged products aren't downloaded again
+            validators = dict()
+            if cache is not None and cache.get('path') == path:
+                validators = cache['validators']
+            products, validators = self.__fetch(path, validators)
+        except (OSError, ValueError, KeyError, StopIteration) as e:
+            if cache is not None:
+                self._log.debug(
+                    f"Using stale index of {self.server} from cache: {e}"
+                )
+                return cache['images']
+            raise RuntimeError(
+                f"Unable to get index of images from {self.server}: {e}"
+            )
+
+        if products is None:
+            self._log.debug(f"Index of {self.server} isn't changed")
+            images = cache['images']
+        else:
+            images = _index(products)
+
+        if self._cache_path is not None:
+            try:
+                write_atomic(self._cache_path, json.dumps({
+                    'server': self.server,
+                    'fetched': time.time(),
+                    'path': path,
+                    'validators': validators,
+                    'images': images
+                }))
+            except OSError as e:
+                self._log.debug(f"Unable to save index cache: {e}")
+
+        return images
+
+    def __fetch(self, path: str, validators: dict = None) -> tuple:
+        """
+        Get JSON file from server.
+
+        Args:
+            path (str): Path relative to server.
+            validators (dict): ETag and Last-Modified of cached file.
+                               File is requested only if it's changed.
+
+        Returns:
+            tuple: Content of file, None if it isn't changed,
+                   and validators of received file.
+        """
+
+        headers = dict()
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        request = Request(urljoin(self.server, path), headers=headers)
+        try:
+            with urlopen(request, timeout=STREAMS_TIMEOUT) as response:
+                return (json.loads(response.read().decode()), {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                })
+        except HTTPError as e:
+            if e.code == 304:
+                return (None, validators)
+            raise
+
+    def __read_cache(self) -> dict:
+        """
+        Read on-disk cache.
+
+        Returns:
+            dict: Cached index. None if cache is absent,
+                  broken or belongs to other server.
+        """
+
+        if self._cache_path is None:
+            return None
+
+        try:
+            with open(self._cache_path) as fl:
+                cache = json.load(fl)
+            if cache.get('server') == self.server and 'images' in cache:
+                return cache
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            self._log.debug(f"Unable to read index cache: {e}")
+        return None
+
+
+def _index(products: dict) -> dict:
+    """
+    Internal function for building compact index of images
+    from simplestreams products. Only the newest version
+    of each product is kept.
+
+    Args:
+        products (dict): Content of simplestreams products file.
+
+    Returns:
+        dict: Images keyed by alias and architecture.
+    """
+
+    images = dict()
+    for product in products.get('products', {}).values():
+        versions = product.get('versions') or {}
+        if not versions:
+            continue
+        items = versions[max(versions)].get('items') or {}
+        metadata = items.get('lxd.tar.xz')
+        image = None
+        if metadata is not None:
+            # split image: metadata and root filesystem
+            for rootfs, combined in (
+                ('root.squashfs', 'combined_squashfs_sha256'),
+                ('root.tar.xz', 'combined_rootxz_sha256')
+            ):
+                if rootfs in items and metadata.get(combined):
+                    image = {
+                        'fingerprint': metadata[combined],
+                        'size': metadata['size'] + items[rootfs]['size'],
+                        'metadata': metadata['path'],
+                        'rootfs': items[rootfs]['path']
+                    }
+                    break
+        else:
+            unified = next((
+                item for item in items.values()
+                if item.get('ftype') == 'lxd_combined.tar.gz'
+            ), None)
+            if unified is not None:
+                image = {
+                    'fingerprint': unified['sha256'],
+                    'size': unified['size'],
+                    'metadata': unified['path'],
+                    'rootfs': None
+                }
+        if image is None:
+            continue
+
+        image.update({
+            'os': product['os'].lower(),
+            'release': product['release'].lower(),
+            'architecture': product['arch']
+        })
+        for alias in product.get('aliases', '').split(','):
+            alias = alias.strip().lower()
+            if alias:
+                images[f"{alias}:{product['arch']}"] = image
+
+    return images
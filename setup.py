@@ -11,17 +11,22 @@ def long_description():
 install_requires = [
     'colorama>=0.4.3',
     'coolname>=1.1.0',
-    'cryptography>=2.9.2',
+    'cryptography>=3.0',
     'halo>=0.0.29',
     'humanize>=2.4.0',
     'PyInquirer>=1.0.3',
     'pylxd>=2.2.11',
-    'python-dateutil>=2.8.1',
-    'python-hosts>=1.0.0'
+    'python-dateutil>=2.8.1'
 ]
 
+# YAML manifests and configs, JSON ones work without it
+extras_require = {
+    'yaml': ['PyYAML>=5.1']
+}
+
 package_dir = {
     'lib.ansible': 'lazy_lxd/lib/ansible',
+    'lib.config': 'lazy_lxd/lib/config',
     'lib.inquirer': 'lazy_lxd/lib/inquirer',
     'lib.keys': 'lazy_lxd/lib/keys',
     'lib.logger': 'lazy_lxd/lib/logger',
@@ -31,6 +36,7 @@ package_dir = {
 
 packages = [
     'lib.ansible',
+    'lib.config',
     'lib.inquirer',
     'lib.keys',
     'lib.logger',
@@ -64,6 +70,7 @@ setup(
     package_dir=package_dir,
     packages=packages,
     install_requires=install_requires,
+    extras_require=extras_require,
     python_requires='>=3.6',
     entry_points={
         'console_scripts': [
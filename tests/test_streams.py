@@ -0,0 +1,111 @@
+"""
+SimpleStreams against local mirror: on-disk simplestreams tree
+in fixtures/simplestreams with stubs instead of image files.
+"""
+
+import os
+import json
+import time
+
+from lib.lxd.image import pull
+from lib.lxd.streams import SimpleStreams
+
+MIRROR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'fixtures', 'simplestreams'
+)
+UBUNTU_FINGERPRINT = 'b' * 64
+CENTOS_FINGERPRINT = 'c' * 64
+
+
+class FakeImage(object):
+    def __init__(self):
+        self.properties = dict()
+        self.saved = False
+
+    def save(self):
+        self.saved = True
+
+
+class FakeImages(object):
+    """
+    Images of pylxd client which records uploads.
+    """
+
+    def __init__(self):
+        self.uploads = list()
+
+    def exists(self, fingerprint: str) -> bool:
+        return False
+
+    def create(self, data: object, metadata: object = None) -> FakeImage:
+        self.uploads.append((
+            data.read(), metadata.read() if metadata is not None else None
+        ))
+        return FakeImage()
+
+    def create_from_simplestreams(self, *args, **kwargs):
+        raise AssertionError("LXD can't pull from local mirror")
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.images = FakeImages()
+
+
+def test_find_resolves_version_and_codename():
+    streams = SimpleStreams(MIRROR)
+
+    assert streams.is_mirror
+    for release in ('18.04', 'bionic'):
+        image = streams.find('ubuntu', release, 'amd64')
+        assert image.fingerprint == UBUNTU_FINGERPRINT
+        assert (image.os, image.release) == ('ubuntu', 'bionic')
+    assert streams.find('centos', '7', 'amd64').rootfs is None
+    assert streams.find('ubuntu', 'bionic', 'arm64') is None
+
+
+def test_mirror_ignores_cache(tmp_path):
+    cache_path = str(tmp_path / 'streams.json')
+    streams = SimpleStreams(MIRROR, cache_path=cache_path, ttl=3600)
+    # fresh cache of the same server would be used by remote server
+    cache = json.dumps({
+        'server': streams.server,
+        'fetched': time.time(),
+        'path': 'streams/v1/images.json',
+        'validators': {'etag': 'stale'},
+        'images': {}
+    })
+    with open(cache_path, 'w') as fl:
+        fl.write(cache)
+
+    image = streams.find('ubuntu', 'bionic', 'amd64')
+
+    assert image.fingerprint == UBUNTU_FINGERPRINT
+    with open(cache_path) as fl:
+        assert fl.read() == cache
+
+
+def test_pull_uploads_split_image():
+    client = FakeClient()
+
+    image = pull(client, SimpleStreams(MIRROR), 'ubuntu', 'bionic', 'amd64')
+
+    assert client.images.uploads == [
+        (b'root filesystem stub\n', b'lxd metadata stub\n')
+    ]
+    assert image.saved
+    assert image.properties == {
+        'os': 'ubuntu',
+        'release': 'bionic',
+        'architecture': 'amd64',
+        'description': 'ubuntu bionic amd64'
+    }
+
+
+def test_pull_uploads_unified_image():
+    client = FakeClient()
+
+    image = pull(client, SimpleStreams(MIRROR), 'centos', '7', 'amd64')
+
+    assert client.images.uploads == [(b'unified image stub\n', None)]
+    assert image.properties['release'] == '7'